@@ -113,14 +113,14 @@ async def predictRouteClient(request: Request):
                                 Vehicle_Age_gt_2_Years = form.Vehicle_Age_gt_2_Years,
                                 Vehicle_Damage_Yes = form.Vehicle_Damage_Yes)
         
-        # Convert form data into Dataframe for the model
-        vehicle_df = vehicle_data.get_vehicle_data_dataframe()
+        # Convert form data into a single record for the model
+        vehicle_record = vehicle_data.get_vehicle_data_as_record()
 
         # Initialize the prediction pipeline
         model_predictor = VehicleDataClassifier()
 
         # Make a prediction and retrieve the result
-        value = model_predictor.predict(dataframe=vehicle_df)
+        value = model_predictor.predict_record(record=vehicle_record)
 
         # Interpret the prediction result as 'Response-Yes' or 'Response-No'
         status = "Response-Yes" if value == 1 else "Response-No"
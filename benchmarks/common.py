@@ -0,0 +1,71 @@
+"""
+Shared helpers for the benchmark scripts.
+
+The benchmarks run against the MongoDB pointed to by the MONGODB_URL environment
+variable. When it is not set they fall back to an in-process mongomock collection
+filled with synthetic vehicle insurance documents.
+"""
+import os
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+from bson import ObjectId
+
+from src.configuration.mongo_db_connection import MongoDBClient
+from src.constants import DATABASE_NAME, DATA_INGESTION_COLLECTION_NAME, MONGODB_URL_KEY
+from src.data_access.data_source import MongoDataSource
+
+BENCHMARK_COLLECTION_NAME = os.getenv("BENCHMARK_COLLECTION_NAME", DATA_INGESTION_COLLECTION_NAME)
+
+
+def make_documents(n_docs: int, seed: int = 42) -> list:
+    """
+    Generates documents shaped like the Proj1-Data collection.
+    '_id' values are one second apart so that range partitioning has something to split.
+    """
+    rng = np.random.default_rng(seed)
+    start = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    vehicle_age = np.array(["< 1 Year", "1-2 Year", "> 2 Years"])
+    documents = []
+    for i in range(n_docs):
+        documents.append({
+            "_id": ObjectId.from_datetime(start + timedelta(seconds=i)),
+            "id": i + 1,
+            "Gender": "Male" if rng.random() < 0.54 else "Female",
+            "Age": int(rng.integers(20, 86)),
+            "Driving_License": int(rng.random() < 0.998),
+            "Region_Code": float(rng.integers(0, 53)) if rng.random() > 0.01 else "na",
+            "Previously_Insured": int(rng.random() < 0.46),
+            "Vehicle_Age": str(vehicle_age[rng.integers(0, 3)]),
+            "Vehicle_Damage": "Yes" if rng.random() < 0.5 else "No",
+            "Annual_Premium": float(rng.integers(2630, 60000)),
+            "Policy_Sales_Channel": float(rng.integers(1, 164)),
+            "Vintage": int(rng.integers(10, 300)),
+            "Response": int(rng.random() < 0.12),
+        })
+    return documents
+
+
+def prepare_proj1_data(my_data, backend: str):
+    """
+    mongomock does not implement $convert, so only the projection and 'na' cleanup are pushed down there.
+    Exports would fall back to that on their own; this skips the failed attempt and lets the pushdown
+    benchmark build its pipelines without $convert.
+    """
+    if isinstance(my_data.data_source, MongoDataSource):
+        my_data.data_source.coerce_types = backend != "mongomock"
+    return my_data
+
+
+def get_benchmark_client(n_docs: int) -> str:
+    """
+    Points MongoDBClient at the benchmark database and returns a label for the backend in use.
+    """
+    if os.getenv(MONGODB_URL_KEY):
+        MongoDBClient()
+        return "mongod"
+
+    import mongomock
+    MongoDBClient.client = mongomock.MongoClient()
+    MongoDBClient.client[DATABASE_NAME][BENCHMARK_COLLECTION_NAME].insert_many(make_documents(n_docs))
+    return "mongomock"
@@ -0,0 +1,91 @@
+"""
+Compares single-cursor streaming export with range-partitioned parallel export.
+
+With --source local the same exports run against a local Parquet snapshot of the
+collection (written first unless --snapshot-dir already holds one), which measures
+ingestion without the network I/O of MongoDB.
+
+Usage:
+    python -m benchmarks.export_benchmark --docs 200000 --workers 1 2 4 8
+    python -m benchmarks.export_benchmark --source local --snapshot-dir /mnt/nvme/snapshot
+"""
+import argparse
+import os
+import tempfile
+import time
+
+from benchmarks.common import BENCHMARK_COLLECTION_NAME, get_benchmark_client, prepare_proj1_data
+from src.configuration.mongo_db_connection import MongoDBClient
+from src.constants import LOCAL_SNAPSHOT_DIR_KEY
+from src.data_access.proj1_data import Proj1Data
+
+
+def run_stream(my_data: Proj1Data, batch_size: int) -> int:
+    rows = 0
+    for chunk in my_data.export_collection_as_chunks(BENCHMARK_COLLECTION_NAME, batch_size=batch_size):
+        rows += len(chunk)
+    return rows
+
+
+def run_parallel(my_data: Proj1Data, n_workers: int, batch_size: int) -> int:
+    rows = 0
+    for _, chunks in my_data.export_collection_in_partitions(BENCHMARK_COLLECTION_NAME, n_workers=n_workers,
+                                                              batch_size=batch_size):
+        rows += sum(len(chunk) for chunk in chunks)
+    return rows
+
+
+def format_pool_stats(my_data: Proj1Data) -> str:
+    """
+    Summarises the connection pool usage of the last run and resets the counters.
+    Empty for the local backend and the mongomock stand-in, which have no pool.
+    """
+    stats = my_data.data_source.get_stats()
+    MongoDBClient.reset_stats()
+    if not stats:
+        return ""
+    pool = stats["pool"]
+    return (f" checkouts={pool.get('checkouts', 0):.0f} avg_wait={pool['avg_wait_ms']:.2f}ms "
+            f"max_wait={pool.get('max_wait_ms', 0):.2f}ms max_in_use={pool.get('max_in_use', 0):.0f}/{pool['max_pool_size']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--docs", type=int, default=100000, help="documents to generate for the mongomock stand-in")
+    parser.add_argument("--batch-size", type=int, default=10000)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--source", choices=["mongodb", "local"], default="mongodb")
+    parser.add_argument("--snapshot-dir", default=None, help="local snapshot directory, a temporary one by default")
+    args = parser.parse_args()
+
+    if args.source == "local":
+        snapshot_dir = args.snapshot_dir or tempfile.mkdtemp(prefix="proj1_snapshot_")
+        if not os.path.exists(os.path.join(snapshot_dir, BENCHMARK_COLLECTION_NAME)):
+            backend = get_benchmark_client(args.docs)
+            file_path = prepare_proj1_data(Proj1Data(backend="mongodb"), backend).save_snapshot(BENCHMARK_COLLECTION_NAME,
+                                                                                                 snapshot_dir)
+            print(f"wrote snapshot of {backend} to {file_path}")
+        os.environ[LOCAL_SNAPSHOT_DIR_KEY] = snapshot_dir
+        my_data = Proj1Data(backend="local")
+        backend = f"local:{snapshot_dir}"
+    else:
+        backend = get_benchmark_client(args.docs)
+        my_data = prepare_proj1_data(Proj1Data(backend="mongodb"), backend)
+    print(f"backend={backend} collection={BENCHMARK_COLLECTION_NAME}")
+
+    MongoDBClient.reset_stats()
+    start = time.perf_counter()
+    rows = run_stream(my_data, args.batch_size)
+    baseline = time.perf_counter() - start
+    print(f"{'stream':>12} rows={rows:>9} time={baseline:8.3f}s speedup=  1.00x{format_pool_stats(my_data)}")
+
+    for n_workers in args.workers:
+        start = time.perf_counter()
+        rows = run_parallel(my_data, n_workers, args.batch_size)
+        elapsed = time.perf_counter() - start
+        print(f"{f'parallel x{n_workers}':>12} rows={rows:>9} time={elapsed:8.3f}s speedup={baseline / elapsed:5.2f}x"
+              f"{format_pool_stats(my_data)}")
+
+
+if __name__ == "__main__":
+    main()
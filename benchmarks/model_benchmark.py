@@ -0,0 +1,63 @@
+"""
+Compares the model engines of config/model.yaml on the same synthetic data: fit time, size of
+the pickled model, batch scoring throughput, single-row latency and F1 on a holdout.
+
+Usage:
+    python -m benchmarks.model_benchmark --rows 1000000 --n-jobs -1
+    python -m benchmarks.model_benchmark --engines hist_gradient_boosting --records 2000
+"""
+import argparse
+import pickle
+import time
+
+from sklearn.metrics import f1_score
+
+from benchmarks.transformation_benchmark import make_dataframe
+from src.constants import MODEL_TRAINER_MODEL_CONFIG_FILE_PATH, TARGET_COLUMN
+from src.entity.model_engines import MODEL_ENGINES, train_model
+from src.entity.schema import load_schema
+from src.entity.transformation_plan import TransformationPlan
+from src.utils.main_utils import read_yaml_file
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=200000, help="rows of the synthetic dataset")
+    parser.add_argument("--holdout", type=float, default=0.25)
+    parser.add_argument("--engines", nargs="+", choices=MODEL_ENGINES, default=list(MODEL_ENGINES))
+    parser.add_argument("--records", type=int, default=1000, help="single rows scored one by one")
+    parser.add_argument("--n-jobs", type=int, default=-1)
+    args = parser.parse_args()
+
+    schema = load_schema()
+    dataframe = make_dataframe(args.rows, schema)
+    n_train = int(len(dataframe) * (1 - args.holdout))
+    train, holdout = dataframe.iloc[:n_train], dataframe.iloc[n_train:]
+    plan = TransformationPlan.from_schema(schema).fit(train)
+    X_train, y_train = plan.transform(train), train[TARGET_COLUMN].to_numpy()
+    X_holdout, y_holdout = plan.transform(holdout), holdout[TARGET_COLUMN].to_numpy()
+    model_config = read_yaml_file(MODEL_TRAINER_MODEL_CONFIG_FILE_PATH)
+
+    for engine in args.engines:
+        # balanced weights stand for the rebalancing of the transformation stage
+        params = dict((model_config.get(engine) or {}).get("params") or {}, class_weight="balanced")
+        model, report = train_model(engine, X_train, y_train, params, n_jobs=args.n_jobs)
+        size = len(pickle.dumps(model, protocol=pickle.HIGHEST_PROTOCOL))
+
+        start = time.perf_counter()
+        y_pred = model.predict(X_holdout)
+        batch_seconds = time.perf_counter() - start
+
+        rows = X_holdout[:args.records]
+        start = time.perf_counter()
+        for i in range(len(rows)):
+            model.predict(rows[i:i + 1])
+        row_latency = (time.perf_counter() - start) / len(rows)
+
+        print(f"{engine:<22} fit={report['seconds']:.3f}s size={size / 2 ** 20:.2f} MiB "
+              f"batch={len(X_holdout) / batch_seconds:,.0f} rows/s row={row_latency * 1e6:.0f}us "
+              f"f1={f1_score(y_holdout, y_pred):.4f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+"""
+Measures bytes transferred and client CPU of the export before and after the
+server-side projection / cleanup pushdown.
+
+"before" is the previous client-side path: find() every field, drop 'id' and
+replace 'na' over the whole frame in pandas. "after" is the aggregation pipeline
+built by MongoDataSource.build_export_pipeline. Bytes are the BSON size of the
+documents returned by each cursor, i.e. the payload that crosses the wire.
+On the mongomock stand-in the "server" runs in-process, so its pipeline work is
+counted as client CPU; use a real mongod for the CPU comparison.
+
+Usage:
+    python -m benchmarks.pushdown_benchmark --docs 200000
+"""
+import argparse
+import time
+
+import bson
+import numpy as np
+import pandas as pd
+
+from benchmarks.common import BENCHMARK_COLLECTION_NAME, get_benchmark_client, prepare_proj1_data
+from src.data_access.data_source import MongoDataSource
+from src.data_access.proj1_data import Proj1Data
+
+
+def export_before(collection, batch_size: int) -> pd.DataFrame:
+    df = pd.DataFrame(list(collection.find(batch_size=batch_size)))
+    df = df.drop(columns=["id"])
+    df.replace({"na": np.nan}, inplace=True)
+    return df
+
+
+def export_after(data_source: MongoDataSource, collection, batch_size: int, coerce_types: bool) -> pd.DataFrame:
+    pipeline = data_source.build_export_pipeline(coerce_types=coerce_types)
+    return pd.DataFrame.from_records(list(collection.aggregate(pipeline, batchSize=batch_size)),
+                                     columns=data_source.column_names)
+
+
+def payload_bytes(cursor) -> int:
+    return sum(len(bson.encode(document)) for document in cursor)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--docs", type=int, default=100000, help="documents to generate for the mongomock stand-in")
+    parser.add_argument("--batch-size", type=int, default=10000)
+    args = parser.parse_args()
+
+    backend = get_benchmark_client(args.docs)
+    my_data = prepare_proj1_data(Proj1Data(backend="mongodb"), backend)
+    data_source = my_data.data_source
+    collection = data_source.mongo_client.database[BENCHMARK_COLLECTION_NAME]
+    coerce_types = data_source.coerce_types
+    print(f"backend={backend} collection={BENCHMARK_COLLECTION_NAME} server_side_coercion={coerce_types}")
+
+    results = {}
+    for label, run in (("before", lambda: export_before(collection, args.batch_size)),
+                       ("after", lambda: export_after(data_source, collection, args.batch_size, coerce_types))):
+        cpu_start, wall_start = time.process_time(), time.perf_counter()
+        df = run()
+        cpu, wall = time.process_time() - cpu_start, time.perf_counter() - wall_start
+        results[label] = (cpu, wall)
+        print(f"{label:>7} rows={len(df):>9} cols={df.shape[1]:>3} client_cpu={cpu:8.3f}s wall={wall:8.3f}s "
+              f"frame={df.memory_usage(deep=True).sum() / 2 ** 20:8.1f}MiB")
+
+    before_bytes = payload_bytes(collection.find(batch_size=args.batch_size))
+    after_bytes = payload_bytes(collection.aggregate(data_source.build_export_pipeline(coerce_types=coerce_types),
+                                                     batchSize=args.batch_size))
+    print(f"payload before={before_bytes / 2 ** 20:8.1f}MiB after={after_bytes / 2 ** 20:8.1f}MiB "
+          f"saved={1 - after_bytes / before_bytes:6.1%}")
+    print(f"client cpu saved={1 - results['after'][0] / results['before'][0]:6.1%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,54 @@
+"""
+Measures how RandomForest training in the model trainer scales with cores, for both parallel
+modes: threads inside one estimator and shards of the forest fitted by a process pool. The
+features are written to a .npy file and memory-mapped, as the trainer reads them.
+
+Usage:
+    python -m benchmarks.training_benchmark --rows 500000 --workers 1 2 4 8 16 32
+    python -m benchmarks.training_benchmark --modes processes --n-estimators 400
+"""
+import argparse
+import os
+import tempfile
+
+from benchmarks.transformation_benchmark import make_dataframe
+from src.constants import TARGET_COLUMN
+from src.entity.parallel_forest import PARALLEL_TRAINING_MODES, train_forest
+from src.entity.schema import load_schema
+from src.entity.transformation_plan import TransformationPlan
+from src.utils.main_utils import load_numpy_array_data, save_numpy_array_data
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=200000, help="rows of the synthetic training set")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, os.cpu_count()])
+    parser.add_argument("--modes", nargs="+", choices=PARALLEL_TRAINING_MODES, default=list(PARALLEL_TRAINING_MODES))
+    parser.add_argument("--n-estimators", type=int, default=200)
+    parser.add_argument("--max-depth", type=int, default=10)
+    args = parser.parse_args()
+
+    schema = load_schema()
+    dataframe = make_dataframe(args.rows, schema)
+    X = TransformationPlan.from_schema(schema).fit(dataframe).transform(dataframe)
+    y = dataframe[TARGET_COLUMN].to_numpy()
+    params = dict(n_estimators=args.n_estimators, max_depth=args.max_depth, min_samples_split=7,
+                  min_samples_leaf=6, criterion="entropy", random_state=101)
+
+    with tempfile.TemporaryDirectory() as directory:
+        file_path = os.path.join(directory, "train.npy")
+        save_numpy_array_data(file_path, X)
+        X = load_numpy_array_data(file_path, mmap_mode="c")
+        baseline = None
+        for mode in args.modes:
+            for workers in sorted(set(args.workers)):
+                _, report = train_forest(X, y, params, mode=mode, n_jobs=workers)
+                baseline = baseline or report["seconds"]
+                shard_seconds = [shard["seconds"] for shard in report["shards"]]
+                print(f"{mode:<9} workers={report['workers']:<3} {report['seconds']:.3f}s "
+                      f"speedup={baseline / report['seconds']:.2f}x shards min/max={min(shard_seconds):.3f}/{max(shard_seconds):.3f}s")
+        del X
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,55 @@
+"""
+Measures the transformation plan shared by training, evaluation and serving, in isolation:
+fitting, batch transform throughput and the single-record path used by the prediction form.
+
+Usage:
+    python -m benchmarks.transformation_benchmark --rows 1000000 --records 10000
+"""
+import argparse
+import time
+
+import pandas as pd
+
+from benchmarks.common import make_documents
+from src.entity.schema import Schema, load_schema
+from src.entity.transformation_plan import TransformationPlan
+from src.utils.main_utils import cast_storage_dtypes
+
+
+def make_dataframe(n_rows: int, schema: Schema) -> pd.DataFrame:
+    dataframe = pd.DataFrame(make_documents(n_rows)).drop(columns=["_id"])
+    dataframe["Region_Code"] = pd.to_numeric(dataframe["Region_Code"], errors="coerce")
+    return cast_storage_dtypes(dataframe, schema.storage_dtypes)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=200000, help="rows of the synthetic batch")
+    parser.add_argument("--records", type=int, default=5000, help="single records to transform one by one")
+    args = parser.parse_args()
+
+    schema = load_schema()
+    dataframe = make_dataframe(args.rows, schema)
+
+    start = time.perf_counter()
+    plan = TransformationPlan.from_schema(schema).fit(dataframe)
+    print(f"fit        rows={len(dataframe)} {time.perf_counter() - start:.3f}s")
+
+    start = time.perf_counter()
+    matrix = plan.transform(dataframe)
+    elapsed = time.perf_counter() - start
+    print(f"batch      rows={len(dataframe)} {elapsed:.3f}s {len(dataframe) / elapsed:,.0f} rows/s "
+          f"({matrix.nbytes / 2 ** 20:.1f} MiB {matrix.dtype})")
+
+    records = dataframe.head(args.records).to_dict(orient="records")
+    for label, transform in (("record", plan.transform_record),
+                             ("1-row frame", lambda record: plan.transform(pd.DataFrame([record])))):
+        start = time.perf_counter()
+        for record in records:
+            transform(record)
+        elapsed = time.perf_counter() - start
+        print(f"{label:<10} records={len(records)} {elapsed / len(records) * 1e6:.1f}us/record")
+
+
+if __name__ == "__main__":
+    main()
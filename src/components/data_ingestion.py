@@ -1,6 +1,13 @@
+import glob
+import hashlib
+import json
 import os
+import shutil
 import sys
+from typing import Any, Iterable, Iterator, List, Optional
 
+import numpy as np
+from bson import ObjectId
 from pandas import DataFrame
 from sklearn.model_selection import train_test_split
 
@@ -9,14 +16,24 @@ from src.entity.artifact_entity import DataIngestionArtifact
 from src.exception import MyException
 from src.logger import logging
 from src.data_access.proj1_data import Proj1Data
+from src.entity.schema import load_schema
+from src.utils.main_utils import (read_yaml_file, write_yaml_file,
+                                  cast_storage_dtypes, memory_usage_report,
+                                  DataFrameChunkWriter, read_dataframe, write_dataframe, link_or_copy_file,
+                                  hash_split_mask, get_file_ids)
 
 class DataIngestion:
-    def __init__(self, data_ingestion_config:DataIngestionConfig=DataIngestionConfig()):
+    def __init__(self, data_ingestion_config:DataIngestionConfig=DataIngestionConfig(),
+                 trained_partitions: Optional[List[str]] = None):
         """
         :param data_ingestion_config: configuration for data ingestion
+        :param trained_partitions: ids (see get_file_ids) of the incremental feature store partitions the production
+                                   model was trained on, when it is to be refreshed with the rows added since
         """
         try:
             self.data_ingestion_config = data_ingestion_config
+            self.trained_partitions = trained_partitions
+            self._storage_dtypes = load_schema().storage_dtypes
         except Exception as e:
             MyException(e, sys)
     
@@ -24,7 +41,9 @@ class DataIngestion:
         """
         Method: export_data_into_feature_store
 
-        Description: This method exports data from mongodb to csv file.
+        Description: This method exports data from mongodb to the feature store file (csv, parquet or arrow).
+                     Streamed and incremental exports write the file chunk by chunk and the data is then read
+                     back from it, so the export itself never holds more than one batch.
 
         Output: data is returned as artifact of data ingestion components.
 
@@ -33,6 +52,12 @@ class DataIngestion:
         logging.info("Entered initiate_data_ingestion methtod of Data_Ingestion class")
 
         try:
+            if self.data_ingestion_config.incremental:
+                return read_dataframe(self.ingest_incrementally_into_feature_store())
+
+            if self.data_ingestion_config.export_mode in ("stream", "parallel"):
+                return read_dataframe(self.stream_data_into_feature_store())
+
             logging.info("Exporting data from MongoDB")
             my_data = Proj1Data()
             dataframe = my_data.export_collection_as_dataframe(collection_name=self.data_ingestion_config.collection_name)
@@ -41,16 +66,306 @@ class DataIngestion:
             dir_path = os.path.dirname(feature_store_file_path)
             os.makedirs(dir_path, exist_ok=True)
             logging.info(f"Saving exported data into feature store file path: {feature_store_file_path}")
-            dataframe.to_csv(feature_store_file_path, index=False, header=True)
+            write_dataframe(dataframe, feature_store_file_path)
             return dataframe
         
         except Exception as e:
             raise MyException(e, sys)
+
+    def stream_data_into_feature_store(self) -> str:
+        """
+        Method: stream_data_into_feature_store
+
+        Description: This method streams data from mongodb to the feature store file chunk by chunk,
+                     so the raw documents of only one batch are held in memory at a time.
+                     In "parallel" export mode the collection is drained as key ranges by several
+                     cursors at once and the ranges are written in ascending key order.
+
+        Output: path of the feature store file, to be read or streamed from.
+
+        On Failure: Write an exception log and then raise an exception
+        """
+        logging.info("Entered stream_data_into_feature_store method of Data_Ingestion class")
+
+        try:
+            feature_store_file_path = self.data_ingestion_config.feature_store_file_path
+            rows = sum(len(chunk) for chunk in self._write_chunks(self._export_chunks(Proj1Data()), feature_store_file_path))
+            if not rows:
+                raise Exception(f"Collection {self.data_ingestion_config.collection_name} returned no documents")
+
+            logging.info(f"Saved {rows} exported rows into feature store file path: {feature_store_file_path}")
+            return feature_store_file_path
+        
+        except Exception as e:
+            raise MyException(e, sys)
     
+    def _export_chunks(self, my_data: Proj1Data) -> Iterator[DataFrame]:
+        """
+        Returns the chunks of the collection from a single cursor, or from several range
+        cursors at once in "parallel" export mode (ranges come out in ascending key order).
+        """
+        batch_size = self.data_ingestion_config.export_batch_size
+        logging.info(f"Streaming data from {my_data.data_source.name} in batches of {batch_size} documents")
+        if self.data_ingestion_config.export_mode == "parallel":
+            n_workers = self.data_ingestion_config.export_workers
+            logging.info(f"Exporting {n_workers} '{self.data_ingestion_config.partition_key}' ranges in parallel")
+            partitions = my_data.export_collection_in_partitions(collection_name=self.data_ingestion_config.collection_name,
+                                                                 n_workers=n_workers,
+                                                                 batch_size=batch_size,
+                                                                 partition_key=self.data_ingestion_config.partition_key,
+                                                                 spill_dir=os.path.dirname(self.data_ingestion_config.feature_store_file_path))
+            return (chunk for _, partition_chunks in partitions for chunk in partition_chunks)
+        return my_data.export_collection_as_chunks(collection_name=self.data_ingestion_config.collection_name,
+                                                   batch_size=batch_size)
+
+    @staticmethod
+    def _write_chunks(chunks: Iterable[DataFrame], file_path: str, columns: Optional[List[str]] = None,
+                      storage_dtypes: Optional[dict] = None) -> Iterator[DataFrame]:
+        """
+        Writes chunks into a single csv, parquet or arrow file as they arrive and yields each written chunk.
+        Chunks are aligned to `columns`, or to the columns of the first chunk, so appended rows line up.
+        Columns of `storage_dtypes` are stored with the same type in every chunk, see DataFrameChunkWriter.
+        """
+        with DataFrameChunkWriter(file_path, storage_dtypes=storage_dtypes) as writer:
+            for i, chunk in enumerate(chunks):
+                if columns is None:
+                    columns = chunk.columns.to_list()
+                chunk = chunk.reindex(columns=columns)
+                writer.write(chunk)
+                logging.info(f"Wrote chunk {i + 1} with {len(chunk)} rows into {file_path}")
+                yield chunk
+
+    @staticmethod
+    def _encode_watermark(value: Any) -> dict:
+        """Converts a watermark value into a yaml friendly dict."""
+        if isinstance(value, ObjectId):
+            return {"type": "objectid", "value": str(value)}
+        if isinstance(value, np.generic):
+            value = value.item()
+        return {"type": type(value).__name__, "value": value}
+
+    @staticmethod
+    def _decode_watermark(watermark: dict) -> Any:
+        """Converts a stored watermark back into a value comparable with the collection key."""
+        if watermark["type"] == "objectid":
+            return ObjectId(watermark["value"])
+        return watermark["value"]
+
+    def update_incremental_store(self) -> dict:
+        """
+        Method: update_incremental_store
+
+        Description: This method fetches only the documents newer than the stored high-water mark with an
+                     indexed range query and appends them as a new partition of the incremental feature store.
+                     With full_refresh the stored partitions and watermark are discarded first.
+
+        Output: manifest of the incremental feature store (watermark, columns and committed partitions)
+
+        On Failure: Write an exception log and then raise an exception
+        """
+        logging.info("Entered update_incremental_store method of Data_Ingestion class")
+
+        try:
+            config = self.data_ingestion_config
+            store_dir = config.incremental_store_dir
+            key = config.watermark_key
+
+            if config.full_refresh and os.path.exists(store_dir):
+                logging.info(f"Full refresh requested, discarding incremental feature store at {store_dir}")
+                shutil.rmtree(store_dir)
+            os.makedirs(store_dir, exist_ok=True)
+
+            # the manifest lists committed partitions, so a partition left behind by a failed run is never read
+            manifest = {"key": key, "watermark": None, "columns": None, "partitions": []}
+            if os.path.exists(config.watermark_file_path):
+                manifest = read_yaml_file(config.watermark_file_path)
+                if manifest["key"] != key:
+                    raise Exception(f"Stored watermark is on '{manifest['key']}' but '{key}' was requested, "
+                                    f"run with full_refresh to rebuild the feature store")
+
+            my_data = Proj1Data()
+            if manifest["columns"] is not None and manifest["columns"] != my_data.column_names:
+                raise Exception(f"Stored partitions have columns {manifest['columns']} but the export now returns "
+                                f"{my_data.column_names}, run with full_refresh to rebuild the feature store")
+            watermark = None if manifest["watermark"] is None else self._decode_watermark(manifest["watermark"])
+            new_watermark = my_data.get_max_value(config.collection_name, key)
+            logging.info(f"Stored watermark: {watermark}, current max '{key}': {new_watermark}")
+
+            if new_watermark is not None and (watermark is None or new_watermark > watermark):
+                # upper bound pins the range so documents inserted while exporting wait for the next run
+                query = {key: {"$lte": new_watermark}}
+                if watermark is not None:
+                    query[key]["$gt"] = watermark
+
+                partition_name = f"part-{len(manifest['partitions']):05d}.{config.file_format}"
+                partition_file_path = os.path.join(store_dir, partition_name)
+                tmp_file_path = os.path.join(store_dir, f".{partition_name}")
+                chunks = my_data.export_collection_as_chunks(collection_name=config.collection_name,
+                                                             batch_size=config.export_batch_size,
+                                                             query=query)
+                rows, columns = 0, manifest["columns"]
+                for chunk in self._write_chunks(chunks, tmp_file_path, columns=columns):
+                    rows += len(chunk)
+                    columns = chunk.columns.to_list()
+
+                if rows:
+                    os.replace(tmp_file_path, partition_file_path)
+                    manifest["partitions"].append(partition_name)
+                    manifest["columns"] = columns
+                manifest["watermark"] = self._encode_watermark(new_watermark)
+                write_yaml_file(config.watermark_file_path, manifest)
+                logging.info(f"Appended partition {partition_name} with {rows} new documents")
+            else:
+                logging.info("No new documents since the stored watermark")
+
+            if not manifest["partitions"]:
+                raise Exception(f"Collection {config.collection_name} returned no documents")
+            return manifest
+
+        except Exception as e:
+            raise MyException(e, sys)
+
+    def _partition_file_paths(self, manifest: dict) -> List[str]:
+        """Committed partitions of the incremental feature store, in the order they were ingested."""
+        return [os.path.join(self.data_ingestion_config.incremental_store_dir, partition_name)
+                for partition_name in manifest["partitions"]]
+
+    def _iter_incremental_partitions(self, manifest: dict, first_partition: int = 0) -> Iterator[DataFrame]:
+        """
+        Yields the committed partitions of the incremental feature store in the order they were ingested,
+        from `first_partition` on.
+        """
+        for file_path in self._partition_file_paths(manifest)[first_partition:]:
+            yield read_dataframe(file_path)
+
+    def ingest_incrementally_into_feature_store(self) -> str:
+        """
+        Method: ingest_incrementally_into_feature_store
+
+        Description: This method updates the incremental feature store with the new documents only
+                     and assembles its partitions into the feature store file of this run, one at a time.
+
+        Output: path of the feature store file, to be read or streamed from.
+
+        On Failure: Write an exception log and then raise an exception
+        """
+        logging.info("Entered ingest_incrementally_into_feature_store method of Data_Ingestion class")
+
+        try:
+            manifest = self.update_incremental_store()
+            feature_store_file_path = self.data_ingestion_config.feature_store_file_path
+            rows = sum(len(chunk) for chunk in self._write_chunks(self._iter_incremental_partitions(manifest),
+                                                                   feature_store_file_path, columns=manifest["columns"]))
+            logging.info(f"Assembled {rows} rows of {len(manifest['partitions'])} partitions into {feature_store_file_path}")
+            return feature_store_file_path
+
+        except Exception as e:
+            raise MyException(e, sys)
+
+    def compact_dataframe(self, dataframe: DataFrame) -> DataFrame:
+        """
+        Method Name: compact_dataframe
+        Description: This method applies the storage dtypes of schema.yaml to the exported dataframe
+                     (int widths from the bounds, float32, categories), and saves a per column memory report.
+
+        Output: dataframe with compact dtypes
+        On Failure: Write an exception log and then raise an exception
+        """
+        logging.info("Entered compact_dataframe method of Data_Ingestion class")
+
+        try:
+            compact_dataframe = cast_storage_dtypes(dataframe, self._storage_dtypes)
+            report = memory_usage_report(dataframe, compact_dataframe)
+            write_yaml_file(self.data_ingestion_config.memory_report_file_path, report)
+            logging.info(f"Feature store dataframe memory: {report['total_bytes_before']} bytes -> "
+                         f"{report['total_bytes_after']} bytes ({report['reduction_factor']}x smaller)")
+            return compact_dataframe
+
+        except Exception as e:
+            raise MyException(e, sys) from e
+
+    def _hash_split_mask(self, dataframe: DataFrame) -> np.ndarray:
+        """
+        Returns True for the rows that belong to the test set, see hash_split_mask.
+        """
+        config = self.data_ingestion_config
+        return hash_split_mask(dataframe, config.split_key, config.train_test_split_ratio)
+
+    def stream_split_into_feature_store(self, manifest: Optional[dict] = None, first_partition: int = 0) -> int:
+        """
+        Method Name: stream_split_into_feature_store
+        Description: This method writes the feature store, train and test files in a single pass over the
+                     exported (or incrementally ingested) chunks, assigning rows by the hash of the split key.
+                     Chunks are stored with the storage dtypes of the schema (see cast_storage_dtypes).
+                     The full dataset is never held in memory, and the memory report is accumulated per chunk.
+                     In incremental mode, only the partitions of `manifest` (the updated store by default)
+                     from `first_partition` on are written, there may be none of them.
+
+        Output: feature store, train and test files and memory report are written, returns the number of rows
+        On Failure: Write an exception log and then raise an exception
+        """
+        logging.info("Entered stream_split_into_feature_store method of Data_Ingestion class")
+
+        try:
+            config = self.data_ingestion_config
+            if config.incremental:
+                manifest = manifest or self.update_incremental_store()
+                chunks, columns = self._iter_incremental_partitions(manifest, first_partition), manifest["columns"]
+            else:
+                chunks, columns = self._export_chunks(Proj1Data()), None
+
+            report = None
+
+            def compact_chunks() -> Iterator[DataFrame]:
+                # the stored chunks are the compact ones, the report compares them with the exported ones
+                nonlocal report
+                for chunk in chunks:
+                    compact_chunk = cast_storage_dtypes(chunk, self._storage_dtypes)
+                    report = self._merge_memory_reports(report, memory_usage_report(chunk, compact_chunk))
+                    yield compact_chunk
+
+            storage_dtypes = self._storage_dtypes
+            with DataFrameChunkWriter(config.training_file_path, storage_dtypes=storage_dtypes) as train_writer, \
+                    DataFrameChunkWriter(config.testing_file_path, storage_dtypes=storage_dtypes) as test_writer:
+                for chunk in self._write_chunks(compact_chunks(), config.feature_store_file_path, columns=columns,
+                                                storage_dtypes=storage_dtypes):
+                    is_test = self._hash_split_mask(chunk)
+                    train_writer.write(chunk[~is_test])
+                    test_writer.write(chunk[is_test])
+
+            if report is None:
+                if first_partition:
+                    logging.info("No partition was added since the production model was trained")
+                    return 0
+                raise Exception(f"Collection {config.collection_name} returned no documents")
+            write_yaml_file(config.memory_report_file_path, report)
+            logging.info(f"Split {train_writer.rows + test_writer.rows} rows into {train_writer.rows} train "
+                         f"and {test_writer.rows} test rows")
+            return train_writer.rows + test_writer.rows
+
+        except Exception as e:
+            raise MyException(e, sys) from e
+
+    @staticmethod
+    def _merge_memory_reports(total: Optional[dict], report: dict) -> dict:
+        """
+        Adds the byte counts of a chunk memory report to the running report.
+        """
+        if total is None:
+            return report
+        for column, usage in report["columns"].items():
+            total["columns"][column]["bytes_before"] += usage["bytes_before"]
+            total["columns"][column]["bytes_after"] += usage["bytes_after"]
+        total["total_bytes_before"] += report["total_bytes_before"]
+        total["total_bytes_after"] += report["total_bytes_after"]
+        total["reduction_factor"] = round(total["total_bytes_before"] / total["total_bytes_after"], 2)
+        return total
+
     def split_data_as_train_test(self, dataframe: DataFrame) -> None:
         """
         Method Name: split_data_as_train_test
-        Description: This method splits the dataframe into train and test set based on split ratio.
+        Description: This method splits the dataframe into train and test set based on split ratio,
+                     either by a stable hash of the split key or by a seeded random split.
 
         Output: Folder is created in s3 bucket
         On Faliure: Write an exception log and then raise exception
@@ -58,7 +373,12 @@ class DataIngestion:
         logging.info("Entered split_data_as_train_test method of Data_Ingestion class")
 
         try:
-            train_set, test_set = train_test_split(dataframe, test_size=self.data_ingestion_config.train_test_split_ratio)
+            if self.data_ingestion_config.split_mode == "hash":
+                is_test = self._hash_split_mask(dataframe)
+                train_set, test_set = dataframe[~is_test], dataframe[is_test]
+            else:
+                train_set, test_set = train_test_split(dataframe, test_size=self.data_ingestion_config.train_test_split_ratio,
+                                                       random_state=self.data_ingestion_config.split_random_state)
             logging.info("Performed train test split on the dataframe")
             logging.info("Exited split_data_train_test method of Data_Ingestion class")
 
@@ -66,13 +386,93 @@ class DataIngestion:
             os.makedirs(dir_path, exist_ok=True)
 
             logging.info("Exporting train and test file path.")
-            train_set.to_csv(self.data_ingestion_config.training_file_path, index=False, header=True)
-            test_set.to_csv(self.data_ingestion_config.testing_file_path, index=False, header=True)
+            write_dataframe(train_set, self.data_ingestion_config.training_file_path)
+            write_dataframe(test_set, self.data_ingestion_config.testing_file_path)
 
             logging.info("Exported train and test file path.")
         except Exception as e:
             raise MyException(e, sys) from e
     
+    def get_source_fingerprint(self, my_data: Proj1Data) -> dict:
+        """
+        Method Name: get_source_fingerprint
+        Description: This method describes the source collection (document count, max '_id' and optionally
+                     the dbHash) together with the ingestion settings that shape the artifacts, and hashes
+                     both into a single key.
+
+        Output: dict with the fingerprint key, the source description and the settings
+        On Failure: Write an exception log and then raise an exception
+        """
+        try:
+            config = self.data_ingestion_config
+            source = my_data.get_collection_fingerprint(config.collection_name, use_db_hash=config.fingerprint_use_db_hash)
+            settings = {
+                "collection_name": config.collection_name,
+                "columns": my_data.column_names,
+                "data_source": my_data.data_source.describe(),
+                "file_format": config.file_format,
+                "export_mode": config.export_mode,
+                "split_mode": config.split_mode,
+                "split_key": config.split_key,
+                "train_test_split_ratio": config.train_test_split_ratio,
+                "split_random_state": config.split_random_state,
+            }
+            if self.trained_partitions is not None:
+                settings["trained_partitions"] = list(self.trained_partitions)
+            key = hashlib.sha256(json.dumps({"source": source, "settings": settings}, sort_keys=True).encode()).hexdigest()
+            return {"fingerprint": key, "source": source, "settings": settings}
+
+        except Exception as e:
+            raise MyException(e, sys) from e
+
+    def _artifact_files(self) -> dict:
+        """Files produced by the ingestion of this run, keyed by role."""
+        config = self.data_ingestion_config
+        return {
+            "feature_store": config.feature_store_file_path,
+            "train": config.training_file_path,
+            "test": config.testing_file_path,
+            "memory_report": config.memory_report_file_path,
+        }
+
+    def reuse_cached_ingestion(self, fingerprint: str) -> bool:
+        """
+        Method Name: reuse_cached_ingestion
+        Description: This method looks for a previous run in the artifact directory whose ingestion has the same
+                     fingerprint and hard-links its feature store, train and test files into this run.
+
+        Output: True when a previous ingestion was reused
+        On Failure: Write an exception log and then raise an exception
+        """
+        try:
+            config = self.data_ingestion_config
+            artifact_root = os.path.dirname(os.path.dirname(config.data_ingestion_dir))
+            fingerprint_file_name = os.path.basename(config.fingerprint_file_path)
+            candidates = glob.glob(os.path.join(artifact_root, "*", os.path.basename(config.data_ingestion_dir),
+                                                fingerprint_file_name))
+            current = os.path.abspath(config.fingerprint_file_path)
+
+            # newest run first
+            for candidate in sorted(candidates, key=os.path.getmtime, reverse=True):
+                if os.path.abspath(candidate) == current:
+                    continue
+                cached = read_yaml_file(candidate)
+                if cached.get("fingerprint") != fingerprint:
+                    continue
+                files = cached.get("files", {})
+                if not all(os.path.exists(files.get(role, "")) for role in self._artifact_files()):
+                    continue
+
+                for role, file_path in self._artifact_files().items():
+                    link_or_copy_file(files[role], file_path)
+                logging.info(f"Source unchanged since {os.path.dirname(candidate)}, reused its ingestion artifacts")
+                return True
+
+            return False
+
+        except Exception as e:
+            raise MyException(e, sys) from e
+
     def initiate_data_ingestion(self) -> DataIngestionArtifact:
         """
         Method Name: initiate_data_ingestion
@@ -83,18 +483,62 @@ class DataIngestion:
         """
 
         try:
-            dataframe = self.export_data_into_feature_store()
+            my_data = Proj1Data()
+            fingerprint = self.get_source_fingerprint(my_data)
+            logging.info(f"Source fingerprint: {fingerprint['fingerprint']} {fingerprint['source']}")
+
+            config = self.data_ingestion_config
+            # a refresh always reads the partitions added since the production model was trained
+            use_cache = config.use_cache and not config.full_refresh and self.trained_partitions is None
+            is_delta, delta_rows = False, None
+            if use_cache and self.reuse_cached_ingestion(fingerprint["fingerprint"]):
+                logging.info("Skipped export, ingestion artifacts reused from cache")
+            elif self.trained_partitions is not None and config.incremental and config.split_mode == "hash":
+                # the hash split keeps every row on its side, so the new partitions hold the new train and test rows
+                manifest = self.update_incremental_store()
+                n_trained = len(self.trained_partitions)
+                is_delta = get_file_ids(self._partition_file_paths(manifest))[:n_trained] == list(self.trained_partitions)
+                if is_delta:
+                    logging.info(f"Ingesting the {len(manifest['partitions']) - n_trained} partitions added since "
+                                 f"the production model was trained")
+                    delta_rows = self.stream_split_into_feature_store(manifest, first_partition=n_trained)
+                else:
+                    logging.info("Partitions do not extend the ones the production model was trained on, "
+                                 "ingesting all of them")
+                    self.stream_split_into_feature_store(manifest)
+            elif self.data_ingestion_config.split_mode == "hash" and self.data_ingestion_config.export_mode != "dataframe":
+                # rows are assigned to train/test while they stream, the full dataset is never loaded
+                self.stream_split_into_feature_store()
+            else:
+                dataframe = self.export_data_into_feature_store()
 
-            logging.info("Got the data from MongoDB")
+                logging.info("Got the data from MongoDB")
 
-            self.split_data_as_train_test(dataframe)
+                dataframe = self.compact_dataframe(dataframe)
+
+                self.split_data_as_train_test(dataframe)
 
             logging.info("Performed train test split on the Dataset")
+            logging.info(f"Data source stats: {my_data.data_source.get_stats()}")
+
+            # recorded last, so that only complete ingestions are ever picked up by the cache
+            write_yaml_file(self.data_ingestion_config.fingerprint_file_path,
+                            dict(fingerprint, files=self._artifact_files()))
+
+            # with the hash split every row of a partition keeps its side in later runs, so the partitions
+            # tell which training rows are new since a model was trained
+            partition_file_paths = None
+            if config.incremental and config.split_mode == "hash" and os.path.exists(config.watermark_file_path):
+                partition_file_paths = self._partition_file_paths(read_yaml_file(config.watermark_file_path))
 
             logging.info("Exited initiate_data_ingestion method of Data_Ingestion class")
 
             data_ingestion_artifact = DataIngestionArtifact(trained_file_path=self.data_ingestion_config.training_file_path,
-                                                            test_file_path=self.data_ingestion_config.testing_file_path)
+                                                            test_file_path=self.data_ingestion_config.testing_file_path,
+                                                            source_fingerprint=fingerprint["fingerprint"],
+                                                            partition_file_paths=partition_file_paths,
+                                                            is_delta=is_delta,
+                                                            delta_rows=delta_rows)
             
             logging.info(f"Data ingestion artifact: {data_ingestion_artifact}")
             return data_ingestion_artifact
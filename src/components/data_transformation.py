@@ -1,116 +1,84 @@
+import glob
+import hashlib
+import json
+import os
 import sys
+from typing import Optional, Tuple
+
+import imblearn
 import numpy as np
 import pandas as pd
-from imblearn.combine import SMOTEENN
-from sklearn.pipeline import Pipeline
-from sklearn.preprocessing import StandardScaler, MinMaxScaler
-from sklearn.compose import ColumnTransformer
+import sklearn
 
-from src.constants import TARGET_COLUMN, SCHEMA_FILE_PATH, CURRENT_YEAR
+from src.constants import TARGET_COLUMN, CURRENT_YEAR
 from src.entity.config_entity import DataTransformationConfig
 from src.entity.artifact_entity import DataIngestionArtifact, DataValidationArtifact, DataTransformationArtifact
+from src.entity import feature_encoder, resampling, schema, transformation_plan
+from src.entity.resampling import rebalance
+from src.entity.schema import load_schema
+from src.entity.transformation_plan import TransformationPlan
 from src.exception import MyException
 from src.logger import logging
-from src.utils.main_utils import read_yaml_file, save_numpy_array_data, save_object
+from src.utils.main_utils import (read_yaml_file, save_numpy_array_data, load_numpy_array_data, save_object,
+                                  cast_storage_dtypes, read_dataframe, write_yaml_file,
+                                  iter_dataframe_chunks, count_dataframe_rows, hash_files, link_or_copy_file)
 
 class DataTransformation:
     def __init__(self, data_ingestion_artifact: DataIngestionArtifact,
                  data_transformation_config: DataTransformationConfig,
-                 data_validation_artifact: DataValidationArtifact):
+                 data_validation_artifact: DataValidationArtifact,
+                 preprocessor: Optional[TransformationPlan] = None):
+        """
+        :param preprocessor: fitted preprocessor of the production model, used as is (no fit) when the ingestion
+                             holds only the rows added since that model was trained
+        """
         try:
             self.data_ingestion_artifact = data_ingestion_artifact
             self.data_transformation_config = data_transformation_config
             self.data_validation_artifact = data_validation_artifact
-            self._schema_config = read_yaml_file(file_path=SCHEMA_FILE_PATH)
+            self.preprocessor = preprocessor
+            self._schema = load_schema()
+            self._storage_dtypes = self._schema.storage_dtypes
         except Exception as e:
             raise MyException(e, sys)
     
     @staticmethod
-    def read_data(file_path) -> pd.DataFrame:
+    def read_data(file_path, storage_dtypes: dict = None) -> pd.DataFrame:
         try:
-            return pd.read_csv(file_path)
+            df = read_dataframe(file_path)
+            return df if storage_dtypes is None else cast_storage_dtypes(df, storage_dtypes)
         except Exception as e:
             raise MyException(e, sys)
     
-    def get_data_transformer_object(self) -> Pipeline:
+    def get_data_transformer_object(self) -> TransformationPlan:
         """
-        Creates and returns a data transformer object for the data including gender mapping,
-        dummy variables creation, column renaming, feature scaling and type adjustments.
+        Creates and returns the transformation plan described by the schema: feature encoding (gender mapping,
+        dummy variables with a fixed vocabulary, id dropped) followed by feature scaling.
         """
         logging.info("Entered get_data_transformer_object method of DataTransformation class")
 
         try:
-            # Initiate transformers
-            numeric_transformer = StandardScaler()
-            min_max_scaler = MinMaxScaler()
-            logging.info("Transformers Initialized: StandardScaler, MinMaxScaler")
-
-            # load schema configuration
-            num_features = self._schema_config['num_features']
-            mn_columns = self._schema_config['mm_columns']
-            logging.info("Cols loaded from schema")
-
-            # creating preprocessor pipeline
-            preprocessor = ColumnTransformer(
-                transformers=[
-                    ("StandardScaler", numeric_transformer, num_features),
-                    ("MinMaxScaler", min_max_scaler, mn_columns)
-                ],
-                remainder='passthrough'
-            )
-
-            # Wrapping everything in a single pipeline
-            final_pipeline = Pipeline(steps=[("Preprocessor", preprocessor)])
-            logging.info("Final Pipeline ready")
+            transformation_plan = TransformationPlan.from_schema(self._schema)
+            logging.info("Transformation plan ready")
             logging.info("Exited get_data_transformer_object method of DataTransformation class")
-            return final_pipeline
+            return transformation_plan
         except Exception as e:
             raise MyException(e, sys) from e
-        
-    def _map_gender_columns(self, df: pd.DataFrame) -> pd.DataFrame:
-        """Map Gender column to 0 for female and 1 for male"""
-        logging.info("Mapping 'Gender' column to binary values")
-        df['Gender'] = df['Gender'].map({'Female': 0, 'Male': 1}).astype(int)
-        return df
     
-    def _create_dummy_columns(self, df: pd.DataFrame) -> pd.DataFrame:
-        """Create dummy variables  for categorical features"""
-        logging.info("Creating dummy variables for categorical features")
-        df = pd.get_dummies(df, drop_first=True)
-        return df
-    
-    def _rename_columns(self, df: pd.DataFrame) -> pd.DataFrame:
-        """Rename specific column and ensure integer types for dummy columns"""
-        logging.info("Renaming specific columns and casting to int")
-        df = df.rename(columns={
-            "Vehicle_Age_< 1 Year": "Vehicle_Age_lt_1_Year",
-            "Vehicle_Age_> 2 Years": "Vehicle_Age_gt_2_Years"
-        })
-        for col in ["Vehicle_Age_lt_1_Year", "Vehicle_Age_gt_2_Years", "Vehicle_Damage_Yes"]:
-            if col in df.columns:
-                df[col] - df[col].astype('int')
-        return df
-    
-    def _drop_id_column(self, df: pd.DataFrame) -> pd.DataFrame:
-        """Drop the 'id' column it it exists."""
-        logging.info("Dropping 'id' column")
-        drop_col = self._schema_config['drop_columns']
-        if drop_col in df.columns:
-            df = df.drop(drop_col, axis=1)
-        return df
-    
-    def initiate_data_transformation(self) -> DataTransformationArtifact:
+    def transform_in_memory(self, preprocessor: TransformationPlan, fit: bool = True) -> Tuple[Optional[dict], dict]:
         """
-        Initiates the data transformation component for the pipeline.
+        Method Name: transform_in_memory
+        Description: This method loads the train and test data, fits the preprocessor on the training data
+                     (unless `fit` is False and it is already fitted), rebalances the classes and saves the
+                     transformed feature matrices and labels.
+
+        Output: Returns the class weights (class_weight strategy only) and the resampling report
+        On Failure: Write an exception log and then raise an exception
         """
         try:
-            logging.info("Data Transformation Started !!!")
-            if not self.data_validation_artifact.validation_status:
-                raise Exception(self.data_validation_artifact.message)
-            
             # load train and test data
-            train_df = self.read_data(file_path=self.data_ingestion_artifact.trained_file_path)
-            test_df = self.read_data(file_path=self.data_ingestion_artifact.test_file_path)
+            train_df = self.read_data(file_path=self.data_ingestion_artifact.trained_file_path, storage_dtypes=self._storage_dtypes)
+            test_df = self.read_data(file_path=self.data_ingestion_artifact.test_file_path, storage_dtypes=self._storage_dtypes)
             logging.info("Train and test data loaded")
 
             input_feature_train_df = train_df.drop(columns=[TARGET_COLUMN], axis=1)
@@ -120,52 +88,254 @@ class DataTransformation:
             target_feature_test_df = test_df[TARGET_COLUMN]
             logging.info("Input and Target cols defined for both train and test df.")
 
-            # apply custom transformation in specified sequence
-            input_feature_train_df = self._map_gender_columns(input_feature_train_df)
-            input_feature_train_df = self._drop_id_column(input_feature_train_df)
-            input_feature_train_df = self._create_dummy_columns(input_feature_train_df)
-            input_feature_train_df = self._rename_columns(input_feature_train_df)
-
-            input_feature_test_df = self._map_gender_columns(input_feature_test_df)
-            input_feature_test_df = self._drop_id_column(input_feature_test_df)
-            input_feature_test_df = self._create_dummy_columns(input_feature_test_df)
-            input_feature_test_df = self._rename_columns(input_feature_test_df)
-            logging.info("Custom transformation applied to train and test feature data")
-
-            logging.info("Starting data transformation")
-            preprocessor = self.get_data_transformer_object()
-            logging.info("Got the preprocessor object")
-
+            # the preprocessor is fitted on the training data only and reused as is for the test data
             logging.info("Initializing transformation for Training-data")
-            input_feature_train_arr = preprocessor.fit_transform(input_feature_train_df)
+            if fit:
+                input_feature_train_arr = preprocessor.fit_transform(input_feature_train_df)
+            else:
+                input_feature_train_arr = preprocessor.transform(input_feature_train_df)
             logging.info("Initializing transformation for Testing-data")
-            input_feature_train_arr = preprocessor.fit_transform(input_feature_test_df)
+            input_feature_test_arr = preprocessor.transform(input_feature_test_df)
             logging.info("Transformation done end-to-end to train-test df")
 
-            logging.info("Applying SMOTEENN for handling imbalanced dataset.")
-            smt = SMOTEENN(sampling_strategy="minority")
-            input_feature_train_final, target_feature_train_final = smt.fit_resample(
-                input_feature_train_df, target_feature_train_df
-            )
-            input_feature_test_final, target_feature_test_final = smt.fit_resample(
-                input_feature_test_df, target_feature_test_df
+            config = self.data_transformation_config
+            logging.info(f"Applying {config.resampling_strategy} for handling imbalanced dataset.")
+            input_feature_train_final, target_feature_train_final, class_weight, train_report = rebalance(
+                input_feature_train_arr, target_feature_train_df, strategy=config.resampling_strategy,
+                n_jobs=config.resampling_n_jobs, random_state=config.resampling_random_state
             )
-            logging.info("SMOTEENN applied to train-test df")
+            resampling_report = {"train": train_report}
+            input_feature_test_final, target_feature_test_final = input_feature_test_arr, target_feature_test_df
+            if config.resample_test and class_weight is None:
+                input_feature_test_final, target_feature_test_final, _, resampling_report["test"] = rebalance(
+                    input_feature_test_arr, target_feature_test_df, strategy=config.resampling_strategy,
+                    n_jobs=config.resampling_n_jobs, random_state=config.resampling_random_state
+                )
             
-            train_arr = np.c_[input_feature_train_final, np.array(target_feature_train_final)]
-            test_arr = np.c_[input_feature_test_final, np.array(target_feature_test_final)]
-            logging.info("feature-target concatenation done for train-test df")
+            # features and labels are stored apart, so no mixed-dtype concatenation is ever built
+            save_numpy_array_data(config.transformed_train_file_path, np.asarray(input_feature_train_final, dtype=np.float32))
+            save_numpy_array_data(config.transformed_test_file_path, np.asarray(input_feature_test_final, dtype=np.float32))
+            save_numpy_array_data(config.transformed_train_label_file_path, np.asarray(target_feature_train_final, dtype=np.int8))
+            save_numpy_array_data(config.transformed_test_label_file_path, np.asarray(target_feature_test_final, dtype=np.int8))
+            return class_weight, resampling_report
+        except Exception as e:
+            raise MyException(e, sys) from e
 
-            save_object(self.data_transformation_config.transformed_object_file_path, preprocessor)
-            save_numpy_array_data(self.data_transformation_config.transformed_train_file_path, train_arr)
-            save_numpy_array_data(self.data_transformation_config.transformed_test_file_path, test_arr)
-            logging.info("Saving transformation object and transformed files.")
+    def _transform_to_files(self, preprocessor: TransformationPlan, file_path: str,
+                            feature_file_path: str, label_file_path: str) -> int:
+        """
+        Streams a dataset through the fitted preprocessor into memory-mapped float32 features and int8 labels.
+        """
+        n_rows = count_dataframe_rows(file_path)
+        os.makedirs(os.path.dirname(feature_file_path), exist_ok=True)
+        # never write through a file hard-linked from a cached run
+        for path in (feature_file_path, label_file_path):
+            if os.path.exists(path):
+                os.remove(path)
+        features = np.lib.format.open_memmap(feature_file_path, mode="w+", dtype=np.float32,
+                                             shape=(n_rows, preprocessor.feature_encoder.n_features_out_))
+        labels = np.lib.format.open_memmap(label_file_path, mode="w+", dtype=np.int8, shape=(n_rows,))
+        offset = 0
+        for chunk in iter_dataframe_chunks(file_path, chunk_size=self.data_transformation_config.chunk_size):
+            chunk = cast_storage_dtypes(chunk, self._storage_dtypes)
+            features[offset:offset + len(chunk)] = preprocessor.transform(chunk)
+            labels[offset:offset + len(chunk)] = chunk[TARGET_COLUMN].to_numpy(dtype=np.int8)
+            offset += len(chunk)
+        if offset != n_rows:
+            raise Exception(f"{file_path} has {offset} rows, {n_rows} were expected")
+        features.flush()
+        labels.flush()
+        return n_rows
+
+    def _rebalance_files(self, feature_file_path: str, label_file_path: str) -> Tuple[Optional[dict], dict]:
+        """
+        Rebalances transformed files in place. The class_weight strategy only reads the labels.
+        """
+        config = self.data_transformation_config
+        features = load_numpy_array_data(feature_file_path, mmap_mode="r")
+        labels = load_numpy_array_data(label_file_path)
+        features_final, labels_final, class_weight, report = rebalance(
+            features, labels, strategy=config.resampling_strategy,
+            n_jobs=config.resampling_n_jobs, random_state=config.resampling_random_state
+        )
+        if features_final is not features:
+            # saved aside and swapped in, the mapped file stays valid until then
+            save_numpy_array_data(feature_file_path, np.asarray(features_final, dtype=np.float32))
+            save_numpy_array_data(label_file_path, np.asarray(labels_final, dtype=np.int8))
+        return class_weight, report
+
+    def transform_out_of_core(self, preprocessor: TransformationPlan, fit: bool = True) -> Tuple[Optional[dict], dict]:
+        """
+        Method Name: transform_out_of_core
+        Description: This method fits the preprocessor over the training data streamed in chunks (partial_fit,
+                     unless `fit` is False and it is already fitted), then streams train and test data through it straight into the memory-mapped output files,
+                     so that no dataset is ever held in memory as a whole.
+
+        Output: Returns the class weights (class_weight strategy only) and the resampling report
+        On Failure: Write an exception log and then raise an exception
+        """
+        try:
+            config = self.data_transformation_config
+            train_file_path = self.data_ingestion_artifact.trained_file_path
+            if fit:
+                for chunk in iter_dataframe_chunks(train_file_path, chunk_size=config.chunk_size):
+                    preprocessor.partial_fit(cast_storage_dtypes(chunk, self._storage_dtypes))
+                logging.info("Preprocessor fitted over the streamed training data")
+
+            train_rows = self._transform_to_files(preprocessor, train_file_path, config.transformed_train_file_path,
+                                                  config.transformed_train_label_file_path)
+            test_rows = self._transform_to_files(preprocessor, self.data_ingestion_artifact.test_file_path,
+                                                 config.transformed_test_file_path, config.transformed_test_label_file_path)
+            logging.info(f"Transformed {train_rows} train and {test_rows} test rows in chunks of {config.chunk_size}")
+
+            logging.info(f"Applying {config.resampling_strategy} for handling imbalanced dataset.")
+            class_weight, train_report = self._rebalance_files(config.transformed_train_file_path,
+                                                               config.transformed_train_label_file_path)
+            resampling_report = {"train": train_report}
+            if config.resample_test and class_weight is None:
+                _, resampling_report["test"] = self._rebalance_files(config.transformed_test_file_path,
+                                                                     config.transformed_test_label_file_path)
+            return class_weight, resampling_report
+        except Exception as e:
+            raise MyException(e, sys) from e
+
+    def get_cache_key(self) -> dict:
+        """
+        Method Name: get_cache_key
+        Description: This method hashes everything the transformed arrays depend on: the ingested data
+                     (its source fingerprint, or the train/test file contents when there is none), schema.yaml,
+                     the settings that change the output and the transformation code with its library versions.
+
+        Output: dict with the fingerprint key and what it was computed from
+        On Failure: Write an exception log and then raise an exception
+        """
+        try:
+            config = self.data_transformation_config
+            artifact = self.data_ingestion_artifact
+            data = artifact.source_fingerprint or hash_files([artifact.trained_file_path, artifact.test_file_path])
+            settings = {
+                "resampling_strategy": config.resampling_strategy,
+                "resampling_random_state": config.resampling_random_state,
+                "resample_test": config.resample_test,
+                # partial_fit over chunks or a single fit, streamed or in-memory arrays
+                "out_of_core": config.out_of_core,
+                "chunk_size": config.chunk_size,
+            }
+            modules = [sys.modules[__name__], feature_encoder, schema, transformation_plan, resampling]
+            code = {
+                "sources": hash_files([module.__file__ for module in modules]),
+                "numpy": np.__version__,
+                "scikit-learn": sklearn.__version__,
+                "imbalanced-learn": imblearn.__version__,
+            }
+            inputs = {"data": data, "schema": self._schema.digest, "settings": settings, "code": code}
+            key = hashlib.sha256(json.dumps(inputs, sort_keys=True).encode()).hexdigest()
+            return dict(inputs, fingerprint=key)
+        except Exception as e:
+            raise MyException(e, sys) from e
+
+    def _artifact_files(self) -> dict:
+        """Files produced by the transformation of this run, keyed by role."""
+        config = self.data_transformation_config
+        return {
+            "preprocessor": config.transformed_object_file_path,
+            "train": config.transformed_train_file_path,
+            "test": config.transformed_test_file_path,
+            "train_labels": config.transformed_train_label_file_path,
+            "test_labels": config.transformed_test_label_file_path,
+            "resampling_report": config.resampling_report_file_path,
+        }
+
+    def reuse_cached_transformation(self, fingerprint: str) -> Optional[dict]:
+        """
+        Method Name: reuse_cached_transformation
+        Description: This method looks for a previous run in the artifact directory whose transformation has the
+                     same fingerprint and hard-links its preprocessor, arrays and report into this run.
+
+        Output: The fingerprint record of the reused run, None when nothing was reused
+        On Failure: Write an exception log and then raise an exception
+        """
+        try:
+            config = self.data_transformation_config
+            artifact_root = os.path.dirname(os.path.dirname(config.data_transformation_dir))
+            candidates = glob.glob(os.path.join(artifact_root, "*", os.path.basename(config.data_transformation_dir),
+                                                os.path.basename(config.fingerprint_file_path)))
+            current = os.path.abspath(config.fingerprint_file_path)
+
+            # newest run first
+            for candidate in sorted(candidates, key=os.path.getmtime, reverse=True):
+                if os.path.abspath(candidate) == current:
+                    continue
+                cached = read_yaml_file(candidate)
+                if cached.get("fingerprint") != fingerprint:
+                    continue
+                files = cached.get("files", {})
+                if not all(os.path.exists(files.get(role, "")) for role in self._artifact_files()):
+                    continue
+
+                for role, file_path in self._artifact_files().items():
+                    link_or_copy_file(files[role], file_path)
+                logging.info(f"Transformation inputs unchanged since {os.path.dirname(candidate)}, reused its artifacts")
+                return cached
+
+            return None
+        except Exception as e:
+            raise MyException(e, sys) from e
+
+    def initiate_data_transformation(self) -> DataTransformationArtifact:
+        """
+        Initiates the data transformation component for the pipeline.
+        """
+        try:
+            logging.info("Data Transformation Started !!!")
+            if not self.data_validation_artifact.validation_status:
+                raise Exception(self.data_validation_artifact.message)
+
+            config = self.data_transformation_config
+            # a delta ingestion goes through the production preprocessor, the full refit is skipped
+            is_delta = self.data_ingestion_artifact.is_delta and self.preprocessor is not None
+            cache_key = self.get_cache_key()
+            logging.info(f"Transformation fingerprint: {cache_key['fingerprint']}")
+            cached = self.reuse_cached_transformation(cache_key["fingerprint"]) \
+                if config.use_cache and not is_delta else None
+            if cached is not None:
+                class_weight = cached.get("class_weight")
+                logging.info("Skipped transformation, artifacts reused from cache")
+            else:
+                logging.info("Starting data transformation")
+                if is_delta:
+                    preprocessor = self.preprocessor
+                    logging.info(f"Transforming the {self.data_ingestion_artifact.delta_rows} new rows with the "
+                                 f"production preprocessor")
+                else:
+                    preprocessor = self.get_data_transformer_object()
+                    logging.info("Got the preprocessor object")
+
+                if config.out_of_core:
+                    class_weight, resampling_report = self.transform_out_of_core(preprocessor, fit=not is_delta)
+                else:
+                    class_weight, resampling_report = self.transform_in_memory(preprocessor, fit=not is_delta)
+                write_yaml_file(config.resampling_report_file_path, resampling_report, replace=True)
+                logging.info(f"{config.resampling_strategy} applied, report saved to {config.resampling_report_file_path}")
+
+                save_object(config.transformed_object_file_path, preprocessor)
+                logging.info("Saving transformation object and transformed files.")
+
+            # recorded last, so that only complete transformations are ever picked up by the cache
+            if not is_delta:
+                write_yaml_file(config.fingerprint_file_path,
+                                dict(cache_key, files=self._artifact_files(), class_weight=class_weight), replace=True)
 
             logging.info("Data transformation created successfully")
             return DataTransformationArtifact(
                 transformed_object_file_path=self.data_transformation_config.transformed_object_file_path,
                 transformed_train_file_path=self.data_transformation_config.transformed_train_file_path,
-                transformed_test_file_path=self.data_transformation_config.transformed_test_file_path
+                transformed_test_file_path=self.data_transformation_config.transformed_test_file_path,
+                transformed_train_label_file_path=self.data_transformation_config.transformed_train_label_file_path,
+                transformed_test_label_file_path=self.data_transformation_config.transformed_test_label_file_path,
+                resampling_report_file_path=self.data_transformation_config.resampling_report_file_path,
+                class_weight=class_weight,
+                fingerprint=cache_key["fingerprint"]
             )
         except Exception as e:
-            raise MyException(e, sys) from e
\ No newline at end of file
+            raise MyException(e, sys) from e
@@ -1,16 +1,21 @@
 import json 
 import sys
 import os
+from typing import Optional
 
-import pandas as pd
+import numpy as np
 from pandas import DataFrame
 
 from src.exception import MyException
 from src.logger import logging
-from src.utils.main_utils import read_yaml_file
+from src.utils.main_utils import iter_dataframe_chunks
 from src.entity.artifact_entity import DataIngestionArtifact, DataValidationArtifact
 from src.entity.config_entity import DataValidationConfig
-from src.constants import SCHEMA_FILE_PATH
+from src.entity.schema import load_schema
+from src.entity.validation_plan import ValidationPlan
+from src.entity.data_sketch import DataSketch, compare_sketches
+from src.cloud_storage.aws_storage import SimpleStorageService
+from src.constants import TARGET_COLUMN
 
 class DataValidation:
     def __init__(self, data_ingestion_artifact: DataIngestionArtifact, data_validation_config: DataValidationArtifact):
@@ -21,62 +26,83 @@ class DataValidation:
         try:
             self.data_ingestion_artifact = data_ingestion_artifact
             self.data_validation_config = data_validation_config
-            self._schema_config = read_yaml_file(file_path=SCHEMA_FILE_PATH)
+            self._schema = load_schema()
+            # the plan is built once from the shared schema and reused for every dataset
+            self.validation_plan = ValidationPlan(self._schema)
         except Exception as e:
             raise MyException(e, sys) from e
     
-    def validate_number_of_columns(self, dataframe: DataFrame) -> bool:
+    @staticmethod
+    def sample_chunk(chunk: DataFrame, fraction: float, random_state: np.random.Generator) -> DataFrame:
         """
-        Method Name: validate_number_of_columns
-        Description: This method validates the number of number of columns
+        Method Name: sample_chunk
+        Description: This method draws the same fraction of rows from every target class of a chunk
+                     (rows with a missing target form their own class), so the sample keeps the class mix.
 
-        Output: Returns bool value based on validation result
+        Output: Returns the sampled rows of the chunk
         On Failure: Write an exception log and then raise an exception
         """
         try:
-            status = len(dataframe.columns) == len(self._schema_config["columns"])
-            logging.info(f"Is required columns present: {status}")
-            return status
+            if TARGET_COLUMN not in chunk.columns:
+                return chunk.sample(frac=fraction, random_state=random_state)
+            return chunk.groupby(TARGET_COLUMN, dropna=False, observed=True, group_keys=False).sample(
+                frac=fraction, random_state=random_state)
         except Exception as e:
             raise MyException(e, sys)
-    
-    def is_column_exist(self, df: DataFrame) -> bool:
+
+    def load_reference_sketch(self) -> Optional[dict]:
         """
-        Method Name: is_column_exist
-        Description: This method validates the existence of numerical and categorical columns
+        Method Name: load_reference_sketch
+        Description: This method loads the sketch of the data the production model was trained on, from the
+                     local reference file when configured, otherwise from the model bucket.
 
-        Output: Returns bool value based on validation results
-        On Failure: Write an exception log and then raise an exception
+        Output: Returns the sketch dict, or None when there is no reference (first model, S3 unreachable)
         """
+        config = self.data_validation_config
         try:
-            dataframe_columns = df.columns
-            missing_numerical_columns = []
-            missing_categorical_columns  = []
-            for column in self._schema_config["numerical_columns"]:
-                if column not in dataframe_columns:
-                    missing_numerical_columns.append(column)
-            
-            if len(missing_numerical_columns) > 0:
-                logging.info(f"Missing numerical column: {missing_numerical_columns}")
+            if config.reference_sketch_file_path is not None:
+                with open(config.reference_sketch_file_path) as file_obj:
+                    return json.load(file_obj)
+            s3 = SimpleStorageService()
+            if not s3.s3_key_path_available(bucket_name=config.reference_bucket_name, s3_key=config.reference_sketch_key):
+                logging.info("No reference sketch stored with the production model")
+                return None
+            file_object = s3.get_file_object(config.reference_sketch_key, bucket_name=config.reference_bucket_name)
+            return json.loads(s3.read_object(file_object, decode=True))
+        except Exception as e:
+            # drift detection is advisory, validation goes on without a reference
+            logging.warning(f"Reference sketch could not be loaded, drift is not checked: {e}")
+            return None
 
-            for column in self._schema_config["categorical_columns"]:
-                if column not in dataframe_columns:
-                    missing_numerical_columns.append(column)
-            
-            if len(missing_numerical_columns) > 0:
-                logging.info(f"Missing categorical column: {missing_categorical_columns}")
+    def validate_file(self, file_path: str, sketch: Optional[DataSketch] = None) -> dict:
+        """
+        Method Name: validate_file
+        Description: This method streams a dataset in chunks of `chunk_size` rows through the validation plan,
+                     so memory is bounded by one chunk. In "sample" mode only a stratified sample of every chunk
+                     is validated and the report carries confidence bounds on the null and violation rates.
+                     The validated rows are also added to `sketch` when given.
 
-            return False if len(missing_numerical_columns) > 0 or len(missing_categorical_columns) > 0 else True
-        except Exception as e:
-            raise MyException
-    
-    @staticmethod
-    def read_data(file_path) -> DataFrame:
+        Output: Returns the validation report of the dataset
+        On Failure: Write an exception log and then raise an exception
+        """
         try:
-            return pd.read_csv(file_path)
+            config = self.data_validation_config
+            sampled = config.mode == "sample"
+            random_state = np.random.default_rng(config.sample_random_state)
+            result = self.validation_plan.new_result()
+            for chunk in iter_dataframe_chunks(file_path, chunk_size=config.chunk_size):
+                if sampled:
+                    rows = len(chunk)
+                    chunk = self.sample_chunk(chunk, config.sample_fraction, random_state)
+                    self.validation_plan.update(result, chunk, sampled_from=rows)
+                else:
+                    self.validation_plan.update(result, chunk)
+                if sketch is not None:
+                    sketch.update(chunk)
+            return self.validation_plan.report(result, confidence=config.sample_confidence)
         except Exception as e:
             raise MyException(e, sys)
-    
+
     def initiate_data_validation(self) -> DataValidationArtifact:
         """
         Method Name: initiate_data_validation
@@ -89,41 +115,46 @@ class DataValidation:
         try:
             validation_error_msg = ""
             logging.info("Starting data validation")
-            train_df, test_df = (DataValidation.read_data(file_path=self.data_ingestion_artifact.trained_file_path),
-                                 DataValidation.read_data(file_path=self.data_ingestion_artifact.test_file_path)) 
-            
-            # Checking col len of dataframe for train/test df
-            status = self.validate_number_of_columns(train_df)
-            if not status:
-                validation_error_msg += f"Columns are missing in traning dataframe"
-            else:
-                logging.info(f"All required colums are present in traning dataframe: {status}")
-            
-            status = self.validate_number_of_columns(test_df)
-            if not status:
-                validation_error_msg += f"Columns are missing in testing dataframe"
-            else:
-                logging.info(f"All required colums are present in testing dataframe: {status}")
-            
-            # Validating col dtype for train/test set
-            status = self.is_column_exist(train_df)
-            if not status:
-                validation_error_msg += f"Columns are missing in traning dataframe"
-            else:
-                logging.info(f"All required colums are present in traning dataframe: {status}")
-
-            status = self.is_column_exist(test_df)
-            if not status:
-                validation_error_msg += f"Columns are missing in testing dataframe"
-            else:
-                logging.info(f"All required colums are present in testing dataframe: {status}")
+
+            # each file is streamed once and every chunk is checked in a single vectorized pass: columns,
+            # dtypes, nulls, bounds and category domains, see ValidationPlan
+            logging.info(f"Validating in {self.data_validation_config.mode} mode, "
+                         f"chunks of {self.data_validation_config.chunk_size} rows")
+            # the training data is sketched while it is validated, on the bins of the reference sketch
+            reference_sketch = self.load_reference_sketch()
+            sketch = DataSketch(self._schema, n_bins=self.data_validation_config.sketch_bins,
+                                reference=reference_sketch)
+            reports = {}
+            for name, file_path in (("training", self.data_ingestion_artifact.trained_file_path),
+                                    ("testing", self.data_ingestion_artifact.test_file_path)):
+                report = self.validate_file(file_path, sketch=sketch if name == "training" else None)
+                reports[name] = report
+                for warning in report["warnings"]:
+                    logging.warning(f"{name} dataframe: {warning}")
+                if not report["status"]:
+                    validation_error_msg += f"Validation failed for {name} dataframe: {'; '.join(report['errors'])}. "
+                else:
+                    logging.info(f"All schema checks passed for {name} dataframe, "
+                                 f"{report['rows']} of {report['scanned_rows']} rows validated")
             
             validation_status = len(validation_error_msg) == 0
 
+            sketch.save(self.data_validation_config.sketch_file_path)
+            drift_report = None
+            if reference_sketch is not None:
+                drift_report = compare_sketches(reference_sketch, sketch.to_dict(),
+                                                psi_threshold=self.data_validation_config.drift_psi_threshold,
+                                                ks_threshold=self.data_validation_config.drift_ks_threshold)
+                logging.info(f"Drift against the production training data: {drift_report['drift_detected']}, "
+                             f"drifted features: {drift_report['drifted_features']}")
+
             data_validation_artifact = DataValidationArtifact(
                 validation_status=validation_status,
                 validation_report_file_path=self.data_validation_config.validation_report_file_path,
-                message=validation_error_msg
+                message=validation_error_msg,
+                sketch_file_path=self.data_validation_config.sketch_file_path,
+                drift_detected=None if drift_report is None else drift_report["drift_detected"],
+                drift_report=drift_report
             )
 
             # ensure the directory for validation_report_file_path exists
@@ -133,7 +164,10 @@ class DataValidation:
             # Save validation status and message to a JSON file
             validation_report = {
                 "validation_status": validation_status,
-                "message": validation_error_msg
+                "message": validation_error_msg,
+                "train": reports["training"],
+                "test": reports["testing"],
+                "drift": drift_report,
             }
 
             with open(self.data_validation_config.validation_report_file_path, "w") as report_file:
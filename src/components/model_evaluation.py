@@ -3,13 +3,14 @@ from src.entity.artifact_entity import ModelTrainerArtifact, DataIngestionArtifa
 from src.exception import MyException
 from src.constants import TARGET_COLUMN
 from src.logger import logging
-from src.utils.main_utils import load_object
+from src.utils.main_utils import load_object, cast_storage_dtypes, read_dataframe
+from src.entity.schema import load_schema
 from src.entity.s3_estimator import Proj1Estimator
 
 from sklearn.metrics import f1_score
 from dataclasses import dataclass
 import sys
-import pandas as  pd
+import pandas as pd
 from typing import Optional
 
 @dataclass
@@ -26,6 +27,7 @@ class ModelEvaluation:
             self.model_eval_config = model_eval_config
             self.data_ingestion_artifact = data_ingestion_artifact   
             self.model_trainer_artifact = model_trainer_artifact
+            self._schema = load_schema()
         except Exception as e:
             raise MyException(e, sys) from e
     
@@ -49,37 +51,42 @@ class ModelEvaluation:
         except Exception as e:
             raise MyException(e, sys)
         
-    def _map_gender_columns(self, df: pd.DataFrame) -> pd.DataFrame:
-        """Map Gender column to 0 for female and 1 for male"""
-        logging.info("Mapping 'Gender' column to binary values")
-        df['Gender'] = df['Gender'].map({'Female': 0, 'Male': 1}).astype(int)
-        return df
-    
-    def _create_dummy_columns(self, df: pd.DataFrame) -> pd.DataFrame:
-        """Create dummy variables  for categorical features"""
-        logging.info("Creating dummy variables for categorical features")
-        df = pd.get_dummies(df, drop_first=True)
-        return df
-    
-    def _rename_columns(self, df: pd.DataFrame) -> pd.DataFrame:
-        """Rename specific column and ensure integer types for dummy columns"""
-        logging.info("Renaming specific columns and casting to int")
-        df = df.rename(columns={
-            "Vehicle_Age_< 1 Year": "Vehicle_Age_lt_1_Year",
-            "Vehicle_Age_> 2 Years": "Vehicle_Age_gt_2_Years"
-        })
-        for col in ["Vehicle_Age_lt_1_Year", "Vehicle_Age_gt_2_Years", "Vehicle_Damage_Yes"]:
-            if col in df.columns:
-                df[col] - df[col].astype('int')
-        return df
-    
-    def _drop_id_column(self, df: pd.DataFrame) -> pd.DataFrame:
-        """Drop the 'id' column it it exists."""
-        logging.info("Dropping 'id' column")
-        if "_id" in df.columns:
-            df = df.drop("_id", axis=1)
-        return df
-    
+    @staticmethod
+    def _legacy_encode(x: pd.DataFrame, feature_names: Optional[list]) -> pd.DataFrame:
+        """
+        Encodes raw features the way models pushed before the feature encoder expect them: Gender mapped to
+        0/1, dummy variables (first level dropped) with the renamed Vehicle_Age columns, laid out as the
+        columns their preprocessor was fitted on (`feature_names`), levels missing from `x` filled with 0.
+        """
+        x = x.astype({column: object for column in x.columns if isinstance(x[column].dtype, pd.CategoricalDtype)})
+        x = x.drop(columns=["_id"], errors="ignore")
+        x["Gender"] = x["Gender"].map({"Female": 0, "Male": 1}).astype(int)
+        x = pd.get_dummies(x, drop_first=True, dtype=int)
+        x = x.rename(columns={"Vehicle_Age_< 1 Year": "Vehicle_Age_lt_1_Year",
+                              "Vehicle_Age_> 2 Years": "Vehicle_Age_gt_2_Years"})
+        return x if feature_names is None else x.reindex(columns=list(feature_names), fill_value=0)
+
+    def get_best_model_f1_score(self, best_model: Proj1Estimator, x: pd.DataFrame, y: pd.Series) -> Optional[float]:
+        """
+        Method Name: get_best_model_f1_score
+        Description: This function scores the production model on the test rows. A model pushed before the
+                     feature encoder (its preprocessor has no transform_record) is given the legacy-encoded
+                     features. A production model that still cannot score them is treated as absent.
+
+        Output: Returns the f1 score of the production model, None when it is incompatible
+        On Failure: Raise the error of loading the production model
+        """
+        loaded_model = best_model.load_model()
+        preprocessor = loaded_model.preprocessing_object
+        try:
+            if not hasattr(preprocessor, "transform_record"):
+                logging.info("Production model predates the feature encoder, giving it legacy-encoded features")
+                x = self._legacy_encode(x, getattr(preprocessor, "feature_names_in_", None))
+            return f1_score(y, loaded_model.predict(x))
+        except Exception as e:
+            logging.warning(f"Production model cannot score the test data, evaluated as absent: {e}")
+            return None
+
     def evaluate_model(self) -> EvaluateModelResponse:
         """
         Method Name: evaluate_model
@@ -90,15 +97,12 @@ class ModelEvaluation:
         On Failure: Write an exception log and then raise an exception
         """
         try:
-            test_df = pd.read_csv(self.data_ingestion_artifact.test_file_path)
+            test_df = cast_storage_dtypes(read_dataframe(self.data_ingestion_artifact.test_file_path),
+                                          self._schema.storage_dtypes)
             x, y = test_df.drop(TARGET_COLUMN, axis=1), test_df[TARGET_COLUMN]
 
-            logging.info("Test data loaded and now transforming it for prediction...")
-
-            x = self._map_gender_columns(x)
-            x = self._drop_id_column(x)
-            x = self._create_dummy_columns(x)
-            x = self._rename_columns(x)
+            # raw features, the feature encoder saved with each model encodes them
+            logging.info("Test data loaded for prediction...")
 
             trained_model = load_object(file_path=self.model_trainer_artifact.trainded_model_file_path)
             logging.info("Trained model exists")
@@ -109,8 +113,7 @@ class ModelEvaluation:
             best_model = self.get_best_model()
             if best_model is not None:
                 logging.info("Computing F1-score for production model")
-                y_hat_best_model = best_model.predict(x)
-                best_model_f1_score = f1_score(y, y_hat_best_model)
+                best_model_f1_score = self.get_best_model_f1_score(best_model, x, y)
                 logging.info(f"f1_score production Model: {best_model_f1_score}, f1_score new trained model: {trained_model_f1_score}")
             
             tmp_best_model_score = 0 if best_model_f1_score is None else best_model_f1_score
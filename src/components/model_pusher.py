@@ -1,21 +1,26 @@
+import os
 import sys
+from typing import Optional
 
 from src.cloud_storage.aws_storage import SimpleStorageService
 from src.exception import MyException
 from src.logger import logging
-from src.entity.artifact_entity import ModelPusherArtifact, ModelEvaluationArtifact
+from src.entity.artifact_entity import ModelPusherArtifact, ModelEvaluationArtifact, DataValidationArtifact
 from src.entity.config_entity import ModelPusherConfig
 from src.entity.s3_estimator import Proj1Estimator
 
 class ModelPusher:
     def __init__(self, model_evaluation_artifact: ModelEvaluationArtifact, 
-                 model_pusher_config: ModelPusherConfig):
+                 model_pusher_config: ModelPusherConfig,
+                 data_validation_artifact: Optional[DataValidationArtifact] = None):
         """
         :param model_evaluation_artifact: Output reference of data evaluation stage
         :param model_pusher_config: Configuration for model pusher
+        :param data_validation_artifact: Output reference of data validation stage, its data sketch is pushed with the model
         """
         self.s3 = SimpleStorageService()
         self.model_evaluation_artifact = model_evaluation_artifact
+        self.data_validation_artifact = data_validation_artifact
         self.model_pusher_config = model_pusher_config
         self.proj1_estimator = Proj1Estimator(bucket_name=model_pusher_config.bucket_name,
                                               model_path=model_pusher_config.s3_model_key_path)
@@ -33,8 +38,21 @@ class ModelPusher:
             logging.info("Uploading artifacts folder to s3 bucket")
             logging.info("Uploading new model to s3 bucket...")
             self.proj1_estimator.save_model(from_file=self.model_evaluation_artifact.trained_model_path)
+
+            # the sketch of the training data becomes the drift reference of the next runs
+            s3_sketch_path = None
+            sketch_file_path = None if self.data_validation_artifact is None else self.data_validation_artifact.sketch_file_path
+            if sketch_file_path is not None and os.path.exists(sketch_file_path):
+                logging.info("Uploading data sketch of the new model to s3 bucket...")
+                self.s3.upload_file(sketch_file_path,
+                                    to_filename=self.model_pusher_config.s3_sketch_key_path,
+                                    bucket_name=self.model_pusher_config.bucket_name,
+                                    remove=False)
+                s3_sketch_path = self.model_pusher_config.s3_sketch_key_path
+
             model_pusher_artifact = ModelPusherArtifact(bucket_name=self.model_pusher_config.bucket_name,
-                                                        s3_model_path=self.model_pusher_config.s3_model_key_path)
+                                                        s3_model_path=self.model_pusher_config.s3_model_key_path,
+                                                        s3_sketch_path=s3_sketch_path)
             
             logging.info("Upload artifacts folder to s3 bucket")
             logging.info(f"Model pusher artifact: {model_pusher_artifact}")
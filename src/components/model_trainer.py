@@ -1,75 +1,234 @@
+import math
+import os
 import sys
-from typing import Tuple
+from typing import Optional, Tuple
 
 import numpy as np
-from sklearn.ensemble import RandomForestClassifier
 from sklearn.metrics import accuracy_score, f1_score, precision_score, recall_score
 
 from src.exception import MyException
 from src.logger import logging
-from src.utils.main_utils import load_numpy_array_data, load_object, save_object
+from src.utils.main_utils import (load_numpy_array_data, load_object, save_object, read_yaml_file, write_yaml_file,
+                                  hash_files, read_dataframe, cast_storage_dtypes, count_dataframe_rows,
+                                  get_file_ids)
+from src.constants import TARGET_COLUMN
 from src.entity.config_entity import ModelTrainerConfig
-from src.entity.artifact_entity import DataTransformationArtifact, ModelTrainerArtifact, ClassificationMetricArtifact
+from src.entity.artifact_entity import (DataIngestionArtifact, DataTransformationArtifact, ModelTrainerArtifact,
+                                        ClassificationMetricArtifact)
 from src.entity.estimator import MyModel
+from src.entity.hyperparameter_search import SuccessiveHalvingSearch
+from src.entity.model_engines import extend_model, train_model
+from src.entity.schema import load_schema
 
 class ModelTrainer:
     def __init__(self, data_transformation_artifact: DataTransformationArtifact,
-                 model_trainer_config: ModelTrainerConfig):
+                 model_trainer_config: ModelTrainerConfig,
+                 data_ingestion_artifact: Optional[DataIngestionArtifact] = None,
+                 current_model: Optional[MyModel] = None):
         """
         :param data_transformation_artifact: Output reference of data transformation artifact stage
         :param model_trainer_config: Configuration for model training
+        :param data_ingestion_artifact: Output reference of data ingestion artifact stage, needed by searches and
+                                        incremental refreshes
+        :param current_model: production model to refresh with the rows of a delta ingestion
         """
         self.data_tansformation_artifact = data_transformation_artifact
         self.model_trainer_config = model_trainer_config
+        self.data_ingestion_artifact = data_ingestion_artifact
+        self.current_model = current_model
+
+    def read_model_config(self) -> dict:
+        """Content of config/model.yaml, empty when there is none."""
+        config = self.model_trainer_config
+        if not os.path.exists(config.model_config_file_path):
+            return {}
+        return read_yaml_file(file_path=config.model_config_file_path) or {}
+
+    def get_resampling_strategy(self) -> str:
+        """Rebalancing strategy the transformation stage applied to the training rows."""
+        return read_yaml_file(self.data_tansformation_artifact.resampling_report_file_path)["train"]["strategy"]
+
+    def load_real_training_rows(self) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Method Name: load_real_training_rows
+        Description: This function encodes the ingested training rows with the fitted preprocessor, without the
+                     rebalancing of the transformation stage, so that rows can be held out that no synthetic
+                     row was derived from.
+
+        Output: Returns the float32 features and the int8 labels of the real training rows
+        On Failure: Write an exception log and then raise an exception
+        """
+        try:
+            if self.data_ingestion_artifact is None:
+                raise Exception("The data ingestion artifact is needed to read the real training rows")
+            preprocessor = load_object(file_path=self.data_tansformation_artifact.transformed_object_file_path)
+            train_df = cast_storage_dtypes(read_dataframe(self.data_ingestion_artifact.trained_file_path),
+                                           load_schema().storage_dtypes)
+            X = np.asarray(preprocessor.transform(train_df.drop(columns=[TARGET_COLUMN])), dtype=np.float32)
+            return X, train_df[TARGET_COLUMN].to_numpy(dtype=np.int8)
+        except Exception as e:
+            raise MyException(e, sys) from e
+
+    def get_model_params(self) -> Tuple[str, dict, Optional[dict]]:
+        """
+        Method Name: get_model_params
+        Description: This function reads the model engine and its parameters from config/model.yaml, the
+                     MODEL_TRAINER constants standing for the forest parameters it does not set. When the
+                     `search` section of the engine is enabled, they are replaced by the best configuration
+                     of a successive halving search on the real training rows (candidates are fitted on
+                     rebalanced rows and scored on held-out real ones), whose finished trials are
+                     memoized in `search_cache_dir`.
+
+        Output: Returns the model engine, its parameters and the search report (None without search)
+        On Failure: Write an exception log and then raise an exception
+        """
+        try:
+            config = self.model_trainer_config
+            model_config = self.read_model_config()
+            engine = model_config.get("engine", config.engine)
+            engine_config = model_config.get(engine) or {}
+            params = {}
+            if engine == "random_forest":
+                params = dict(
+                    n_estimators=config._n_estimators,
+                    min_samples_split=config._min_samples_split,
+                    min_samples_leaf=config._min_samples_leaf,
+                    max_depth=config._max_depth,
+                    criterion=config._criterion,
+                    random_state=config._random_state,
+                )
+            params.update(engine_config.get("params") or {})
+            params["class_weight"] = self.data_tansformation_artifact.class_weight
+
+            search_config = engine_config.get("search") or {}
+            if not search_config.get("enabled", False):
+                return engine, params, None
+
+            logging.info("Searching the model parameters")
+            artifact = self.data_tansformation_artifact
+            data_key = artifact.fingerprint or hash_files([self.data_ingestion_artifact.trained_file_path,
+                                                           artifact.transformed_object_file_path])
+            X_train, y_train = self.load_real_training_rows()
+            search = SuccessiveHalvingSearch.from_config(params, search_config, engine=engine,
+                                                         cache_dir=config.search_cache_dir,
+                                                         resampling_strategy=self.get_resampling_strategy())
+            search_report = search.run(X_train, y_train, data_key=data_key)
+            return engine, search_report["best_params"], search_report
+        except Exception as e:
+            raise MyException(e, sys) from e
     
-    def get_model_object_and_report(self, train: np.array, test: np.array) -> Tuple[object, object]:
+    def get_model_object_and_report(self, X_train: np.array, y_train: np.array, X_test: np.array,
+                                    y_test: np.array, params: dict, engine: str = "random_forest") -> Tuple[object, object, dict]:
         """
         Model Name: get_model_object_and_report
-        Description: This function trains a RandomForestClassifier with specified parameters
+        Description: This function trains the model of `engine` (see src.entity.model_engines) with the given
+                     parameters. The float32 feature matrices are used as given (memory-mapped ones included),
+                     which is the dtype the trees work on, so fitting makes no copy of them.
+                     Training runs on `n_jobs` cores; a forest by threads or by a pool of processes each
+                     fitting a shard of it (`parallel_mode`, see train_forest), gradient boosting by threads.
 
-        Output: Returns metric artifact object and trained model objet
+        Output: Returns trained model object, metric artifact object and the training report
         On Failure: Write an exception log and then raise an exception
         """
         try:
-            logging.info("Training RandomForestClassifier with specified parameters")
-
-            # splitting the train and test data into fetures and target variables
-            X_train, y_train, X_test, y_test = train[:, :-1], train[:, -1], test[:, :-1], test[:, -1]
-            y_train = y_train.astype(int)
-            y_test = y_test.astype(int)
-            X_test = X_test.astype(int)
-            X_train = X_train.astype(int)
-            logging.info("train-test split done")
-
-            # Initialize RandomForestClassifier with specified parameters
-            model = RandomForestClassifier(
-                n_estimators=self.model_trainer_config._n_estimators,
-                min_samples_split=self.model_trainer_config._min_samples_split,
-                min_samples_leaf=self.model_trainer_config._min_samples_leaf,
-                max_depth=self.model_trainer_config._max_depth,
-                criterion=self.model_trainer_config._criterion,
-                random_state=self.model_trainer_config._random_state
-            )
+            logging.info(f"Training {engine} with specified parameters")
+            config = self.model_trainer_config
+            # float32 C-ordered features are what the trees work on, this makes no copy of arrays already in that layout
+            X_train = np.asanyarray(X_train, dtype=np.float32, order="C")
+            if (engine == "random_forest" and config.quality_gate == "oob" and config.parallel_mode == "threads"
+                    and params.get("bootstrap", True)):
+                # the out-of-bag estimate is computed while fitting, on the rows each tree did not see
+                params = dict(params, oob_score=True)
 
             # fit the model
             logging.info("Model training going on...")
-            model.fit(X_train, y_train)
+            model, training_report = train_model(engine, X_train, y_train, params,
+                                                 mode=config.parallel_mode, n_jobs=config.n_jobs)
             logging.info("Model training done.")
 
             # prediction and evaluation metrics
             y_pred = model.predict(X_test)
-            accuracy = accuracy_score(y_test, y_pred)
             f1 = f1_score(y_test, y_pred)
             precision = precision_score(y_test, y_pred)
             recall = recall_score(y_test, y_pred)
 
             # create metric artifact
             metric_artifact = ClassificationMetricArtifact(f1_score=f1, precision=precision, recall_score=recall)
-            return model, metric_artifact
+            return model, metric_artifact, training_report
         
         except Exception as e:
             raise MyException(e, sys) from e
+
+    def estimate_training_accuracy(self, model: object, X_train: np.array, y_train: np.array) -> dict:
+        """
+        Method Name: estimate_training_accuracy
+        Description: This function estimates the training accuracy checked against `expected_accuracy` without
+                     a prediction pass over the whole training set: the out-of-bag score when the forest
+                     computed one, otherwise the accuracy on a random sample of `gate_sample_size` rows.
+
+        Output: Returns a dict with the estimation method, the accuracy and the number of rows it is based on
+        On Failure: Write an exception log and then raise an exception
+        """
+        try:
+            if getattr(model, "oob_score_", None) is not None:
+                return {"method": "oob", "accuracy": float(model.oob_score_), "rows": int(len(y_train))}
+            n_rows = min(len(y_train), self.model_trainer_config.gate_sample_size)
+            rng = np.random.default_rng(self.model_trainer_config._random_state)
+            # sorted, so that a memory-mapped X is read front to back
+            index = np.sort(rng.choice(len(y_train), size=n_rows, replace=False))
+            accuracy = accuracy_score(y_train[index], model.predict(X_train[index]))
+            return {"method": "sample", "accuracy": float(accuracy), "rows": int(n_rows)}
+        except Exception as e:
+            raise MyException(e, sys) from e
     
+    def refresh_model(self, X_train: np.array, y_train: np.array) -> Tuple[MyModel, ClassificationMetricArtifact, dict]:
+        """
+        Method Name: refresh_model
+        Description: This function refreshes the production model with the training rows ingested since it was
+                     trained, instead of training from scratch. The transformation stage encoded them with the
+                     model's own preprocessor and rebalanced them, and the model is grown through warm_start by a
+                     number of trees proportional to their share of the training data (see extend_model).
+                     The refreshed model is scored, and its quality gate checked, on the test rows ingested with
+                     them: real rows the model has never been trained on.
+
+        Output: Returns the refreshed model, its metric artifact and the training report
+        On Failure: Write an exception log and then raise an exception
+        """
+        try:
+            config = self.model_trainer_config
+            current_model = self.current_model
+            state = current_model.training_state
+            model = current_model.trained_model_object
+            if not np.array_equal(np.unique(y_train), model.classes_):
+                raise Exception("The new training rows lack a class, a full build is needed")
+
+            # real rows, before the rebalancing of the transformation stage
+            delta_rows = count_dataframe_rows(self.data_ingestion_artifact.trained_file_path)
+            n_new = max(1, math.ceil(len(model.estimators_) * delta_rows / state["rows"]))
+            X_train = np.asanyarray(X_train, dtype=np.float32, order="C")
+            model, training_report = extend_model(state["engine"], model, X_train, y_train, n_new, n_jobs=config.n_jobs)
+            training_report["real_rows"] = int(delta_rows)
+
+            refreshed_model = MyModel(preprocessing_object=current_model.preprocessing_object, trained_model_object=model,
+                                      training_state=dict(state, rows=state["rows"] + delta_rows,
+                                                          partitions=get_file_ids(self.data_ingestion_artifact.partition_file_paths),
+                                                          refreshes=state["refreshes"] + 1))
+
+            # test rows are raw, the refreshed model keeps the preprocessor it was trained with
+            test_df = cast_storage_dtypes(read_dataframe(self.data_ingestion_artifact.test_file_path),
+                                          load_schema().storage_dtypes)
+            y_test = test_df[TARGET_COLUMN].to_numpy()
+            y_pred = refreshed_model.predict(test_df.drop(columns=[TARGET_COLUMN]))
+            metric_artifact = ClassificationMetricArtifact(f1_score=f1_score(y_test, y_pred),
+                                                           precision=precision_score(y_test, y_pred),
+                                                           recall_score=recall_score(y_test, y_pred))
+            training_report["quality_gate"] = {"method": "holdout", "accuracy": float(accuracy_score(y_test, y_pred)),
+                                               "rows": int(len(y_test))}
+            logging.info(f"Refreshed the production model with {delta_rows} new training rows: {training_report}")
+            return refreshed_model, metric_artifact, training_report
+        except Exception as e:
+            raise MyException(e, sys) from e
+
     def initiate_model_trainer(self) -> ModelTrainerArtifact:
         logging.info("Entered initiate_model_trainer method of ModelTrainer class")
         """
@@ -82,41 +241,59 @@ class ModelTrainer:
         try:
             print("----------------------------------------------------------------------------------------------------")
             print("Starting Model Trainer Component")
-            # load the transformed train and test data
-            train_arr = load_numpy_array_data(file_path=self.data_tansformation_artifact.transformed_train_file_path)
-            test_arr = load_numpy_array_data(file_path=self.data_tansformation_artifact.transformed_test_file_path)
+            # map the transformed feature matrices copy-on-write: read on access and never copied, yet writable as
+            # the NaN checks of sklearn require, the files themselves are never modified; load the small label vectors
+            artifact = self.data_tansformation_artifact
+            X_train = load_numpy_array_data(file_path=artifact.transformed_train_file_path, mmap_mode="c")
+            X_test = load_numpy_array_data(file_path=artifact.transformed_test_file_path, mmap_mode="c")
+            y_train = load_numpy_array_data(file_path=artifact.transformed_train_label_file_path)
+            y_test = load_numpy_array_data(file_path=artifact.transformed_test_label_file_path)
             logging.info("train-test data loaded")
 
-            # train model and get artifact
-            trained_model, metric_artifact = self.get_model_object_and_report(train=train_arr, test=test_arr)
-            logging.info("Model object and artifact loaded")
-
-            # load preprocessing object
-            preprocessing_obj = load_object(file_path=self.data_tansformation_artifact.transformed_object_file_path)
-            logging.info("Preprocessing obj loaded")
+            config = self.model_trainer_config
+            search_report = None
+            if self.current_model is not None and getattr(self.data_ingestion_artifact, "is_delta", False):
+                my_model, metric_artifact, training_report = self.refresh_model(X_train, y_train)
+            else:
+                # train model and get artifact
+                engine, params, search_report = self.get_model_params()
+                if search_report is not None:
+                    write_yaml_file(config.search_report_file_path, search_report)
+                trained_model, metric_artifact, training_report = self.get_model_object_and_report(
+                    X_train=X_train, y_train=y_train, X_test=X_test, y_test=y_test, params=params, engine=engine)
+                training_report["quality_gate"] = self.estimate_training_accuracy(trained_model, X_train, y_train)
 
-            # Ensure both arrays are int type before accuracy_score
-            y_true = train_arr[:, -1]
-            y_pred = trained_model.predict(train_arr[:, :-1])
+                # load preprocessing object
+                preprocessing_obj = load_object(file_path=self.data_tansformation_artifact.transformed_object_file_path)
+                logging.info("Preprocessing obj loaded")
 
-            # Convert to int if not already
-            y_true = y_true.astype(int)
-            y_pred = y_pred.astype(int)
+                # what the model is trained on, for the incremental refreshes that follow
+                training_rows = (count_dataframe_rows(self.data_ingestion_artifact.trained_file_path)
+                                 if self.data_ingestion_artifact is not None else int(len(y_train)))
+                partition_file_paths = getattr(self.data_ingestion_artifact, "partition_file_paths", None)
+                training_state = {"engine": engine, "rows": training_rows,
+                                  "partitions": get_file_ids(partition_file_paths) if partition_file_paths else None,
+                                  "refreshes": 0}
+                my_model = MyModel(preprocessing_object=preprocessing_obj, trained_model_object=trained_model,
+                                   training_state=training_state)
+            write_yaml_file(config.training_report_file_path, training_report)
+            logging.info(f"Model object and artifact loaded, training accuracy: {training_report['quality_gate']}")
 
-            if accuracy_score(y_true, y_pred) < self.model_trainer_config.expected_accuracy:
+            if training_report["quality_gate"]["accuracy"] < config.expected_accuracy:
                 logging.info("No model found with score above the base score")
                 raise Exception("No model found with score above the base score")
 
             # Save the final model object that includes both preprocessing and the trained model
             logging.info("Saving new model as performance is better than previous one")
-            my_model = MyModel(preprocessing_object=preprocessing_obj, trained_model_object=trained_model)
             save_object(self.model_trainer_config.trained_model_file_path, my_model)
             logging.info("Saved final model object that includes both preprocessing and the trained model")
 
             # Create and return the ModelTrainerArtifact
             model_trainer_artifact = ModelTrainerArtifact(
                 trainded_model_file_path=self.model_trainer_config.trained_model_file_path,
-                metric_artifact=metric_artifact
+                metric_artifact=metric_artifact,
+                training_report_file_path=self.model_trainer_config.training_report_file_path,
+                search_report_file_path=None if search_report is None else self.model_trainer_config.search_report_file_path
             )
             logging.info(f"Model Trainer Artifact: {model_trainer_artifact}")
             return model_trainer_artifact
@@ -1,16 +1,168 @@
 import os
 import sys
+import threading
+import warnings
+from collections import defaultdict
+from typing import Any
+
+import bson
 import pymongo
 import certifi
+from pymongo import monitoring
+from pymongo.compression_support import validate_compressors
 
 from src.exception import MyException
 from src.logger import logging
-from src.constants import DATABASE_NAME, MONGODB_URL_KEY
+from src.constants import (DATABASE_NAME, MONGODB_URL_KEY, MONGODB_MAX_POOL_SIZE, MONGODB_MIN_POOL_SIZE,
+                           MONGODB_MAX_IDLE_TIME_MS, MONGODB_COMPRESSORS, MONGODB_READ_PREFERENCE,
+                           MONGODB_CONNECT_TIMEOUT_MS, MONGODB_SERVER_SELECTION_TIMEOUT_MS,
+                           MONGODB_SOCKET_TIMEOUT_MS, MONGODB_WAIT_QUEUE_TIMEOUT_MS, MONGODB_STATS_ENABLED,
+                           MONGODB_STATS_COUNT_BYTES)
 logging.getLogger("pymongo").setLevel(logging.ERROR)
 
 # load the certificate authority file to avoid timeout error when connecting to MongoDB
 ca = certifi.where()
 
+
+def get_mongodb_setting(name: str, default: Any) -> Any:
+    """
+    Returns the environment variable `name` converted to the type of `default`, or `default` when it is not set.
+    """
+    value = os.getenv(name)
+    if value is None:
+        return default
+    if isinstance(default, bool):
+        return value.strip().lower() in ("1", "true", "yes")
+    return type(default)(value)
+
+
+def get_mongodb_client_options() -> dict:
+    """
+    Builds the MongoClient keyword arguments from the MONGODB_* constants and their environment overrides.
+    """
+    def timeout(name: str, default: int):
+        # pymongo expects None, not 0, for "no timeout"
+        return get_mongodb_setting(name, default) or None
+
+    with warnings.catch_warnings():
+        # compressors whose module is not installed are dropped instead of warned about on every run
+        warnings.simplefilter("ignore")
+        compressors = validate_compressors(None, get_mongodb_setting("MONGODB_COMPRESSORS", MONGODB_COMPRESSORS))
+
+    options = {
+        "maxPoolSize": get_mongodb_setting("MONGODB_MAX_POOL_SIZE", MONGODB_MAX_POOL_SIZE),
+        "minPoolSize": get_mongodb_setting("MONGODB_MIN_POOL_SIZE", MONGODB_MIN_POOL_SIZE),
+        "maxIdleTimeMS": timeout("MONGODB_MAX_IDLE_TIME_MS", MONGODB_MAX_IDLE_TIME_MS),
+        "readPreference": get_mongodb_setting("MONGODB_READ_PREFERENCE", MONGODB_READ_PREFERENCE),
+        "connectTimeoutMS": timeout("MONGODB_CONNECT_TIMEOUT_MS", MONGODB_CONNECT_TIMEOUT_MS),
+        "serverSelectionTimeoutMS": timeout("MONGODB_SERVER_SELECTION_TIMEOUT_MS", MONGODB_SERVER_SELECTION_TIMEOUT_MS),
+        "socketTimeoutMS": timeout("MONGODB_SOCKET_TIMEOUT_MS", MONGODB_SOCKET_TIMEOUT_MS),
+        "waitQueueTimeoutMS": timeout("MONGODB_WAIT_QUEUE_TIMEOUT_MS", MONGODB_WAIT_QUEUE_TIMEOUT_MS),
+    }
+    if compressors:
+        options["compressors"] = compressors
+    return options
+
+
+class MongoDBStats(monitoring.CommandListener, monitoring.ConnectionPoolListener):
+    """
+    Collects connection pool and command statistics of a MongoClient through pymongo monitoring.
+
+    Events are delivered on the threads running the operations, so counters are updated under a lock.
+    Checkout wait is the time an operation waited for a pooled connection; a max in-use count equal to
+    maxPoolSize together with growing waits means the pool is starved.
+    """
+
+    def __init__(self, count_bytes: bool = MONGODB_STATS_COUNT_BYTES) -> None:
+        self.count_bytes = count_bytes
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self) -> None:
+        with self._lock:
+            self.pool = defaultdict(float)
+            self.commands = defaultdict(lambda: defaultdict(float))
+
+    def snapshot(self) -> dict:
+        """
+        Returns the statistics collected since the last reset as plain numbers.
+        """
+        with self._lock:
+            pool = dict(self.pool)
+            commands = {name: dict(values) for name, values in self.commands.items()}
+        checkouts = pool.get("checkouts", 0)
+        pool["avg_wait_ms"] = pool.get("wait_ms", 0) / checkouts if checkouts else 0.0
+        for values in commands.values():
+            values["avg_ms"] = values.get("total_ms", 0) / values["count"] if values.get("count") else 0.0
+        return {"pool": pool, "commands": commands}
+
+    # command monitoring
+    def started(self, event: monitoring.CommandStartedEvent) -> None:
+        pass
+
+    def succeeded(self, event: monitoring.CommandSucceededEvent) -> None:
+        duration_ms = event.duration_micros / 1000
+        reply_bytes = len(bson.encode(event.reply)) if self.count_bytes else 0
+        with self._lock:
+            command = self.commands[event.command_name]
+            command["count"] += 1
+            command["total_ms"] += duration_ms
+            command["max_ms"] = max(command["max_ms"], duration_ms)
+            if self.count_bytes:
+                command["bytes_received"] += reply_bytes
+                self.pool["bytes_received"] += reply_bytes
+
+    def failed(self, event: monitoring.CommandFailedEvent) -> None:
+        with self._lock:
+            self.commands[event.command_name]["failures"] += 1
+
+    # connection pool monitoring
+    def pool_created(self, event) -> None:
+        pass
+
+    def pool_ready(self, event) -> None:
+        pass
+
+    def pool_cleared(self, event) -> None:
+        with self._lock:
+            self.pool["pool_cleared"] += 1
+
+    def pool_closed(self, event) -> None:
+        pass
+
+    def connection_created(self, event) -> None:
+        with self._lock:
+            self.pool["connections_created"] += 1
+
+    def connection_ready(self, event) -> None:
+        pass
+
+    def connection_closed(self, event) -> None:
+        with self._lock:
+            self.pool["connections_closed"] += 1
+
+    def connection_check_out_started(self, event) -> None:
+        pass
+
+    def connection_check_out_failed(self, event: monitoring.ConnectionCheckOutFailedEvent) -> None:
+        with self._lock:
+            self.pool["checkout_failures"] += 1
+            self.pool["wait_ms"] += event.duration * 1000
+
+    def connection_checked_out(self, event: monitoring.ConnectionCheckedOutEvent) -> None:
+        wait_ms = event.duration * 1000
+        with self._lock:
+            self.pool["checkouts"] += 1
+            self.pool["wait_ms"] += wait_ms
+            self.pool["max_wait_ms"] = max(self.pool["max_wait_ms"], wait_ms)
+            self.pool["in_use"] += 1
+            self.pool["max_in_use"] = max(self.pool["max_in_use"], self.pool["in_use"])
+
+    def connection_checked_in(self, event) -> None:
+        with self._lock:
+            self.pool["in_use"] -= 1
+
+
 class MongoDBClient:
     """
     MongoDBClient is reponsible for establishing a connection to the MongoDB database.
@@ -19,6 +171,8 @@ class MongoDBClient:
     ----------
     client: MongoClient
         A shared MongoClient instance for the class.
+    stats: MongoDBStats
+        Pool and command statistics of the shared client.
     database: Database
         The specific database instance that MongoDBClient connects to.
          
@@ -26,9 +180,12 @@ class MongoDBClient:
     -------
     __init__(database_name: str) -> None:
         Intializes the MongoDB connection using the given database name.
+    get_stats() -> dict:
+        Returns the statistics collected by the shared client.
     """
 
     client = None # Shared MongoClient instance accross all MongoDBClient instance
+    stats = None # MongoDBStats listener of the shared client, None when MONGODB_STATS_ENABLED is off
 
     def __init__(self, database_name: str = DATABASE_NAME) -> None:
         """
@@ -51,8 +208,16 @@ class MongoDBClient:
                 if mongo_db_url is None:
                     raise Exception(f"Environment variable '{MONGODB_URL_KEY}' is not set.")
                 
-                # Establish a new MongoDB client connection
-                MongoDBClient.client = pymongo.MongoClient(mongo_db_url, tlsCAFile=ca)
+                # Establish a new MongoDB client connection with the tuned pool, timeouts and compression
+                options = get_mongodb_client_options()
+                event_listeners = []
+                if get_mongodb_setting("MONGODB_STATS_ENABLED", MONGODB_STATS_ENABLED):
+                    MongoDBClient.stats = MongoDBStats(
+                        count_bytes=get_mongodb_setting("MONGODB_STATS_COUNT_BYTES", MONGODB_STATS_COUNT_BYTES))
+                    event_listeners.append(MongoDBClient.stats)
+                MongoDBClient.client = pymongo.MongoClient(mongo_db_url, tlsCAFile=ca, event_listeners=event_listeners,
+                                                           **options)
+                logging.info(f"Created MongoClient with {options}")
             
             # Use the shared MongoClient for this instance
             self.client = MongoDBClient.client
@@ -62,4 +227,24 @@ class MongoDBClient:
 
         except Exception as e:
             # Raise a custom exception with traceback details if connection fails
-            raise MyException(e, sys)
\ No newline at end of file
+            raise MyException(e, sys)
+
+    @classmethod
+    def get_stats(cls) -> dict:
+        """
+        Returns the pool and command statistics of the shared client since the last reset,
+        with the configured maxPoolSize to compare `max_in_use` against.
+        """
+        if cls.stats is None:
+            return {}
+        stats = cls.stats.snapshot()
+        stats["pool"]["max_pool_size"] = get_mongodb_setting("MONGODB_MAX_POOL_SIZE", MONGODB_MAX_POOL_SIZE)
+        return stats
+
+    @classmethod
+    def reset_stats(cls) -> None:
+        """
+        Clears the statistics of the shared client, e.g. between benchmark runs.
+        """
+        if cls.stats is not None:
+            cls.stats.reset()
@@ -6,6 +6,29 @@ DATABASE_NAME = "Proj1"
 COLLECTION_NAME = "Proj1-Data"
 MONGODB_URL_KEY = "MONGODB_URL"
 
+# MongoClient tuning, each value can be overridden by an environment variable of the same name.
+# Compressors missing on the client (zstd needs zstandard, snappy needs python-snappy) are skipped,
+# the server picks the first one it also supports. Timeouts of 0 mean no timeout.
+MONGODB_MAX_POOL_SIZE = 100
+MONGODB_MIN_POOL_SIZE = 0
+MONGODB_MAX_IDLE_TIME_MS = 0
+MONGODB_COMPRESSORS = "zstd,snappy,zlib"
+MONGODB_READ_PREFERENCE = "primary"  # "secondaryPreferred" moves export reads off the primary
+MONGODB_CURSOR_BATCH_SIZE = 0  # documents per cursor round-trip, 0 uses the export chunk size
+MONGODB_CONNECT_TIMEOUT_MS = 20000
+MONGODB_SERVER_SELECTION_TIMEOUT_MS = 30000
+MONGODB_SOCKET_TIMEOUT_MS = 0
+MONGODB_WAIT_QUEUE_TIMEOUT_MS = 0
+MONGODB_STATS_ENABLED = True
+MONGODB_STATS_COUNT_BYTES = False  # re-encodes every reply to measure it, costs client CPU
+
+# Backend Proj1Data reads from: "mongodb" or "local" (snapshot directory of parquet/csv/arrow files),
+# overridden by the DATA_SOURCE_BACKEND / LOCAL_SNAPSHOT_DIR environment variables
+DATA_SOURCE_BACKEND_KEY = "DATA_SOURCE_BACKEND"
+DATA_SOURCE_BACKEND = "mongodb"
+LOCAL_SNAPSHOT_DIR_KEY = "LOCAL_SNAPSHOT_DIR"
+LOCAL_SNAPSHOT_DIR = os.path.join("data", "snapshot")
+
 PIPELINE_NAME: str = ""
 ARTIFACT_DIR: str = "artifact"
 
@@ -18,6 +41,7 @@ PREPROCESSING_OBJECT_FILE_NAME = "preprocessing.pkl"
 FILE_NAME = "data.csv"
 TRAIN_FILE_NAME = "train.csv"
 TEST_FILE_NAME = "test.csv"
+ARTIFACT_PARQUET_COMPRESSION = "snappy"
 SCHEMA_FILE_PATH = os.path.join("config", "schema.yaml")
 
 AWS_ACCESS_ID_ENV_KEY = "AWS_ACCESS_KEY_ID"
@@ -33,12 +57,43 @@ DATA_INGESTION_DIR_NAME = "data_ingestion"
 DATA_INGESTION_FEATURE_STORE_DIR = "feature_store"
 DATA_INGESTION_INGESTED_DIR = "ingested"
 DATA_INGESTION_TRAIN_TEST_SPLIT_RATIO = 0.25
+DATA_INGESTION_SPLIT_MODE = "hash"  # "hash" (stable, streaming) or "random"
+DATA_INGESTION_SPLIT_KEY = "id"
+DATA_INGESTION_SPLIT_RANDOM_STATE = 42
+HASH_SPLIT_BUCKETS = 10000
+DATA_INGESTION_ARTIFACT_FORMAT = "parquet"  # "csv", "parquet" or "arrow"
+DATA_INGESTION_EXPORT_MODE = "stream"  # "stream", "parallel" or "dataframe"
+DATA_INGESTION_EXPORT_BATCH_SIZE = 50000
+DATA_INGESTION_EXPORT_WORKERS = 4
+DATA_INGESTION_PARTITION_KEY = "_id"
+DATA_INGESTION_SERVER_SIDE_COERCION = True
+DATA_INGESTION_INCREMENTAL = False
+DATA_INGESTION_FULL_REFRESH = False
+DATA_INGESTION_INCREMENTAL_STORE_DIR = os.path.join(ARTIFACT_DIR, "incremental_feature_store")
+DATA_INGESTION_WATERMARK_FILE_NAME = "watermark.yaml"
+DATA_INGESTION_WATERMARK_KEY = "_id"
+DATA_INGESTION_MEMORY_REPORT_FILE_NAME = "memory_report.yaml"
+DATA_INGESTION_FINGERPRINT_FILE_NAME = "fingerprint.yaml"
+DATA_INGESTION_CACHE_ENABLED = True
+DATA_INGESTION_FINGERPRINT_USE_DB_HASH = False
 
 """
 Data Validation related constants start with DATA_VALIDATION VAR NAME.
 """
 DATA_VALIDATION_DIR_NAME: str = "data_validation"
 DATA_VALIDATION_REPORT_FILE_NAME: str = "report.yaml"
+DATA_VALIDATION_CHUNK_SIZE: int = 100000
+# "full" validates every row, "sample" a stratified sample with confidence bounds on the rates;
+# the DATA_VALIDATION_MODE environment variable overrides it, e.g. for a scheduled full pass
+DATA_VALIDATION_MODE: str = os.getenv("DATA_VALIDATION_MODE", "full")
+DATA_VALIDATION_SAMPLE_FRACTION: float = 0.05
+DATA_VALIDATION_SAMPLE_CONFIDENCE: float = 0.95
+DATA_VALIDATION_SAMPLE_RANDOM_STATE: int = 42
+DATA_VALIDATION_SKETCH_FILE_NAME: str = "data_sketch.json"
+DATA_VALIDATION_SKETCH_BINS: int = 20
+DATA_VALIDATION_DRIFT_PSI_THRESHOLD: float = 0.2
+DATA_VALIDATION_DRIFT_KS_THRESHOLD: float = 0.1
+DATA_VALIDATION_SKIP_TRAINING_WITHOUT_DRIFT: bool = False
 
 """
 Data Transformation related constant start with DATA_TRANSFORMATION VAL NAME.
@@ -46,6 +101,24 @@ Data Transformation related constant start with DATA_TRANSFORMATION VAL NAME.
 DATA_TRANSFORMATION_DIR_NAME: str = "data_transformation"
 DATA_TRANSFORMATION_TRANSFORMED_DATA_DIR: str = "transformed"
 DATA_TRANSFORMATION_TRANSFORMED_OBJECT_DIR: str = "transformed_object"
+# features are float32 matrices, labels a separate int8 vector, both plain .npy files the trainer memory-maps
+DATA_TRANSFORMATION_TRAIN_LABEL_FILE_NAME: str = "train_labels.npy"
+DATA_TRANSFORMATION_TEST_LABEL_FILE_NAME: str = "test_labels.npy"
+# out-of-core mode fits the preprocessor chunk by chunk (partial_fit) and writes the transformed chunks
+# straight into the memory-mapped .npy files; memory stays bounded by a chunk with the "class_weight"
+# strategy, the resampling strategies load the training matrix to resample it
+DATA_TRANSFORMATION_OUT_OF_CORE: bool = False
+DATA_TRANSFORMATION_CHUNK_SIZE: int = 100000
+# a run reuses the arrays and preprocessor of a previous run with the same input fingerprint, schema,
+# settings and transformation code (see DataTransformation.get_cache_key)
+DATA_TRANSFORMATION_CACHE_ENABLED: bool = True
+DATA_TRANSFORMATION_FINGERPRINT_FILE_NAME: str = "fingerprint.yaml"
+# "smoteenn", "smote_approx", "random_over", "random_under" or "class_weight" (see src/entity/resampling.py)
+DATA_TRANSFORMATION_RESAMPLING_STRATEGY: str = "smoteenn"
+DATA_TRANSFORMATION_RESAMPLING_N_JOBS: int = -1
+DATA_TRANSFORMATION_RESAMPLING_RANDOM_STATE: int = 42
+DATA_TRANSFORMATION_RESAMPLE_TEST: bool = False  # the test set keeps its real class balance
+DATA_TRANSFORMATION_RESAMPLING_REPORT_FILE_NAME: str = "resampling_report.yaml"
 
 """
 Model Trainer related constants start with MODEL_TRAINER VAR NAME.
@@ -61,6 +134,22 @@ MODEL_TRAINER_MIN_SAMPLES_LEAF = 6
 MIN_SAMPLES_SPLIT_MAX_DEPTH = 10
 MIN_SAMPLES_SPLIT_CRITERION = 'entropy'
 MIN_SAMPLES_SPLIT_RANDOM_STATE = 101
+MODEL_TRAINER_ENGINE: str = "random_forest"  # when config/model.yaml names none, see src.entity.model_engines
+MODEL_TRAINER_PARALLEL_MODE: str = "threads"  # or "processes", see src.entity.parallel_forest
+MODEL_TRAINER_N_JOBS: int = -1
+# training accuracy checked against MODEL_TRAINER_EXPECTED_SCORE: "oob" (out-of-bag estimate of the forest,
+# threads mode) or "sample" (prediction on a sample of the training rows, the fallback of every other model)
+MODEL_TRAINER_QUALITY_GATE: str = "oob"
+MODEL_TRAINER_GATE_SAMPLE_SIZE: int = 50000
+# "full": every run trains from scratch; "incremental": the production random forest is grown with trees fitted
+# on the training rows ingested since it was trained, rebuilt in full every few refreshes (other engines always are);
+# only the new rows are ingested, validated and transformed, which needs the incremental ingestion with the hash split
+MODEL_TRAINER_REFRESH_MODE: str = "full"
+MODEL_TRAINER_FULL_REBUILD_EVERY: int = 7
+MODEL_TRAINER_TRAINING_REPORT_FILE_NAME: str = "training_report.yaml"
+MODEL_TRAINER_SEARCH_REPORT_FILE_NAME: str = "search_report.yaml"
+# shared by every run, so that repeated or interrupted searches reuse the trials already scored
+MODEL_TRAINER_SEARCH_CACHE_DIR: str = os.path.join(ARTIFACT_DIR, "hyperparameter_search")
 
 """
 Model Evaluation related constants
@@ -68,6 +157,7 @@ Model Evaluation related constants
 MODEL_EVALUATION_CHANGED_THRESHOLD_SCORE = 0.02
 MODEL_BUCKET_NAME = "vehi-insu-mlopsproj"
 MODEL_PUSHER_S3_KEY = "model-registry"
+MODEL_SKETCH_KEY = "data_sketch.json"
 
 APP_HOST = "0.0.0.0"
 APP_PORT = 5000
\ No newline at end of file
@@ -0,0 +1,393 @@
+import glob
+import hashlib
+import os
+import sys
+from abc import ABC, abstractmethod
+from typing import Any, Iterator, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+from bson import ObjectId
+from pymongo.errors import OperationFailure
+
+from src.configuration.mongo_db_connection import MongoDBClient, get_mongodb_setting
+from src.constants import (DATABASE_NAME, DATA_INGESTION_EXPORT_BATCH_SIZE, DATA_INGESTION_SERVER_SIDE_COERCION,
+                           DATA_SOURCE_BACKEND, DATA_SOURCE_BACKEND_KEY, LOCAL_SNAPSHOT_DIR, LOCAL_SNAPSHOT_DIR_KEY,
+                           MONGODB_CURSOR_BATCH_SIZE)
+from src.exception import MyException
+from src.logger import logging
+
+# target types of the $convert operator for the numeric dtypes declared in schema.yaml
+SCHEMA_TO_BSON_TYPE = {"int": "long", "float": "double"}
+
+# pyarrow.dataset formats of the snapshot files, by file extension
+SNAPSHOT_FILE_FORMATS = {".parquet": "parquet", ".csv": "csv", ".arrow": "ipc"}
+
+# comparison operators of the Mongo query language understood by the local backend
+QUERY_OPERATORS = {
+    "$eq": lambda field, value: field == value,
+    "$ne": lambda field, value: field.is_valid() if value is None else field != value,
+    "$gt": lambda field, value: field > value,
+    "$gte": lambda field, value: field >= value,
+    "$lt": lambda field, value: field < value,
+    "$lte": lambda field, value: field <= value,
+}
+
+
+class DataSource(ABC):
+    """
+    Backend Proj1Data reads a collection from.
+
+    Every backend returns the same chunks: DataFrames with the schema columns in schema order,
+    'na' replaced with missing values and, when the backend coerces types, numeric schema
+    columns converted to numbers. Queries are written in the Mongo query language. A backend must
+    implement every abstract method to be instantiated.
+    """
+
+    name: str = ""
+
+    def __init__(self, schema_columns: List[Tuple[str, str]]) -> None:
+        self.schema_columns = schema_columns
+
+    @property
+    def column_names(self) -> List[str]:
+        """Names of the exported columns, in schema order."""
+        return [name for name, _ in self.schema_columns]
+
+    def describe(self) -> dict:
+        """Settings of the backend that change the exported data."""
+        return {"backend": self.name}
+
+    def get_stats(self) -> dict:
+        """Client statistics of the backend, empty when it collects none."""
+        return {}
+
+    @abstractmethod
+    def fetch_chunks(self, collection_name: str, database_name: Optional[str] = None,
+                     batch_size: int = DATA_INGESTION_EXPORT_BATCH_SIZE, query: Optional[dict] = None,
+                     include_id: bool = False) -> Iterator[pd.DataFrame]:
+        """
+        Yields chunks of `batch_size` rows (the last one may be shorter) matching `query`.
+        With `include_id` the '_id' column is prepended as a string.
+        """
+
+    @abstractmethod
+    def get_min_value(self, collection_name: str, key: str, database_name: Optional[str] = None) -> Any:
+        """Returns the smallest value of `key`, or None when the collection is empty."""
+
+    @abstractmethod
+    def get_max_value(self, collection_name: str, key: str, database_name: Optional[str] = None) -> Any:
+        """Returns the largest value of `key`, or None when the collection is empty."""
+
+    @abstractmethod
+    def get_fingerprint(self, collection_name: str, database_name: Optional[str] = None,
+                        use_db_hash: bool = False) -> dict:
+        """Returns a cheap description of the collection content, see Proj1Data.get_collection_fingerprint."""
+
+
+class MongoDataSource(DataSource):
+    """
+    Reads collections from MongoDB through the shared MongoDBClient.
+    """
+
+    name = "mongodb"
+
+    def __init__(self, schema_columns: List[Tuple[str, str]], database_name: str = DATABASE_NAME) -> None:
+        super().__init__(schema_columns)
+        self.mongo_client = MongoDBClient(database_name=database_name)
+        self.coerce_types = DATA_INGESTION_SERVER_SIDE_COERCION
+        # set when the server cannot run $convert, numeric columns are then converted on the client
+        self.client_side_coercion = False
+        self.cursor_batch_size = get_mongodb_setting("MONGODB_CURSOR_BATCH_SIZE", MONGODB_CURSOR_BATCH_SIZE)
+
+    def describe(self) -> dict:
+        # the client-side fallback exports the same data as the server-side coercion
+        return {"backend": self.name, "server_side_coercion": self.coerce_types or self.client_side_coercion}
+
+    def get_stats(self) -> dict:
+        return MongoDBClient.get_stats()
+
+    def build_export_pipeline(self, query: Optional[dict] = None, coerce_types: Optional[bool] = None,
+                              include_id: bool = False) -> List[dict]:
+        """
+        Builds the aggregation pipeline used by every export.
+
+        The projection keeps only the columns declared in schema.yaml (so '_id' never crosses the wire
+        unless `include_id`), turns 'na' into null and, with `coerce_types`, converts numeric columns
+        to their schema type on the server. Values that cannot be converted become null.
+
+        Parameters
+        ----------
+        query : Optional[dict]
+            Filter applied before the projection, e.g. a range on the partition key.
+        coerce_types : Optional[bool]
+            Whether numeric columns are converted with $convert. Defaults to `self.coerce_types`.
+        include_id : bool
+            Whether '_id' is kept in the projection.
+
+        Returns
+        -------
+        List[dict]
+            Pipeline stages to pass to `collection.aggregate`.
+        """
+        if coerce_types is None:
+            coerce_types = self.coerce_types
+        projection = {"_id": 1 if include_id else 0}
+        for name, dtype in self.schema_columns:
+            field = f"${name}"
+            if coerce_types and dtype in SCHEMA_TO_BSON_TYPE:
+                projection[name] = {"$convert": {"input": field, "to": SCHEMA_TO_BSON_TYPE[dtype],
+                                                 "onError": None, "onNull": None}}
+            else:
+                projection[name] = {"$cond": [{"$eq": [field, "na"]}, None, field]}
+        return [{"$match": query or {}}, {"$project": projection}]
+
+    def _get_collection(self, collection_name: str, database_name: Optional[str] = None):
+        """
+        Returns the collection handle from the default or the specified database.
+        """
+        if database_name is None:
+            return self.mongo_client.database[collection_name]
+        return self.mongo_client.client[database_name][collection_name]
+
+    def _prepare_chunk(self, documents: list, include_id: bool = False) -> pd.DataFrame:
+        """
+        Converts a batch of already projected and cleaned documents into a DataFrame with the schema column order.
+        With client_side_coercion, numeric columns are converted as $convert would have done it.
+        """
+        columns = (["_id"] if include_id else []) + self.column_names
+        df = pd.DataFrame.from_records(documents, columns=columns)
+        if self.client_side_coercion:
+            for name, dtype in self.schema_columns:
+                if dtype in SCHEMA_TO_BSON_TYPE and not pd.api.types.is_numeric_dtype(df[name]):
+                    df[name] = pd.to_numeric(df[name].astype(object), errors="coerce")
+        if include_id:
+            df["_id"] = df["_id"].astype(str)
+        return df
+
+    def _aggregate(self, collection, query: Optional[dict], include_id: bool, batch_size: int):
+        """
+        Runs the export pipeline. When the server does not implement $convert (e.g. mongomock or an
+        old MongoDB), it falls back to the pipeline without it and converts the numeric columns on
+        the client, for this export and the next ones.
+        """
+        # the cursor batch size only sets the documents per round-trip, chunks still hold batch_size rows
+        batch_size = self.cursor_batch_size or batch_size
+        if self.coerce_types:
+            try:
+                return collection.aggregate(self.build_export_pipeline(query, include_id=include_id),
+                                            batchSize=batch_size)
+            except (OperationFailure, NotImplementedError) as e:
+                logging.warning(f"Server-side type coercion is not supported ({e}), "
+                                f"numeric columns are converted on the client")
+                self.coerce_types = False
+                self.client_side_coercion = True
+        return collection.aggregate(self.build_export_pipeline(query, include_id=include_id), batchSize=batch_size)
+
+    def fetch_chunks(self, collection_name: str, database_name: Optional[str] = None,
+                     batch_size: int = DATA_INGESTION_EXPORT_BATCH_SIZE, query: Optional[dict] = None,
+                     include_id: bool = False) -> Iterator[pd.DataFrame]:
+        collection = self._get_collection(collection_name, database_name)
+        cursor = self._aggregate(collection, query, include_id, batch_size)
+
+        documents = []
+        for document in cursor:
+            documents.append(document)
+            if len(documents) >= batch_size:
+                yield self._prepare_chunk(documents, include_id)
+                documents = []
+
+        if documents:
+            yield self._prepare_chunk(documents, include_id)
+
+    def _get_extreme_value(self, collection_name: str, key: str, direction: int, database_name: Optional[str]) -> Any:
+        # with an index on `key` (always the case for '_id') this is a single index lookup
+        collection = self._get_collection(collection_name, database_name)
+        document = collection.find_one({key: {"$ne": None}}, {key: 1}, sort=[(key, direction)])
+        return None if document is None else document[key]
+
+    def get_min_value(self, collection_name: str, key: str, database_name: Optional[str] = None) -> Any:
+        return self._get_extreme_value(collection_name, key, 1, database_name)
+
+    def get_max_value(self, collection_name: str, key: str, database_name: Optional[str] = None) -> Any:
+        return self._get_extreme_value(collection_name, key, -1, database_name)
+
+    def get_fingerprint(self, collection_name: str, database_name: Optional[str] = None,
+                        use_db_hash: bool = False) -> dict:
+        # dbHash returns an md5 of the collection, computed by reading it entirely on the server
+        collection = self._get_collection(collection_name, database_name)
+        max_id = self.get_max_value(collection_name, "_id", database_name=database_name)
+        fingerprint = {
+            "count": collection.count_documents({}),
+            "max_id": None if max_id is None else str(max_id),
+        }
+        if use_db_hash:
+            database = self.mongo_client.database if database_name is None else self.mongo_client.client[database_name]
+            db_hash = database.command("dbHash", collections=[collection_name])
+            fingerprint["db_hash"] = db_hash["collections"].get(collection_name)
+        return fingerprint
+
+
+class LocalSnapshotDataSource(DataSource):
+    """
+    Reads collections from a local snapshot directory of Parquet, CSV or Arrow files.
+
+    A collection is either a directory `<snapshot_dir>/[<database_name>/]<collection_name>/`
+    of part files, read in name order, or a single `<collection_name>.<parquet|csv|arrow>` file.
+    '_id' is stored as the hex string of the ObjectId, which sorts like the ObjectId itself.
+    Columns are read with projection and queries are evaluated as pyarrow filters while scanning,
+    so only the requested rows and columns are decoded.
+    """
+
+    name = "local"
+
+    def __init__(self, schema_columns: List[Tuple[str, str]], snapshot_dir: str = LOCAL_SNAPSHOT_DIR) -> None:
+        super().__init__(schema_columns)
+        self.snapshot_dir = snapshot_dir
+
+    def describe(self) -> dict:
+        return {"backend": self.name, "snapshot_dir": os.path.abspath(self.snapshot_dir)}
+
+    def get_collection_path(self, collection_name: str, database_name: Optional[str] = None) -> str:
+        """
+        Returns the directory or file holding the collection.
+        """
+        base_dir = self.snapshot_dir if database_name is None else os.path.join(self.snapshot_dir, database_name)
+        collection_path = os.path.join(base_dir, collection_name)
+        if os.path.isdir(collection_path):
+            return collection_path
+        for extension in SNAPSHOT_FILE_FORMATS:
+            if os.path.isfile(collection_path + extension):
+                return collection_path + extension
+        raise Exception(f"No snapshot of collection {collection_name} found in {base_dir}")
+
+    def _get_files(self, collection_name: str, database_name: Optional[str] = None) -> List[str]:
+        collection_path = self.get_collection_path(collection_name, database_name)
+        if os.path.isfile(collection_path):
+            return [collection_path]
+        files = sorted(file_path for file_path in glob.glob(os.path.join(collection_path, "*"))
+                       if os.path.splitext(file_path)[1] in SNAPSHOT_FILE_FORMATS)
+        if not files:
+            raise Exception(f"Snapshot directory {collection_path} contains no parquet, csv or arrow file")
+        return files
+
+    def _get_dataset(self, collection_name: str, database_name: Optional[str] = None) -> ds.Dataset:
+        files = self._get_files(collection_name, database_name)
+        formats = {SNAPSHOT_FILE_FORMATS[os.path.splitext(file_path)[1]] for file_path in files}
+        if len(formats) > 1:
+            raise Exception(f"Snapshot of collection {collection_name} mixes file formats: {sorted(formats)}")
+        return ds.dataset(files, format=formats.pop())
+
+    @staticmethod
+    def _to_expression(query: Optional[dict]) -> Optional[ds.Expression]:
+        """
+        Translates a Mongo query made of equalities and comparison operators into a pyarrow filter.
+        """
+        expression = None
+        for key, condition in (query or {}).items():
+            if not isinstance(condition, dict):
+                condition = {"$eq": condition}
+            for operator, value in condition.items():
+                if operator not in QUERY_OPERATORS:
+                    raise Exception(f"Operator {operator} is not supported by the local data source")
+                if isinstance(value, ObjectId):
+                    value = str(value)
+                term = QUERY_OPERATORS[operator](ds.field(key), value)
+                expression = term if expression is None else expression & term
+        return expression
+
+    def _prepare_chunk(self, table: pa.Table, include_id: bool = False) -> pd.DataFrame:
+        """
+        Converts scanned rows into a DataFrame with the schema column order, cleaned and typed like
+        the server-side coercion of the Mongo export.
+        """
+        df = table.to_pandas()
+        for name, dtype in self.schema_columns:
+            if name not in df.columns:
+                df[name] = np.nan
+            elif dtype in SCHEMA_TO_BSON_TYPE:
+                if not pd.api.types.is_numeric_dtype(df[name]):
+                    df[name] = pd.to_numeric(df[name].astype(object), errors="coerce")
+            else:
+                values = df[name].astype(object)
+                df[name] = values.where(values != "na", None)
+        columns = (["_id"] if include_id else []) + self.column_names
+        if include_id:
+            df["_id"] = df["_id"].astype(str)
+        return df[columns]
+
+    def fetch_chunks(self, collection_name: str, database_name: Optional[str] = None,
+                     batch_size: int = DATA_INGESTION_EXPORT_BATCH_SIZE, query: Optional[dict] = None,
+                     include_id: bool = False) -> Iterator[pd.DataFrame]:
+        dataset = self._get_dataset(collection_name, database_name)
+        available = set(dataset.schema.names)
+        columns = [name for name in (["_id"] if include_id else []) + self.column_names if name in available]
+
+        # record batches follow the file layout, they are regrouped into chunks of exactly batch_size rows
+        pending, pending_rows = [], 0
+        for batch in dataset.to_batches(columns=columns, filter=self._to_expression(query), batch_size=batch_size):
+            if not batch.num_rows:
+                continue
+            pending.append(batch)
+            pending_rows += batch.num_rows
+            while pending_rows >= batch_size:
+                table = pa.Table.from_batches(pending)
+                yield self._prepare_chunk(table.slice(0, batch_size), include_id)
+                pending = table.slice(batch_size).to_batches()
+                pending_rows -= batch_size
+
+        if pending_rows:
+            yield self._prepare_chunk(pa.Table.from_batches(pending), include_id)
+
+    def _get_min_max(self, collection_name: str, key: str, database_name: Optional[str]) -> dict:
+        dataset = self._get_dataset(collection_name, database_name)
+        if key not in dataset.schema.names:
+            raise Exception(f"Column {key} is not in the snapshot of collection {collection_name}")
+        return pc.min_max(dataset.to_table(columns=[key]).column(key)).as_py()
+
+    def get_min_value(self, collection_name: str, key: str, database_name: Optional[str] = None) -> Any:
+        return self._get_min_max(collection_name, key, database_name)["min"]
+
+    def get_max_value(self, collection_name: str, key: str, database_name: Optional[str] = None) -> Any:
+        return self._get_min_max(collection_name, key, database_name)["max"]
+
+    def get_fingerprint(self, collection_name: str, database_name: Optional[str] = None,
+                        use_db_hash: bool = False) -> dict:
+        # file names, sizes and modification times catch rewritten snapshots without reading them,
+        # use_db_hash hashes the file contents instead
+        files = self._get_files(collection_name, database_name)
+        dataset = self._get_dataset(collection_name, database_name)
+        max_id = self.get_max_value(collection_name, "_id", database_name) if "_id" in dataset.schema.names else None
+        files_hash = hashlib.sha256()
+        for file_path in files:
+            stat = os.stat(file_path)
+            files_hash.update(f"{os.path.basename(file_path)}:{stat.st_size}:{stat.st_mtime_ns};".encode())
+        fingerprint = {"count": dataset.count_rows(), "max_id": max_id, "files_hash": files_hash.hexdigest()}
+        if use_db_hash:
+            content_hash = hashlib.md5()
+            for file_path in files:
+                with open(file_path, "rb") as file_obj:
+                    for block in iter(lambda: file_obj.read(1 << 20), b""):
+                        content_hash.update(block)
+            fingerprint["db_hash"] = content_hash.hexdigest()
+        return fingerprint
+
+
+def get_data_source(schema_columns: List[Tuple[str, str]], backend: Optional[str] = None) -> DataSource:
+    """
+    Creates the data source selected by `backend`, or by the DATA_SOURCE_BACKEND environment variable,
+    falling back to the DATA_SOURCE_BACKEND constant. The local snapshot directory is read from the
+    LOCAL_SNAPSHOT_DIR environment variable, falling back to the LOCAL_SNAPSHOT_DIR constant.
+    """
+    try:
+        backend = backend or os.getenv(DATA_SOURCE_BACKEND_KEY, DATA_SOURCE_BACKEND)
+        if backend == MongoDataSource.name:
+            return MongoDataSource(schema_columns)
+        if backend == LocalSnapshotDataSource.name:
+            return LocalSnapshotDataSource(schema_columns, snapshot_dir=os.getenv(LOCAL_SNAPSHOT_DIR_KEY, LOCAL_SNAPSHOT_DIR))
+        raise Exception(f"Unknown data source backend '{backend}', expected 'mongodb' or 'local'")
+    except Exception as e:
+        raise MyException(e, sys)
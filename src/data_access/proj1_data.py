@@ -1,57 +1,299 @@
+import os
+import shutil
 import sys
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
 import pandas as pd
 import numpy as np
-from typing import Optional
+from datetime import datetime, timezone
+from typing import Any, Iterator, List, Optional, Tuple
+from bson import ObjectId
 
-from src.configuration.mongo_db_connection import MongoDBClient
-from src.constants import DATABASE_NAME
+from src.constants import DATA_INGESTION_EXPORT_BATCH_SIZE, DATA_INGESTION_PARTITION_KEY
+from src.data_access.data_source import DataSource, get_data_source
+from src.entity.schema import load_schema
 from src.exception import MyException
+from src.utils.main_utils import DataFrameChunkWriter, iter_dataframe_chunks
 
 class Proj1Data:
     """
-    A class to export MongoDB as pandas DataFrame.
+    A class to export the Proj1 collection as pandas DataFrames.
+
+    Reads go through a DataSource: MongoDB by default, or a local snapshot directory
+    (see src.data_access.data_source), both returning the same typed chunks.
     """
 
-    def __init__(self) -> None:
+    def __init__(self, data_source: Optional[DataSource] = None, backend: Optional[str] = None) -> None:
         """
-        Initializes the MongoDB client connection.
+        Initializes the data source: `data_source` when given, otherwise the one named by `backend`
+        ("mongodb" or "local"), which defaults to DATA_SOURCE_BACKEND.
         """
         try:
-            self.mongo_client = MongoDBClient(database_name=DATABASE_NAME)
+            self.schema_columns = list(load_schema().dtypes.items())
+            self.data_source = data_source if data_source is not None else get_data_source(self.schema_columns, backend)
         except Exception as e:
             raise MyException(e, sys)
-    
+
+    @property
+    def column_names(self) -> List[str]:
+        """Names of the exported columns, in schema order."""
+        return [name for name, _ in self.schema_columns]
+
     def export_collection_as_dataframe(self, collection_name: str, database_name: Optional[str] = None) -> pd.DataFrame:
         """
-        Exports an entire MongoDB collection as a pandas Dataframe.
+        Exports an entire collection as a pandas Dataframe.
 
         Parameters
         ----------
         collection_name : str
-            The name of MongoDB collection to import.
+            The name of the collection to import.
         database_name : Optional[str]
             Name of the database (optional). Defaults to DATABASE_NAME
         
         Returns
         -------
         pd.DataFrame
-            Dataframe containing the collection data '_id' column removed and 'na' values replaced with NaN.
-        """
-        try:
-            # Access specified collection from default or specified database
-            if database_name is None:
-                collection = self.mongo_client.database[collection_name]
-            else:
-                collection = self.mongo_client[database_name][collection_name]
-            
-            # convert collection data to DataFrame and preprocess
-            print("Fetching data from mongoDB")
-            df = pd.DataFrame(list(collection.find()))
+            Dataframe containing the schema columns with 'na' values replaced with NaN.
+        """
+        try:
+            # projection and 'na' cleanup are done by the data source, see MongoDataSource.build_export_pipeline
+            print(f"Fetching data from {self.data_source.name}")
+            chunks = list(self.data_source.fetch_chunks(collection_name, database_name=database_name))
+            df = pd.concat(chunks, ignore_index=True) if chunks else pd.DataFrame(columns=self.column_names)
             print(f"Data fetched with len {len(df)}")
-            if "id" in df.columns.to_list():
-                df = df.drop(columns=["id"], axis=1)
-            df.replace({"na": np.nan}, inplace=True)
             return df
         
         except Exception as e:
-            raise MyException(e, sys)
\ No newline at end of file
+            raise MyException(e, sys)
+
+    def export_collection_as_chunks(self, collection_name: str, database_name: Optional[str] = None,
+                                    batch_size: int = DATA_INGESTION_EXPORT_BATCH_SIZE,
+                                    query: Optional[dict] = None) -> Iterator[pd.DataFrame]:
+        """
+        Streams a collection as a sequence of pandas DataFrame chunks.
+
+        Only one batch of decoded documents is held in memory at a time, so peak memory
+        is bounded by `batch_size` instead of the collection size.
+
+        Parameters
+        ----------
+        collection_name : str
+            The name of the collection to import.
+        database_name : Optional[str]
+            Name of the database (optional). Defaults to DATABASE_NAME
+        batch_size : int
+            Number of documents fetched per round-trip and put in each chunk.
+        query : Optional[dict]
+            Filter in the Mongo query language, e.g. a range on the partition key. Defaults to the whole collection.
+
+        Yields
+        ------
+        pd.DataFrame
+            Chunk of the collection with the same projection and cleanup as `export_collection_as_dataframe`.
+        """
+        try:
+            yield from self.data_source.fetch_chunks(collection_name, database_name=database_name,
+                                                     batch_size=batch_size, query=query)
+        except Exception as e:
+            raise MyException(e, sys)
+
+    def save_snapshot(self, collection_name: str, snapshot_dir: str, database_name: Optional[str] = None,
+                      file_format: str = "parquet", batch_size: int = DATA_INGESTION_EXPORT_BATCH_SIZE) -> str:
+        """
+        Streams the collection into `<snapshot_dir>/<collection_name>/part-00000.<file_format>`,
+        the layout read by LocalSnapshotDataSource. '_id' is kept as a string so watermarks,
+        partitions and fingerprints keep working on the snapshot.
+
+        Returns
+        -------
+        str
+            Path of the written snapshot file.
+        """
+        try:
+            collection_dir = os.path.join(snapshot_dir, collection_name)
+            os.makedirs(collection_dir, exist_ok=True)
+            file_path = os.path.join(collection_dir, f"part-00000.{file_format}")
+            tmp_file_path = os.path.join(collection_dir, f".part-00000.{file_format}")
+            with DataFrameChunkWriter(tmp_file_path) as writer:
+                for chunk in self.data_source.fetch_chunks(collection_name, database_name=database_name,
+                                                           batch_size=batch_size, include_id=True):
+                    writer.write(chunk)
+            os.replace(tmp_file_path, file_path)
+            return file_path
+        except Exception as e:
+            raise MyException(e, sys)
+
+    def get_max_value(self, collection_name: str, key: str, database_name: Optional[str] = None) -> Any:
+        """
+        Returns the largest value of `key` in the collection, or None when the collection is empty.
+        On MongoDB with an index on `key` (always the case for '_id') this is a single index lookup.
+        """
+        try:
+            return self.data_source.get_max_value(collection_name, key, database_name=database_name)
+        except Exception as e:
+            raise MyException(e, sys)
+
+    def get_collection_fingerprint(self, collection_name: str, database_name: Optional[str] = None,
+                                   use_db_hash: bool = False) -> dict:
+        """
+        Returns a cheap description of the collection content: document count and max '_id'.
+
+        Appends are always detected. In-place updates are only detected with `use_db_hash`,
+        which asks the server for an md5 of the collection (reads the whole collection server-side).
+
+        Parameters
+        ----------
+        collection_name : str
+            The name of MongoDB collection to describe.
+        database_name : Optional[str]
+            Name of the database (optional). Defaults to DATABASE_NAME
+        use_db_hash : bool
+            Whether to add the collection hash returned by the dbHash command.
+
+        Returns
+        -------
+        dict
+            'count', 'max_id' and optionally 'db_hash' of the collection.
+        """
+        try:
+            return self.data_source.get_fingerprint(collection_name, database_name=database_name, use_db_hash=use_db_hash)
+        except Exception as e:
+            raise MyException(e, sys)
+
+    @staticmethod
+    def _split_range(lower: Any, upper: Any, n_partitions: int) -> List[Any]:
+        """
+        Returns `n_partitions + 1` ascending boundaries between `lower` and `upper`.
+        ObjectId values are split on their generation time, numbers are split linearly.
+        ObjectId hex strings (the '_id' of local snapshots) are split like ObjectIds.
+        """
+        if isinstance(lower, str) and ObjectId.is_valid(lower) and ObjectId.is_valid(upper):
+            boundaries = Proj1Data._split_range(ObjectId(lower), ObjectId(upper), n_partitions)
+            return [lower] + [str(bound) for bound in boundaries[1:-1]] + [upper]
+        if isinstance(lower, ObjectId):
+            start, end = lower.generation_time.timestamp(), upper.generation_time.timestamp()
+            inner = [ObjectId.from_datetime(datetime.fromtimestamp(start + (end - start) * i / n_partitions, tz=timezone.utc))
+                     for i in range(1, n_partitions)]
+        else:
+            inner = [lower + (upper - lower) * i / n_partitions for i in range(1, n_partitions)]
+            if isinstance(lower, (int, np.integer)) and isinstance(upper, (int, np.integer)):
+                inner = [int(bound) for bound in inner]
+
+        # drop boundaries that collapse onto each other (e.g. ObjectIds created within the same second)
+        boundaries = [lower]
+        for bound in inner:
+            if boundaries[-1] < bound < upper:
+                boundaries.append(bound)
+        boundaries.append(upper)
+        return boundaries
+
+    def get_partition_queries(self, collection_name: str, n_partitions: int, database_name: Optional[str] = None,
+                              partition_key: str = DATA_INGESTION_PARTITION_KEY) -> List[dict]:
+        """
+        Splits a collection into contiguous, non-overlapping ranges of `partition_key`.
+
+        Parameters
+        ----------
+        collection_name : str
+            The name of the collection to partition.
+        n_partitions : int
+            Upper limit on the number of ranges to create.
+        database_name : Optional[str]
+            Name of the database (optional). Defaults to DATABASE_NAME
+        partition_key : str
+            Indexed field used for the ranges, '_id' (ObjectId) or a numeric field such as 'id'.
+
+        Returns
+        -------
+        List[dict]
+            Range queries ordered by `partition_key`; together they cover the whole collection.
+        """
+        try:
+            first = self.data_source.get_min_value(collection_name, partition_key, database_name=database_name)
+            last = self.data_source.get_max_value(collection_name, partition_key, database_name=database_name)
+            if first is None or last is None:
+                return []
+
+            boundaries = self._split_range(first, last, max(1, n_partitions))
+            queries = []
+            for i, (lower, upper) in enumerate(zip(boundaries[:-1], boundaries[1:])):
+                upper_operator = "$lte" if i == len(boundaries) - 2 else "$lt"
+                queries.append({partition_key: {"$gte": lower, upper_operator: upper}})
+            return queries
+
+        except Exception as e:
+            raise MyException(e, sys)
+
+    def export_collection_in_partitions(self, collection_name: str, n_workers: int, database_name: Optional[str] = None,
+                                        batch_size: int = DATA_INGESTION_EXPORT_BATCH_SIZE,
+                                        partition_key: str = DATA_INGESTION_PARTITION_KEY,
+                                        spill_dir: Optional[str] = None) -> Iterator[Tuple[int, Iterator[pd.DataFrame]]]:
+        """
+        Exports a collection by draining `partition_key` ranges concurrently from a thread pool.
+
+        On MongoDB all threads share the pooled `MongoDBClient.client`, each range gets its own cursor.
+        pymongo clients are not fork-safe, hence threads rather than processes.
+        Each worker spills its range batch by batch into an uncompressed arrow file, which is streamed
+        back (memory-mapped) once every earlier range has been consumed, and then deleted. Memory is
+        thus bounded by one batch per worker, at the cost of disk space for the ranges not consumed yet.
+
+        Parameters
+        ----------
+        collection_name : str
+            The name of the collection to import.
+        n_workers : int
+            Number of partitions and concurrent cursors.
+        database_name : Optional[str]
+            Name of the database (optional). Defaults to DATABASE_NAME
+        batch_size : int
+            Number of documents fetched per cursor round-trip and put in each chunk.
+        partition_key : str
+            Indexed field used to split the collection into ranges.
+        spill_dir : Optional[str]
+            Directory the ranges are spilled into, the system temporary directory by default.
+
+        Yields
+        ------
+        Tuple[int, Iterator[pd.DataFrame]]
+            Partition number and its chunks, in ascending partition order regardless of completion order.
+            The chunks of a partition must be consumed before the next partition is requested.
+        """
+        try:
+            queries = self.get_partition_queries(collection_name, n_workers, database_name=database_name,
+                                                 partition_key=partition_key)
+            if spill_dir is not None:
+                os.makedirs(spill_dir, exist_ok=True)
+            work_dir = tempfile.mkdtemp(prefix="export-", dir=spill_dir)
+
+            def drain(partition: int, query: dict) -> Optional[str]:
+                file_path = os.path.join(work_dir, f"partition-{partition:05d}.arrow")
+                with DataFrameChunkWriter(file_path) as writer:
+                    for chunk in self.export_collection_as_chunks(collection_name, database_name=database_name,
+                                                                  batch_size=batch_size, query=query):
+                        writer.write(chunk)
+                return file_path if writer.rows else None
+
+            def read_back(file_path: Optional[str]) -> Iterator[pd.DataFrame]:
+                if file_path is None:
+                    return
+                try:
+                    yield from iter_dataframe_chunks(file_path, chunk_size=batch_size)
+                finally:
+                    # already gone when the export was abandoned and its directory removed
+                    if os.path.exists(file_path):
+                        os.remove(file_path)
+
+            try:
+                with ThreadPoolExecutor(max_workers=max(1, n_workers)) as executor:
+                    futures = [executor.submit(drain, partition, query) for partition, query in enumerate(queries)]
+                    try:
+                        for partition, future in enumerate(futures):
+                            yield partition, read_back(future.result())
+                    finally:
+                        for future in futures:
+                            future.cancel()
+            finally:
+                shutil.rmtree(work_dir, ignore_errors=True)
+
+        except Exception as e:
+            raise MyException(e, sys)
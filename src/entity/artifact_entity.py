@@ -1,21 +1,37 @@
 from dataclasses import dataclass
+from typing import Optional
 
 @dataclass
 class DataIngestionArtifact:
     trained_file_path: str
     test_file_path: str
+    source_fingerprint: Optional[str] = None
+    # committed partitions of the incremental feature store, in ingestion order (incremental hash split only)
+    partition_file_paths: Optional[list] = None
+    # True when the train and test files only hold the rows of the partitions added since the production
+    # model was trained (incremental refresh), delta_rows is then their number of rows
+    is_delta: bool = False
+    delta_rows: Optional[int] = None
 
 @dataclass
 class DataValidationArtifact:
     validation_status: bool
     message: str
     validation_report_file_path: str
+    sketch_file_path: Optional[str] = None
+    drift_detected: Optional[bool] = None  # None when there is no reference sketch to compare with
+    drift_report: Optional[dict] = None
 
 @dataclass
 class DataTransformationArtifact:
     transformed_object_file_path: str
     transformed_train_file_path: str
     transformed_test_file_path: str
+    transformed_train_label_file_path: str
+    transformed_test_label_file_path: str
+    resampling_report_file_path: Optional[str] = None
+    class_weight: Optional[dict] = None  # set by the "class_weight" strategy, which does not resample
+    fingerprint: Optional[str] = None  # key of the transformation cache, identifies the transformed data
 
 @dataclass
 class ClassificationMetricArtifact:
@@ -27,6 +43,8 @@ class ClassificationMetricArtifact:
 class ModelTrainerArtifact:
     trainded_model_file_path: str
     metric_artifact: ClassificationMetricArtifact
+    training_report_file_path: Optional[str] = None
+    search_report_file_path: Optional[str] = None
 
 @dataclass 
 class ModelEvaluationArtifact:
@@ -38,4 +56,5 @@ class ModelEvaluationArtifact:
 @dataclass
 class ModelPusherArtifact:
     bucket_name: str
-    s3_model_path: str
\ No newline at end of file
+    s3_model_path: str
+    s3_sketch_path: Optional[str] = None
\ No newline at end of file
@@ -2,6 +2,7 @@ import os
 from src.constants import *
 from dataclasses import dataclass
 from datetime import datetime
+from typing import Optional
 
 TIMESTAMP: str = datetime.now().strftime("%m_%d_%Y_%H_%M_%S")
 
@@ -16,23 +17,71 @@ trainning_pipeline_config : TrainingPipelineConfig = TrainingPipelineConfig()
 @dataclass
 class DataIngestionConfig:
     data_ingestion_dir: str = os.path.join(trainning_pipeline_config.artifact_dir, DATA_INGESTION_DIR_NAME)
+    file_format: str = DATA_INGESTION_ARTIFACT_FORMAT
     feature_store_file_path: str = os.path.join(data_ingestion_dir, DATA_INGESTION_FEATURE_STORE_DIR, FILE_NAME)
     training_file_path: str = os.path.join(data_ingestion_dir, DATA_INGESTION_INGESTED_DIR, TRAIN_FILE_NAME)
     testing_file_path: str = os.path.join(data_ingestion_dir, DATA_INGESTION_INGESTED_DIR, TEST_FILE_NAME)
+    memory_report_file_path: str = os.path.join(data_ingestion_dir, DATA_INGESTION_MEMORY_REPORT_FILE_NAME)
+    fingerprint_file_path: str = os.path.join(data_ingestion_dir, DATA_INGESTION_FINGERPRINT_FILE_NAME)
+    use_cache: bool = DATA_INGESTION_CACHE_ENABLED
+    fingerprint_use_db_hash: bool = DATA_INGESTION_FINGERPRINT_USE_DB_HASH
     train_test_split_ratio: float = DATA_INGESTION_TRAIN_TEST_SPLIT_RATIO
+    split_mode: str = DATA_INGESTION_SPLIT_MODE
+    split_key: str = DATA_INGESTION_SPLIT_KEY
+    split_random_state: int = DATA_INGESTION_SPLIT_RANDOM_STATE
     collection_name: str = DATA_INGESTION_COLLECTION_NAME
+    export_mode: str = DATA_INGESTION_EXPORT_MODE
+    export_batch_size: int = DATA_INGESTION_EXPORT_BATCH_SIZE
+    export_workers: int = DATA_INGESTION_EXPORT_WORKERS
+    partition_key: str = DATA_INGESTION_PARTITION_KEY
+    incremental: bool = DATA_INGESTION_INCREMENTAL
+    full_refresh: bool = DATA_INGESTION_FULL_REFRESH
+    incremental_store_dir: str = DATA_INGESTION_INCREMENTAL_STORE_DIR
+    watermark_file_path: str = os.path.join(DATA_INGESTION_INCREMENTAL_STORE_DIR, DATA_INGESTION_WATERMARK_FILE_NAME)
+    watermark_key: str = DATA_INGESTION_WATERMARK_KEY
+
+    def __post_init__(self):
+        # artifact file extensions follow the selected file format
+        for field_name in ("feature_store_file_path", "training_file_path", "testing_file_path"):
+            file_path = getattr(self, field_name)
+            setattr(self, field_name, f"{os.path.splitext(file_path)[0]}.{self.file_format}")
 
 @dataclass
 class DataValidationConfig:
     data_validation_dir: str = os.path.join(trainning_pipeline_config.artifact_dir, DATA_VALIDATION_DIR_NAME)
     validation_report_file_path: str = os.path.join(data_validation_dir, DATA_VALIDATION_REPORT_FILE_NAME)
+    chunk_size: int = DATA_VALIDATION_CHUNK_SIZE
+    mode: str = DATA_VALIDATION_MODE
+    sample_fraction: float = DATA_VALIDATION_SAMPLE_FRACTION
+    sample_confidence: float = DATA_VALIDATION_SAMPLE_CONFIDENCE
+    sample_random_state: int = DATA_VALIDATION_SAMPLE_RANDOM_STATE
+    sketch_file_path: str = os.path.join(data_validation_dir, DATA_VALIDATION_SKETCH_FILE_NAME)
+    sketch_bins: int = DATA_VALIDATION_SKETCH_BINS
+    drift_psi_threshold: float = DATA_VALIDATION_DRIFT_PSI_THRESHOLD
+    drift_ks_threshold: float = DATA_VALIDATION_DRIFT_KS_THRESHOLD
+    skip_training_without_drift: bool = DATA_VALIDATION_SKIP_TRAINING_WITHOUT_DRIFT
+    # sketch of the production model's training data: a local file when set, otherwise the S3 object
+    reference_sketch_file_path: Optional[str] = None
+    reference_bucket_name: str = MODEL_BUCKET_NAME
+    reference_sketch_key: str = MODEL_SKETCH_KEY
 
 @dataclass
 class DataTransformationConfig:
     data_transformation_dir: str = os.path.join(trainning_pipeline_config.artifact_dir, DATA_TRANSFORMATION_DIR_NAME)
     transformed_train_file_path: str = os.path.join(data_transformation_dir, DATA_TRANSFORMATION_TRANSFORMED_DATA_DIR, TRAIN_FILE_NAME.replace("csv", "npy"))
     transformed_test_file_path: str = os.path.join(data_transformation_dir, DATA_TRANSFORMATION_TRANSFORMED_DATA_DIR, TEST_FILE_NAME.replace("csv", "npy"))
+    transformed_train_label_file_path: str = os.path.join(data_transformation_dir, DATA_TRANSFORMATION_TRANSFORMED_DATA_DIR, DATA_TRANSFORMATION_TRAIN_LABEL_FILE_NAME)
+    transformed_test_label_file_path: str = os.path.join(data_transformation_dir, DATA_TRANSFORMATION_TRANSFORMED_DATA_DIR, DATA_TRANSFORMATION_TEST_LABEL_FILE_NAME)
     transformed_object_file_path: str = os.path.join(data_transformation_dir, DATA_TRANSFORMATION_TRANSFORMED_OBJECT_DIR, PREPROCESSING_OBJECT_FILE_NAME)
+    resampling_report_file_path: str = os.path.join(data_transformation_dir, DATA_TRANSFORMATION_RESAMPLING_REPORT_FILE_NAME)
+    resampling_strategy: str = DATA_TRANSFORMATION_RESAMPLING_STRATEGY
+    resampling_n_jobs: int = DATA_TRANSFORMATION_RESAMPLING_N_JOBS
+    resampling_random_state: int = DATA_TRANSFORMATION_RESAMPLING_RANDOM_STATE
+    resample_test: bool = DATA_TRANSFORMATION_RESAMPLE_TEST
+    out_of_core: bool = DATA_TRANSFORMATION_OUT_OF_CORE
+    chunk_size: int = DATA_TRANSFORMATION_CHUNK_SIZE
+    fingerprint_file_path: str = os.path.join(data_transformation_dir, DATA_TRANSFORMATION_FINGERPRINT_FILE_NAME)
+    use_cache: bool = DATA_TRANSFORMATION_CACHE_ENABLED
 
 @dataclass
 class ModelTrainerConfig:
@@ -46,6 +95,18 @@ class ModelTrainerConfig:
     _max_depth = MIN_SAMPLES_SPLIT_MAX_DEPTH
     _criterion = MIN_SAMPLES_SPLIT_CRITERION
     _random_state = MIN_SAMPLES_SPLIT_RANDOM_STATE
+    engine: str = MODEL_TRAINER_ENGINE
+    parallel_mode: str = MODEL_TRAINER_PARALLEL_MODE
+    n_jobs: int = MODEL_TRAINER_N_JOBS
+    quality_gate: str = MODEL_TRAINER_QUALITY_GATE
+    gate_sample_size: int = MODEL_TRAINER_GATE_SAMPLE_SIZE
+    refresh_mode: str = MODEL_TRAINER_REFRESH_MODE
+    full_rebuild_every: int = MODEL_TRAINER_FULL_REBUILD_EVERY
+    bucket_name: str = MODEL_BUCKET_NAME
+    s3_model_key_path: str = MODEL_FILE_NAME
+    training_report_file_path: str = os.path.join(model_trainer_dir, MODEL_TRAINER_TRAINING_REPORT_FILE_NAME)
+    search_report_file_path: str = os.path.join(model_trainer_dir, MODEL_TRAINER_SEARCH_REPORT_FILE_NAME)
+    search_cache_dir: str = MODEL_TRAINER_SEARCH_CACHE_DIR
 
 @dataclass
 class ModelEvaluationConfig:
@@ -57,6 +118,7 @@ class ModelEvaluationConfig:
 class ModelPusherConfig:
     bucket_name = MODEL_BUCKET_NAME
     s3_model_key_path: str = MODEL_FILE_NAME
+    s3_sketch_key_path: str = MODEL_SKETCH_KEY
 
 @dataclass
 class VehiclePredictConfig:
@@ -0,0 +1,173 @@
+import json
+import os
+import sys
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+from pandas import DataFrame
+
+from src.exception import MyException
+from src.entity.schema import Schema
+
+# floor applied to bin proportions so that empty bins do not make PSI infinite
+PSI_EPSILON = 1e-6
+
+
+class DataSketch:
+    """
+    Compact per-feature summary of a dataset, built chunk by chunk and small enough to ship with the model.
+
+    Numeric columns are histograms over fixed edges: the edges of the reference sketch when one is given
+    (so both sides share the same bins), otherwise quantiles of the first chunk. Columns with a `domains`
+    entry in the schema and category columns are level frequencies. Nulls are counted separately.
+    The columns listed in `drop_columns` are not sketched.
+    """
+    def __init__(self, schema: Schema, n_bins: int, reference: Optional[dict] = None):
+        try:
+            drop_columns, domains = schema.drop_columns, schema.domains
+            reference_columns = (reference or {}).get("columns", {})
+
+            self.n_bins = n_bins
+            self.rows = 0
+            self.columns = {}
+            for column, dtype in schema.dtypes.items():
+                if column in drop_columns:
+                    continue
+                kind = "categorical" if dtype == "category" or column in domains else "numeric"
+                sketch = {"kind": kind, "dtype": dtype, "nulls": 0}
+                if kind == "numeric":
+                    edges = reference_columns.get(column, {}).get("edges")
+                    sketch["edges"] = None if edges is None else np.asarray(edges, dtype=np.float64)
+                    sketch["counts"] = None if edges is None else np.zeros(len(edges) + 1, dtype=np.int64)
+                else:
+                    sketch["counts"] = {}
+                self.columns[column] = sketch
+        except Exception as e:
+            raise MyException(e, sys) from e
+
+    def update(self, chunk: DataFrame) -> "DataSketch":
+        """
+        Adds the rows of a chunk to the sketch.
+        """
+        try:
+            self.rows += len(chunk)
+            for column, sketch in self.columns.items():
+                if column not in chunk.columns:
+                    continue
+                if sketch["kind"] == "numeric":
+                    self._update_numeric(sketch, chunk[column])
+                else:
+                    self._update_categorical(sketch, chunk[column])
+            return self
+        except Exception as e:
+            raise MyException(e, sys) from e
+
+    def _update_numeric(self, sketch: dict, values: pd.Series) -> None:
+        values = pd.to_numeric(values, errors="coerce").to_numpy(dtype=np.float64, na_value=np.nan)
+        is_null = np.isnan(values)
+        sketch["nulls"] += int(is_null.sum())
+        values = values[~is_null]
+        if sketch["edges"] is None:
+            if not len(values):
+                return
+            quantiles = np.linspace(0, 1, self.n_bins + 1)[1:-1]
+            sketch["edges"] = np.unique(np.quantile(values, quantiles))
+            sketch["counts"] = np.zeros(len(sketch["edges"]) + 1, dtype=np.int64)
+        # bin i holds edges[i-1] <= value < edges[i], the first and last bins are open ended
+        bins = np.searchsorted(sketch["edges"], values, side="right")
+        sketch["counts"] += np.bincount(bins, minlength=len(sketch["counts"]))
+
+    @staticmethod
+    def _level_key(value) -> str:
+        # numeric levels read back from csv, parquet or arrow must map to the same key
+        return repr(float(value)) if isinstance(value, (int, float, np.number)) else str(value)
+
+    def _update_categorical(self, sketch: dict, values: pd.Series) -> None:
+        counts = values.value_counts(dropna=False)
+        counts = counts[counts > 0]
+        is_null = counts.index.isna()
+        sketch["nulls"] += int(counts[is_null].sum())
+        for level, count in counts[~is_null].items():
+            key = self._level_key(level)
+            sketch["counts"][key] = sketch["counts"].get(key, 0) + int(count)
+
+    def to_dict(self) -> dict:
+        columns = {}
+        for column, sketch in self.columns.items():
+            columns[column] = dict(sketch)
+            if sketch["kind"] == "numeric":
+                columns[column]["edges"] = None if sketch["edges"] is None else sketch["edges"].tolist()
+                columns[column]["counts"] = None if sketch["counts"] is None else sketch["counts"].tolist()
+        return {"rows": self.rows, "n_bins": self.n_bins, "columns": columns}
+
+    def save(self, file_path: str) -> None:
+        try:
+            os.makedirs(os.path.dirname(file_path), exist_ok=True)
+            with open(file_path, "w") as file_obj:
+                json.dump(self.to_dict(), file_obj)
+        except Exception as e:
+            raise MyException(e, sys) from e
+
+
+def _proportions(counts: np.ndarray) -> np.ndarray:
+    total = counts.sum()
+    proportions = counts / total if total else np.zeros(len(counts))
+    return np.clip(proportions, PSI_EPSILON, None)
+
+
+def compare_sketches(reference: dict, current: dict, psi_threshold: float, ks_threshold: float) -> dict:
+    """
+    Compares two sketch dicts (see DataSketch.to_dict) feature by feature.
+
+    PSI is computed over the bins or levels plus a null bin. For numeric features the KS statistic is the
+    largest gap between the two binned CDFs, a lower bound of the exact statistic at the resolution of the
+    bins. A feature drifts when its PSI or KS exceeds its threshold.
+
+    Returns
+    -------
+    dict
+        'drift_detected', the drifted features and the statistics of every feature.
+    """
+    try:
+        features = {}
+        for column, current_sketch in current["columns"].items():
+            reference_sketch = reference["columns"].get(column)
+            if reference_sketch is None or reference_sketch["kind"] != current_sketch["kind"]:
+                continue
+
+            ks = None
+            if current_sketch["kind"] == "numeric":
+                if reference_sketch["edges"] is None or current_sketch["edges"] is None:
+                    continue
+                if len(reference_sketch["edges"]) != len(current_sketch["edges"]) or \
+                        not np.allclose(reference_sketch["edges"], current_sketch["edges"]):
+                    raise Exception(f"Sketches of {column} have different bins, build the current sketch "
+                                    f"from the reference one")
+                reference_counts = np.asarray(reference_sketch["counts"], dtype=np.float64)
+                current_counts = np.asarray(current_sketch["counts"], dtype=np.float64)
+                ks = float(np.abs(np.cumsum(reference_counts) / max(reference_counts.sum(), 1)
+                                  - np.cumsum(current_counts) / max(current_counts.sum(), 1)).max())
+            else:
+                levels = sorted(set(reference_sketch["counts"]) | set(current_sketch["counts"]))
+                reference_counts = np.array([reference_sketch["counts"].get(level, 0) for level in levels], dtype=np.float64)
+                current_counts = np.array([current_sketch["counts"].get(level, 0) for level in levels], dtype=np.float64)
+
+            expected = _proportions(np.append(reference_counts, reference_sketch["nulls"]))
+            actual = _proportions(np.append(current_counts, current_sketch["nulls"]))
+            psi = float(np.sum((actual - expected) * np.log(actual / expected)))
+            drifted = psi > psi_threshold or (ks is not None and ks > ks_threshold)
+            features[column] = {"psi": psi, "ks": ks, "drifted": drifted}
+
+        drifted_features = [column for column, stats in features.items() if stats["drifted"]]
+        return {
+            "drift_detected": bool(drifted_features),
+            "drifted_features": drifted_features,
+            "psi_threshold": psi_threshold,
+            "ks_threshold": ks_threshold,
+            "reference_rows": reference["rows"],
+            "current_rows": current["rows"],
+            "features": features,
+        }
+    except Exception as e:
+        raise MyException(e, sys) from e
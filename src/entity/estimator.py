@@ -1,4 +1,6 @@
 import sys
+from typing import Optional
+
 import pandas as pd
 from pandas import DataFrame
 from sklearn.pipeline import Pipeline
@@ -19,23 +21,27 @@ class TargetValueMapping:
         return dict(zip(mapping_response.values(), mapping_response.keys()))
 
 class MyModel:
-    def __init__(self, preprocessing_object: Pipeline, trained_model_object: object):
+    def __init__(self, preprocessing_object: Pipeline, trained_model_object: object,
+                 training_state: Optional[dict] = None):
         """
         :param preprocessing_object: Input object of preprocessor
-        :param trained_model_object: trained_model_object
+        :param trained_model_object: fitted classifier of any model engine (see src.entity.model_engines)
+        :param training_state: what the model was trained on (engine, training rows, ingested partitions,
+                               incremental refreshes since the last full build), used by incremental refreshes
         """
         self.preprocessing_object = preprocessing_object
         self.trained_model_object = trained_model_object
+        self.training_state = training_state
 
     def predict(self, dataframe: pd.DataFrame) -> DataFrame:
         """
-        Function accepts preprocessed inputs (with all custom transformation already applied),
-        applies scaling using preprocessing_object, and performs prediction on transformed features.
+        Function accepts raw inputs (or inputs whose categorical features are already encoded),
+        encodes and scales them using preprocessing_object, and performs prediction on transformed features.
         """
         try:
             logging.info("Starting prediction process")
 
-            # step 1: apply scaling transformation using pre-trained preprocessing object
+            # step 1: apply encoding and scaling using pre-trained preprocessing object
             transformed_feature = self.preprocessing_object.transform(dataframe)
 
             # step 2: Perform prediction using trained model
@@ -48,6 +54,20 @@ class MyModel:
             logging.error("Error occured in predict method", exc_info=True)
             raise MyException(e, sys) from e
     
+    def predict_record(self, record: dict):
+        """
+        Single-row fast path of predict for a dict of column -> value (e.g. one form submission),
+        transformed by the plan without building a DataFrame.
+        """
+        try:
+            if not hasattr(self.preprocessing_object, "transform_record"):
+                return self.predict(pd.DataFrame([record]))
+            transformed_feature = self.preprocessing_object.transform_record(record)
+            return self.trained_model_object.predict(transformed_feature)
+        except Exception as e:
+            logging.error("Error occured in predict_record method", exc_info=True)
+            raise MyException(e, sys) from e
+
     def __repr__(self):
         return f"{type(self.trained_model_object).__name__}()"
     
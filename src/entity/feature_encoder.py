@@ -0,0 +1,119 @@
+import sys
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+from pandas import DataFrame
+from sklearn.base import BaseEstimator, TransformerMixin
+
+from src.exception import MyException
+
+
+class FeatureEncoder(BaseEstimator, TransformerMixin):
+    """
+    Turns raw records into the fixed-layout float32 feature matrix the model is trained on.
+
+    The layout is decided once, at fit time: the numeric columns in schema order, then one indicator
+    column per level of each categorical column except its first (sorted) level, which is the baseline
+    as with `pd.get_dummies(drop_first=True)`. Levels unseen at fit time and nulls encode as all zeros.
+    Indicator columns are named `<column>_<level>` unless `feature_names` renames them. A column given
+    a `vocabulary` (the schema domains) keeps exactly those levels instead of learning them from the data.
+
+    Inputs that already hold the indicator columns (e.g. the prediction form, where Gender is sent
+    as 0/1) are accepted: a categorical column is read from its indicators when it is absent or
+    none of its values belongs to the vocabulary. Other columns, like the id or the target, are ignored.
+    """
+    def __init__(self, numeric_columns: List[str], categorical_columns: List[str],
+                 feature_names: Optional[Dict[str, str]] = None, vocabulary: Optional[Dict[str, list]] = None):
+        self.numeric_columns = numeric_columns
+        self.categorical_columns = categorical_columns
+        self.feature_names = feature_names
+        self.vocabulary = vocabulary
+
+    def fit(self, X: DataFrame, y=None) -> "FeatureEncoder":
+        for attribute in ("vocabulary_", "level_index_", "feature_names_out_", "n_features_out_"):
+            self.__dict__.pop(attribute, None)
+        return self.partial_fit(X)
+
+    def partial_fit(self, X: DataFrame, y=None) -> "FeatureEncoder":
+        """
+        Adds the levels seen in a chunk to the vocabulary, so that it can be learnt over streamed data.
+        The layout only gets final once every chunk has been seen.
+        """
+        try:
+            renames = self.feature_names or {}
+            fixed = self.vocabulary or {}
+            vocabulary = getattr(self, "vocabulary_", {})
+            self.vocabulary_ = {}
+            self.level_index_ = {}
+            self.feature_names_out_ = list(self.numeric_columns)
+            for column in self.categorical_columns:
+                if column in fixed:
+                    levels = set(fixed[column])
+                else:
+                    levels = set(pd.Series(X[column]).dropna().unique().tolist()) | set(vocabulary.get(column, []))
+                self.vocabulary_[column] = sorted(levels, key=str)
+                self.level_index_[column] = {level: i for i, level in enumerate(self.vocabulary_[column])}
+                for level in self.vocabulary_[column][1:]:
+                    name = f"{column}_{level}"
+                    self.feature_names_out_.append(renames.get(name, name))
+            self.n_features_out_ = len(self.feature_names_out_)
+            return self
+        except Exception as e:
+            raise MyException(e, sys) from e
+
+    def transform(self, X: DataFrame) -> np.ndarray:
+        try:
+            n_numeric = len(self.numeric_columns)
+            output = np.zeros((len(X), self.n_features_out_), dtype=np.float32)
+            output[:, :n_numeric] = X[self.numeric_columns].to_numpy(dtype=np.float32, na_value=np.nan)
+
+            offset = n_numeric
+            for column, levels in self.vocabulary_.items():
+                width = len(levels) - 1
+                names = self.feature_names_out_[offset:offset + width]
+                values = X[column] if column in X.columns else None
+                if values is None or (X.columns.isin(names).sum() == width and not values.isin(levels).any()):
+                    # already encoded upstream, copy the indicator columns
+                    output[:, offset:offset + width] = X[names].to_numpy(dtype=np.float32)
+                else:
+                    # codes index the sorted vocabulary, -1 for nulls and unseen levels, 0 is the baseline
+                    codes = pd.Categorical(values, categories=levels).codes
+                    rows = np.flatnonzero(codes > 0)
+                    output[rows, offset + codes[rows] - 1] = 1.0
+                offset += width
+            return output
+        except Exception as e:
+            raise MyException(e, sys) from e
+
+    def transform_record(self, record: dict) -> np.ndarray:
+        """
+        Single-row fast path of `transform` for a dict of column -> value, without building a DataFrame.
+        Returns a (1, n_features) float32 array.
+        """
+        try:
+            output = np.zeros((1, self.n_features_out_), dtype=np.float32)
+            row = output[0]
+            n_numeric = len(self.numeric_columns)
+            for i, column in enumerate(self.numeric_columns):
+                value = record.get(column)
+                row[i] = np.nan if value is None else float(value)
+
+            offset = n_numeric
+            for column, level_index in self.level_index_.items():
+                width = len(level_index) - 1
+                code = level_index.get(record.get(column), -1)
+                if code > 0:
+                    row[offset + code - 1] = 1.0
+                elif code < 0:
+                    # not a level of the vocabulary, read the indicators when they are given
+                    for i, name in enumerate(self.feature_names_out_[offset:offset + width]):
+                        if record.get(name) is not None:
+                            row[offset + i] = float(record[name])
+                offset += width
+            return output
+        except Exception as e:
+            raise MyException(e, sys) from e
+
+    def get_feature_names_out(self, input_features=None) -> np.ndarray:
+        return np.asarray(self.feature_names_out_, dtype=object)
@@ -0,0 +1,248 @@
+import hashlib
+import json
+import os
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from typing import Optional, Tuple
+
+import numpy as np
+import sklearn
+from joblib import effective_n_jobs
+from sklearn.metrics import get_scorer
+from sklearn.model_selection import ParameterSampler, train_test_split
+from threadpoolctl import threadpool_limits
+
+from src.entity.model_engines import ITERATION_PARAMS, MODEL_ENGINES, as_category_codes, get_estimator
+from src.entity.parallel_forest import attach_array, share_array
+from src.entity.resampling import rebalance
+from src.exception import MyException
+from src.logger import logging
+from src.utils.main_utils import read_yaml_file, write_yaml_file
+
+# what successive halving grows from round to round: training rows or trees (boosting iterations)
+SEARCH_RESOURCES = ("n_samples", "n_estimators")
+
+
+def _run_trial(arrays: dict, engine: str, params: dict, resource: str, amount: int, scoring: str) -> Tuple[float, float]:
+    """Worker process: fits one candidate on `amount` rows or trees and scores it on the validation rows."""
+    start = time.perf_counter()
+    attached = {name: attach_array(spec) for name, spec in arrays.items()}
+    try:
+        X, y = attached["X"][0], attached["y"][0]
+        X_validation, y_validation = attached["X_validation"][0], attached["y_validation"][0]
+        if resource == "n_samples":
+            X, y = X[:amount], y[:amount]
+        else:
+            params = dict(params, **{ITERATION_PARAMS[engine]: amount})
+        if engine == "random_forest":
+            params = dict(params, n_jobs=1)
+        # one core per trial, the pool runs the trials side by side
+        with threadpool_limits(limits=1):
+            model = get_estimator(engine, params)
+            model.fit(as_category_codes(model, X), y)
+            score = get_scorer(scoring)(model, as_category_codes(model, X_validation), y_validation)
+        return float(score), time.perf_counter() - start
+    finally:
+        del X, y, X_validation, y_validation
+        for _, block in attached.values():
+            if block is not None:
+                block.close()
+
+
+class SuccessiveHalvingSearch:
+    """
+    Budget-aware random search of the hyperparameters of a model engine, on a process pool.
+
+    `n_candidates` configurations are sampled from `space` (lists of values, merged over `params`),
+    scored on a stratified validation split carved from the training rows. Those must be real rows:
+    only the rows the candidates are fitted on are rebalanced, with `resampling_strategy`, so that
+    no synthetic neighbour of a fitted row is ever scored. Every round scores the
+    remaining candidates with `factor` times the resource of the previous one, rows or trees, and
+    keeps the best 1/factor of them, until one would be left or the resource reaches its maximum.
+    No trial starts once `time_budget_seconds` are spent, the best candidate of the last round
+    scored so far wins.
+
+    Each finished trial is memoized in `cache_dir`, under a key of the data, the candidate, the
+    resource and the validation split, so an interrupted or repeated search only runs the trials
+    it has not seen yet.
+    """
+    def __init__(self, params: dict, space: dict, engine: str = "random_forest", n_candidates: int = 20, resource: str = "n_samples",
+                 min_resource: int = 1000, max_resource: Optional[int] = None, factor: int = 3,
+                 time_budget_seconds: Optional[float] = None, validation_fraction: float = 0.2,
+                 scoring: str = "f1", n_jobs: Optional[int] = None, random_state: Optional[int] = None,
+                 cache_dir: Optional[str] = None, resampling_strategy: Optional[str] = None):
+        if engine not in MODEL_ENGINES:
+            raise ValueError(f"Unknown model engine {engine}, expected one of {MODEL_ENGINES}")
+        if resource not in SEARCH_RESOURCES:
+            raise ValueError(f"Unknown search resource {resource}, expected one of {SEARCH_RESOURCES}")
+        self.params = params
+        self.space = space
+        self.engine = engine
+        self.n_candidates = n_candidates
+        self.resource = resource
+        self.min_resource = min_resource
+        self.max_resource = max_resource
+        self.factor = factor
+        self.time_budget_seconds = time_budget_seconds
+        self.validation_fraction = validation_fraction
+        self.scoring = scoring
+        self.n_jobs = n_jobs
+        self.random_state = random_state
+        self.cache_dir = cache_dir
+        self.resampling_strategy = resampling_strategy
+
+    @classmethod
+    def from_config(cls, params: dict, search_config: dict, engine: str = "random_forest",
+                    cache_dir: Optional[str] = None, resampling_strategy: Optional[str] = None) -> "SuccessiveHalvingSearch":
+        """
+        Builds the search described by the `search` section of an engine in config/model.yaml.
+        """
+        options = {key: value for key, value in search_config.items() if key not in ("enabled", "space")}
+        return cls(params=params, space=search_config["space"], engine=engine, cache_dir=cache_dir,
+                   resampling_strategy=resampling_strategy, **options)
+
+    def _trial_key(self, data_key: str, candidate: dict, amount: int) -> str:
+        inputs = {
+            "data": data_key,
+            "engine": self.engine,
+            "params": candidate,
+            "resource": [self.resource, amount],
+            "validation": [self.validation_fraction, self.random_state],
+            "resampling": self.resampling_strategy,
+            "scoring": self.scoring,
+            "scikit-learn": sklearn.__version__,
+        }
+        return hashlib.sha256(json.dumps(inputs, sort_keys=True, default=str).encode()).hexdigest()
+
+    def _load_trial(self, key: str) -> Optional[dict]:
+        if self.cache_dir is None:
+            return None
+        file_path = os.path.join(self.cache_dir, f"{key}.yaml")
+        try:
+            return read_yaml_file(file_path) if os.path.exists(file_path) else None
+        except Exception:
+            # a trial record that cannot be read is run again
+            return None
+
+    def _save_trial(self, key: str, trial: dict) -> None:
+        if self.cache_dir is None:
+            return
+        file_path = os.path.join(self.cache_dir, f"{key}.yaml")
+        write_yaml_file(file_path + ".tmp", trial, replace=True)
+        os.replace(file_path + ".tmp", file_path)
+
+    def run(self, X: np.ndarray, y: np.ndarray, data_key: str) -> dict:
+        """
+        Runs the search on the training data (X, y), identified by `data_key` for the trial cache. (X, y)
+        are the real training rows, not rebalanced yet.
+
+        Returns
+        -------
+        dict
+            Report of the search: the best parameters (params updated with the best candidate) and
+            score, every round with its trials, and whether the time budget cut the search short.
+        """
+        try:
+            start = time.perf_counter()
+            y = np.asarray(y)
+            train_index, validation_index = train_test_split(np.arange(len(y)), test_size=self.validation_fraction,
+                                                             stratify=y, random_state=self.random_state)
+            X_train, y_train = X[np.sort(train_index)], y[np.sort(train_index)]
+            if self.resampling_strategy is not None:
+                X_train, y_train, _, _ = rebalance(X_train, y_train, strategy=self.resampling_strategy,
+                                                   n_jobs=self.n_jobs, random_state=self.random_state)
+            # shuffled, so that the first rows given to the early rounds are a sample of all of them
+            order = np.random.RandomState(self.random_state).permutation(len(y_train))
+            X_train, y_train = np.asarray(X_train)[order], np.asarray(y_train)[order]
+            validation_index = np.sort(validation_index)
+            max_resource = self.max_resource or (len(y_train) if self.resource == "n_samples"
+                                                 else self.params.get(ITERATION_PARAMS[self.engine], 100))
+            candidates = [dict(candidate) for candidate in
+                          ParameterSampler(self.space, n_iter=self.n_candidates, random_state=self.random_state)]
+            candidates = list({json.dumps(candidate, sort_keys=True, default=str): candidate
+                               for candidate in candidates}.values())
+            n_workers = max(1, min(effective_n_jobs(self.n_jobs), len(candidates)))
+            # the time budget is spent on trials, the rebalancing above is not part of it
+            deadline = None if self.time_budget_seconds is None else time.perf_counter() + self.time_budget_seconds
+
+            shared = {name: share_array(array) for name, array in
+                      (("X", X_train), ("y", y_train), ("X_validation", X[validation_index]),
+                       ("y_validation", y[validation_index]))}
+            del X_train, y_train
+            rounds, budget_exhausted = [], False
+            amount = min(self.min_resource, max_resource)
+            try:
+                with ProcessPoolExecutor(max_workers=n_workers) as executor:
+                    while True:
+                        trials = self._run_round(executor, {name: spec for name, (spec, _) in shared.items()},
+                                                 candidates, amount, data_key, deadline)
+                        budget_exhausted = len(trials) < len(candidates)
+                        if trials:
+                            rounds.append({"resource": amount, "n_candidates": len(candidates), "trials": trials})
+                        # stop when the resource is exhausted or a single candidate would be promoted
+                        if budget_exhausted or amount >= max_resource or len(trials) // self.factor <= 1:
+                            break
+                        ranked = sorted(trials, key=lambda trial: trial["score"], reverse=True)
+                        candidates = [trial["params"] for trial in ranked[:max(1, len(ranked) // self.factor)]]
+                        amount = min(amount * self.factor, max_resource)
+            finally:
+                for _, block in shared.values():
+                    if block is not None:
+                        block.close()
+                        block.unlink()
+
+            if not rounds:
+                raise Exception("No hyperparameter search trial finished within the time budget")
+            best = max(rounds[-1]["trials"], key=lambda trial: trial["score"])
+            report = {
+                "engine": self.engine,
+                "resource": self.resource,
+                "resampling_strategy": self.resampling_strategy,
+                "best_params": dict(self.params, **best["params"]),
+                "best_score": best["score"],
+                "scoring": self.scoring,
+                "workers": n_workers,
+                "seconds": round(time.perf_counter() - start, 4),
+                "budget_exhausted": budget_exhausted,
+                "trials_run": sum(not trial["cached"] for search_round in rounds for trial in search_round["trials"]),
+                "trials_cached": sum(trial["cached"] for search_round in rounds for trial in search_round["trials"]),
+                "rounds": rounds,
+            }
+            logging.info(f"Hyperparameter search: best {self.scoring}={report['best_score']:.4f} with {best['params']} "
+                         f"in {report['seconds']}s ({report['trials_run']} trials run, {report['trials_cached']} cached)")
+            return report
+        except Exception as e:
+            raise MyException(e, sys) from e
+
+    def _run_round(self, executor: ProcessPoolExecutor, arrays: dict, candidates: list, amount: int,
+                   data_key: str, deadline: Optional[float]) -> list:
+        """Scores every candidate with `amount` of the resource, from the cache or on the pool."""
+        trials, pending = [], {}
+        for candidate in candidates:
+            key = self._trial_key(data_key, candidate, amount)
+            cached = self._load_trial(key)
+            if cached is not None:
+                trials.append(dict(cached, cached=True))
+                continue
+            if deadline is not None and time.perf_counter() >= deadline:
+                break
+            future = executor.submit(_run_trial, arrays, self.engine, dict(self.params, **candidate), self.resource,
+                                     amount, self.scoring)
+            pending[future] = (key, candidate)
+
+        while pending:
+            timeout = None if deadline is None else max(0.0, deadline - time.perf_counter())
+            done, _ = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+            if not done:
+                # out of time: queued trials are dropped, the running ones are left to finish
+                for future in pending:
+                    future.cancel()
+                break
+            for future in done:
+                key, candidate = pending.pop(future)
+                score, seconds = future.result()
+                trial = {"params": candidate, "resource": amount, "score": score, "seconds": round(seconds, 4)}
+                self._save_trial(key, trial)
+                trials.append(dict(trial, cached=False))
+        return trials
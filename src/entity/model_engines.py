@@ -0,0 +1,147 @@
+import sys
+import time
+from typing import Optional, Tuple
+
+import numpy as np
+from joblib import effective_n_jobs
+from sklearn.ensemble import HistGradientBoostingClassifier, RandomForestClassifier
+from threadpoolctl import threadpool_limits
+
+from src.entity.parallel_forest import train_forest
+from src.entity.schema import load_schema
+from src.exception import MyException
+from src.logger import logging
+
+# "random_forest": RandomForestClassifier, trained by threads or by shards over a process pool
+# "hist_gradient_boosting": HistGradientBoostingClassifier, binned features, native categorical
+#     splits and early stopping, trained on OpenMP threads
+MODEL_ENGINES = ("random_forest", "hist_gradient_boosting")
+
+# parameter holding the number of trees / boosting iterations of each engine
+ITERATION_PARAMS = {"random_forest": "n_estimators", "hist_gradient_boosting": "max_iter"}
+
+# engines a fitted model of which can be grown on new rows only; a warm-start fit of gradient boosting
+# refits its bin mapper (and known categories) on those rows, which changes what its existing trees predict
+EXTENDABLE_ENGINES = ("random_forest",)
+
+
+def get_estimator(engine: str, params: dict):
+    """
+    Returns the unfitted estimator of a model engine. For "hist_gradient_boosting", the
+    `categorical_features` given by name are resolved to their position in the encoded feature
+    matrix, whose layout is the schema feature order.
+    """
+    if engine == "random_forest":
+        return RandomForestClassifier(**params)
+    if engine == "hist_gradient_boosting":
+        params = dict(params)
+        categorical_features = params.get("categorical_features")
+        if isinstance(categorical_features, (list, tuple)) and any(isinstance(f, str) for f in categorical_features):
+            feature_index = load_schema().feature_index
+            params["categorical_features"] = [feature_index[f] if isinstance(f, str) else f for f in categorical_features]
+        return HistGradientBoostingClassifier(**params)
+    raise ValueError(f"Unknown model engine {engine}, expected one of {MODEL_ENGINES}")
+
+
+def as_category_codes(model, X: np.ndarray) -> np.ndarray:
+    """
+    Returns X with the categorical columns of a gradient boosting `model` holding integer codes.
+    Rows synthesised by SMOTE interpolate between two rows, so their codes can be fractional;
+    those are rounded to the nearest code. X is copied only when a column needs rounding.
+    """
+    categorical_features = getattr(model, "categorical_features", None)
+    if not isinstance(categorical_features, (list, tuple)) or not categorical_features:
+        return X
+    indices = [i for i in categorical_features if not np.array_equal(X[:, i], np.rint(X[:, i]), equal_nan=True)]
+    if not indices:
+        return X
+    X = np.array(X)
+    X[:, indices] = np.rint(X[:, indices])
+    return X
+
+
+def train_model(engine: str, X: np.ndarray, y: np.ndarray, params: dict, mode: str = "threads",
+                n_jobs: Optional[int] = None) -> Tuple[object, dict]:
+    """
+    Fits the estimator of `engine` with `params` on `n_jobs` cores (-1 for all of them).
+
+    The forest is trained by train_forest in the given parallel `mode`. Boosting iterations are
+    sequential, so gradient boosting always runs on threads, its OpenMP pool limited to `n_jobs`.
+
+    Returns
+    -------
+    tuple
+        The fitted estimator and a report of the engine, the workers and the time spent.
+    """
+    try:
+        if engine == "random_forest":
+            model, report = train_forest(X, y, params, mode=mode, n_jobs=n_jobs)
+            return model, dict(report, engine=engine)
+
+        model = get_estimator(engine, params)
+        workers = effective_n_jobs(n_jobs)
+        start = time.perf_counter()
+        with threadpool_limits(limits=workers, user_api="openmp"):
+            model.fit(as_category_codes(model, X), y)
+        report = {
+            "engine": engine,
+            "mode": "threads",
+            "n_jobs": n_jobs,
+            "workers": workers,
+            "n_iter": int(model.n_iter_),
+            "seconds": round(time.perf_counter() - start, 4),
+        }
+        logging.info(f"Trained {engine} with {report['n_iter']} iterations in {report['seconds']}s ({workers} threads)")
+        return model, report
+    except Exception as e:
+        raise MyException(e, sys) from e
+
+
+def _staged_proba(model, X: np.ndarray, n_iter: int) -> np.ndarray:
+    """Class probabilities of a forest restricted to its first `n_iter` trees."""
+    return np.mean([tree.predict_proba(X) for tree in model.estimators_[:n_iter]], axis=0)
+
+
+def extend_model(engine: str, model, X: np.ndarray, y: np.ndarray, n_new: int,
+                 n_jobs: Optional[int] = None, check_rows: int = 1000) -> Tuple[object, dict]:
+    """
+    Grows a fitted model of an EXTENDABLE_ENGINES engine with `n_new` trees fitted on (X, y) only,
+    through `warm_start`. (X, y) must hold every class of the model. The existing trees are kept as
+    they are, which is checked on up to `check_rows` rows of X: the predictions of the first trees
+    must be unchanged.
+
+    Returns
+    -------
+    tuple
+        The extended model and a report of the iterations before and after and of the time spent.
+    """
+    try:
+        if engine not in EXTENDABLE_ENGINES:
+            raise ValueError(f"A {engine} model cannot be extended, expected one of {EXTENDABLE_ENGINES}")
+        if not np.array_equal(np.unique(y), model.classes_):
+            raise ValueError(f"Rows to extend the model with hold classes {np.unique(y)}, the model {model.classes_}")
+        before = len(model.estimators_)
+        X_check = np.asarray(X[:check_rows], dtype=np.float32)
+        proba_before = _staged_proba(model, X_check, before)
+        start = time.perf_counter()
+        # the out-of-bag estimate would only cover the new trees
+        for attribute in ("oob_score_", "oob_decision_function_"):
+            model.__dict__.pop(attribute, None)
+        model.set_params(warm_start=True, oob_score=False, n_jobs=n_jobs, n_estimators=before + n_new)
+        model.fit(X, y)
+        model.set_params(warm_start=False)
+        if not np.array_equal(_staged_proba(model, X_check, before), proba_before):
+            raise ValueError(f"Extending the {engine} model changed the predictions of its first {before} trees")
+        report = {
+            "engine": engine,
+            "mode": "warm_start",
+            "iterations_before": before,
+            "iterations_after": len(model.estimators_),
+            "rows": int(len(y)),
+            "seconds": round(time.perf_counter() - start, 4),
+        }
+        logging.info(f"Extended {engine} from {before} to {report['iterations_after']} iterations "
+                     f"on {report['rows']} rows in {report['seconds']}s")
+        return model, report
+    except Exception as e:
+        raise MyException(e, sys) from e
@@ -0,0 +1,141 @@
+import mmap
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+from typing import Optional, Tuple
+
+import numpy as np
+from joblib import effective_n_jobs
+from sklearn.ensemble import RandomForestClassifier
+
+from src.exception import MyException
+from src.logger import logging
+
+# "threads": one RandomForestClassifier fitting its trees on n_jobs threads of this process
+# "processes": the tree budget split into one shard per worker process, sub-forests merged into one
+PARALLEL_TRAINING_MODES = ("threads", "processes")
+
+
+def share_array(array: np.ndarray) -> Tuple[tuple, Optional[shared_memory.SharedMemory]]:
+    """
+    Describes how a worker process can map `array` without receiving a pickled copy of it: the .npy
+    file behind a C-contiguous memory-mapped array (or view of one), otherwise a shared memory block the
+    array is copied into once. Returns the description and the block to release (None for a file).
+    """
+    if isinstance(array, np.memmap) and array.flags.c_contiguous:
+        # views copy filename and offset from the array they slice, the offset is taken from the data
+        # address instead, relative to the memmap that owns the mapping
+        root = array
+        while isinstance(root.base, np.memmap):
+            root = root.base
+        if isinstance(root.base, mmap.mmap) and root.filename is not None:
+            offset = root.offset + (array.ctypes.data - root.ctypes.data)
+            return ("file", root.filename, offset, array.shape, array.dtype.str), None
+    array = np.ascontiguousarray(array)
+    block = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+    np.ndarray(array.shape, dtype=array.dtype, buffer=block.buf)[...] = array
+    return ("shared_memory", block.name, 0, array.shape, array.dtype.str), block
+
+
+def attach_array(spec: tuple) -> Tuple[np.ndarray, Optional[shared_memory.SharedMemory]]:
+    kind, name, offset, shape, dtype = spec
+    if kind == "file":
+        return np.memmap(name, dtype=dtype, mode="c", offset=offset, shape=shape), None
+    block = shared_memory.SharedMemory(name=name)
+    return np.ndarray(shape, dtype=dtype, buffer=block.buf), block
+
+
+def _fit_shard(X_spec: tuple, y_spec: tuple, params: dict, n_estimators: int, random_state: int) -> Tuple[RandomForestClassifier, float]:
+    """Worker process: fits one sub-forest, single-threaded, on the shared training arrays."""
+    start = time.perf_counter()
+    X, X_block = attach_array(X_spec)
+    y, y_block = attach_array(y_spec)
+    try:
+        forest = RandomForestClassifier(**dict(params, n_estimators=n_estimators, random_state=random_state, n_jobs=1))
+        forest.fit(X, y)
+        return forest, time.perf_counter() - start
+    finally:
+        # the views must be gone before the blocks can be closed
+        del X, y
+        for block in (X_block, y_block):
+            if block is not None:
+                block.close()
+
+
+def merge_forests(forests: list) -> RandomForestClassifier:
+    """
+    Merges sub-forests fitted on the same data into one estimator holding all of their trees.
+    """
+    forest = forests[0]
+    for other in forests[1:]:
+        if not np.array_equal(forest.classes_, other.classes_):
+            raise ValueError("Sub-forests were fitted on different classes and cannot be merged")
+        forest.estimators_ += other.estimators_
+    forest.n_estimators = len(forest.estimators_)
+    # out-of-bag estimates of the first shard do not describe the merged forest
+    for attribute in ("oob_score_", "oob_decision_function_"):
+        forest.__dict__.pop(attribute, None)
+    forest.oob_score = False
+    return forest
+
+
+def train_forest(X: np.ndarray, y: np.ndarray, params: dict, mode: str = "threads",
+                 n_jobs: Optional[int] = None) -> Tuple[RandomForestClassifier, dict]:
+    """
+    Fits a RandomForestClassifier with `params` on `n_jobs` cores (-1 for all of them).
+
+    In "threads" mode the trees are fitted by the threads of a single estimator. In "processes" mode
+    the `n_estimators` trees are split into one shard per worker process, each worker maps the
+    training arrays (the .npy file behind a memory-mapped X, shared memory otherwise) and fits its
+    shard with its own seed derived from `random_state`, and the sub-forests are merged. The
+    returned estimator predicts on `n_jobs` threads in both modes.
+
+    Returns
+    -------
+    tuple
+        The fitted forest and a report of the mode, the workers and the seconds spent per shard.
+    """
+    try:
+        if mode not in PARALLEL_TRAINING_MODES:
+            raise ValueError(f"Unknown parallel training mode {mode}, expected one of {PARALLEL_TRAINING_MODES}")
+        n_estimators = params.get("n_estimators", 100)
+        n_workers = max(1, min(effective_n_jobs(n_jobs), n_estimators))
+        start = time.perf_counter()
+
+        if mode == "threads" or n_workers == 1:
+            forest = RandomForestClassifier(**dict(params, n_jobs=n_jobs)).fit(X, y)
+            shards = [{"shard": 0, "n_estimators": n_estimators, "seconds": round(time.perf_counter() - start, 4)}]
+        else:
+            sizes = [len(part) for part in np.array_split(np.arange(n_estimators), n_workers)]
+            seeds = np.random.RandomState(params.get("random_state")).randint(np.iinfo(np.int32).max, size=n_workers)
+            X_spec, X_block = share_array(X)
+            y_spec, y_block = share_array(np.asarray(y))
+            try:
+                with ProcessPoolExecutor(max_workers=n_workers) as executor:
+                    futures = [executor.submit(_fit_shard, X_spec, y_spec, params, size, int(seed))
+                               for size, seed in zip(sizes, seeds)]
+                    results = [future.result() for future in futures]
+            finally:
+                for block in (X_block, y_block):
+                    if block is not None:
+                        block.close()
+                        block.unlink()
+            forest = merge_forests([sub_forest for sub_forest, _ in results])
+            forest.set_params(n_jobs=n_jobs)
+            shards = [{"shard": i, "n_estimators": size, "seconds": round(seconds, 4)}
+                      for i, (size, (_, seconds)) in enumerate(zip(sizes, results))]
+
+        report = {
+            "mode": mode,
+            "n_jobs": n_jobs,
+            "workers": n_workers,
+            "n_estimators": len(forest.estimators_),
+            "seconds": round(time.perf_counter() - start, 4),
+            "shards": shards,
+        }
+        logging.info(f"Trained {report['n_estimators']} trees in {report['seconds']}s "
+                     f"({mode}, {n_workers} workers): {[shard['seconds'] for shard in shards]}")
+        return forest, report
+    except Exception as e:
+        raise MyException(e, sys) from e
@@ -0,0 +1,121 @@
+import sys
+import time
+from typing import Optional, Tuple
+
+import numpy as np
+from imblearn.combine import SMOTEENN
+from imblearn.over_sampling import SMOTE, RandomOverSampler
+from imblearn.under_sampling import EditedNearestNeighbours, RandomUnderSampler
+from scipy import sparse
+from scipy.spatial import cKDTree
+from sklearn.base import BaseEstimator
+from sklearn.neighbors import NearestNeighbors
+from sklearn.utils.class_weight import compute_class_weight
+
+from src.exception import MyException
+from src.logger import logging
+
+# "smoteenn": SMOTE + ENN cleaning with exact neighbours searched on n_jobs cores
+# "smote_approx": SMOTE on approximate neighbours and without the ENN pass over every row
+# "random_over" / "random_under": duplicate minority rows / drop majority rows
+# "class_weight": no resampling, the model is trained with balanced class weights
+RESAMPLING_STRATEGIES = ("smoteenn", "smote_approx", "random_over", "random_under", "class_weight")
+
+class ApproximateNeighbors(BaseEstimator):
+    """
+    Approximate k-nearest neighbours on a scipy cKDTree, usable as the `k_neighbors` of SMOTE.
+
+    With `eps` > 0 the tree prunes branches that cannot hold a point closer than (1 + eps) times
+    the current k-th distance, so every returned neighbour is within (1 + eps) of the exact one.
+    Queries run on `n_jobs` threads (-1 for all cores).
+    """
+    def __init__(self, n_neighbors: int = 6, eps: float = 1.0, n_jobs: Optional[int] = None):
+        self.n_neighbors = n_neighbors
+        self.eps = eps
+        self.n_jobs = n_jobs
+
+    def fit(self, X, y=None) -> "ApproximateNeighbors":
+        self.fit_X_ = np.asarray(X, dtype=np.float64)
+        self.tree_ = cKDTree(self.fit_X_)
+        return self
+
+    def kneighbors(self, X=None, n_neighbors: Optional[int] = None, return_distance: bool = True):
+        n_neighbors = n_neighbors or self.n_neighbors
+        X = self.fit_X_ if X is None else np.asarray(X, dtype=np.float64)
+        distances, indices = self.tree_.query(X, k=n_neighbors, eps=self.eps, workers=self.n_jobs or 1)
+        distances, indices = distances.reshape(len(X), n_neighbors), indices.reshape(len(X), n_neighbors)
+        return (distances, indices) if return_distance else indices
+
+    def kneighbors_graph(self, X=None, n_neighbors: Optional[int] = None, mode: str = "connectivity"):
+        distances, indices = self.kneighbors(X, n_neighbors=n_neighbors)
+        n_queries, n_neighbors = indices.shape
+        data = np.ones(indices.size) if mode == "connectivity" else distances.ravel()
+        indptr = np.arange(0, n_queries * n_neighbors + 1, n_neighbors)
+        return sparse.csr_matrix((data, indices.ravel(), indptr), shape=(n_queries, len(self.fit_X_)))
+
+
+def get_resampler(strategy: str, n_jobs: Optional[int] = None, random_state: Optional[int] = None):
+    """
+    Returns the imblearn sampler of a rebalancing strategy, None for "class_weight".
+    """
+    if strategy == "smoteenn":
+        smote = SMOTE(sampling_strategy="minority", random_state=random_state,
+                      k_neighbors=NearestNeighbors(n_neighbors=6, n_jobs=n_jobs))
+        enn = EditedNearestNeighbours(sampling_strategy="all", n_jobs=n_jobs)
+        return SMOTEENN(sampling_strategy="minority", smote=smote, enn=enn, random_state=random_state)
+    if strategy == "smote_approx":
+        return SMOTE(sampling_strategy="minority", random_state=random_state,
+                     k_neighbors=ApproximateNeighbors(n_neighbors=6, n_jobs=n_jobs))
+    if strategy == "random_over":
+        return RandomOverSampler(sampling_strategy="minority", random_state=random_state)
+    if strategy == "random_under":
+        return RandomUnderSampler(sampling_strategy="majority", random_state=random_state)
+    if strategy == "class_weight":
+        return None
+    raise ValueError(f"Unknown resampling strategy {strategy}, expected one of {RESAMPLING_STRATEGIES}")
+
+
+def _class_counts(y: np.ndarray) -> dict:
+    classes, counts = np.unique(y, return_counts=True)
+    return {int(label): int(count) for label, count in zip(classes, counts)}
+
+
+def rebalance(X: np.ndarray, y: np.ndarray, strategy: str, n_jobs: Optional[int] = None,
+              random_state: Optional[int] = None) -> Tuple[np.ndarray, np.ndarray, Optional[dict], dict]:
+    """
+    Rebalances the classes of (X, y) with `strategy`.
+
+    Returns
+    -------
+    tuple
+        The resampled X and y, the class weights for the model ("class_weight" strategy only,
+        None otherwise) and a report of the class counts and of the time spent.
+    """
+    try:
+        y = np.asarray(y)
+        start = time.perf_counter()
+        resampler = get_resampler(strategy, n_jobs=n_jobs, random_state=random_state)
+        class_weight = None
+        if resampler is None:
+            classes = np.unique(y)
+            weights = compute_class_weight("balanced", classes=classes, y=y)
+            class_weight = {int(label): float(weight) for label, weight in zip(classes, weights)}
+            X_resampled, y_resampled = X, y
+        else:
+            X_resampled, y_resampled = resampler.fit_resample(X, y)
+        report = {
+            "strategy": strategy,
+            "n_jobs": n_jobs,
+            "seconds": round(time.perf_counter() - start, 4),
+            "rows_before": int(len(y)),
+            "rows_after": int(len(y_resampled)),
+            "class_counts_before": _class_counts(y),
+            "class_counts_after": _class_counts(y_resampled),
+        }
+        if class_weight is not None:
+            report["class_weight"] = class_weight
+        logging.info(f"Rebalanced with {strategy} in {report['seconds']}s: "
+                     f"{report['class_counts_before']} -> {report['class_counts_after']}")
+        return X_resampled, y_resampled, class_weight, report
+    except Exception as e:
+        raise MyException(e, sys) from e
@@ -0,0 +1,147 @@
+import hashlib
+import sys
+from dataclasses import dataclass
+from functools import lru_cache
+from types import MappingProxyType
+from typing import Mapping, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+import yaml
+
+from src.constants import SCHEMA_FILE_PATH, TARGET_COLUMN
+from src.exception import MyException
+
+# what the value checks of data validation (nulls, bounds, domains, dtypes) do when a column exceeds them
+VALUE_CHECK_SEVERITIES = ("warn", "fail")
+
+# integer widths the ingested int columns are stored with, the first one holding the schema bounds
+STORAGE_INT_DTYPES = (np.int8, np.int16, np.int32, np.int64)
+
+
+def _as_tuple(value) -> tuple:
+    if value is None:
+        return ()
+    return (value,) if isinstance(value, str) else tuple(value)
+
+
+def _storage_int_dtype(bound: Optional[tuple], domain: Optional[tuple]) -> np.dtype:
+    """Smallest integer dtype holding the [min, max] bounds or the domain of a column, int64 when open."""
+    low, high = bound if bound else (None, None)
+    if domain:
+        low, high = min(domain), max(domain)
+    if low is None or high is None:
+        return np.dtype(np.int64)
+    return next(np.dtype(dtype) for dtype in STORAGE_INT_DTYPES
+                if np.iinfo(dtype).min <= low and high <= np.iinfo(dtype).max)
+
+
+@dataclass(frozen=True)
+class Schema:
+    """
+    config/schema.yaml compiled once into an immutable object shared by every pipeline stage and the
+    serving path, use `load_schema()` to get it.
+
+    Besides the declared lists it precomputes the lookups the per-batch code needs: column positions,
+    dtypes, the numeric feature columns, the category vocabularies (the `domains` of the categorical
+    columns, sorted), the fixed feature order of the encoded matrix and the dtypes ingested data is
+    stored with (int widths from the bounds, float32, categories of the vocabulary), the same for every
+    chunk. Mappings are read-only views.
+    """
+    columns: Tuple[str, ...]
+    dtypes: Mapping[str, str]
+    column_index: Mapping[str, int]
+    numerical_columns: Tuple[str, ...]
+    categorical_columns: Tuple[str, ...]
+    drop_columns: Tuple[str, ...]
+    target_column: str
+    bounds: Mapping[str, Tuple[Optional[float], Optional[float]]]
+    domains: Mapping[str, tuple]
+    max_null_fraction: float
+    max_violation_fraction: float
+    value_checks: str
+    numeric_features: Tuple[str, ...]
+    standard_columns: Tuple[str, ...]
+    minmax_columns: Tuple[str, ...]
+    feature_names: Mapping[str, str]
+    vocabularies: Mapping[str, tuple]
+    feature_order: Tuple[str, ...]
+    feature_index: Mapping[str, int]
+    storage_dtypes: Mapping[str, object]
+    digest: str
+
+    @classmethod
+    def from_config(cls, schema_config: dict, digest: str = "") -> "Schema":
+        """
+        Compiles the parsed content of schema.yaml.
+        """
+        try:
+            dtypes = {name: dtype for column in schema_config["columns"] for name, dtype in column.items()}
+            columns = tuple(dtypes)
+            drop_columns = _as_tuple(schema_config.get("drop_columns"))
+            categorical_columns = _as_tuple(schema_config.get("categorical_columns"))
+            domains = {column: tuple(values) for column, values in (schema_config.get("domains") or {}).items()}
+            feature_names = dict(schema_config.get("feature_names") or {})
+            value_checks = schema_config.get("value_checks", "warn")
+            if value_checks not in VALUE_CHECK_SEVERITIES:
+                raise ValueError(f"Unknown value_checks {value_checks}, expected one of {VALUE_CHECK_SEVERITIES}")
+
+            # layout of the encoded matrix: numeric features, then one indicator per level but the first
+            numeric_features = tuple(column for column, dtype in dtypes.items() if dtype in ("int", "float")
+                                     and column not in drop_columns and column != TARGET_COLUMN)
+            vocabularies = {column: tuple(sorted(domains[column], key=str))
+                            for column in categorical_columns if column in domains}
+            bounds = {column: tuple(bound) for column, bound in (schema_config.get("bounds") or {}).items()}
+            storage_dtypes = {}
+            for column, dtype in dtypes.items():
+                if dtype == "int":
+                    storage_dtypes[column] = _storage_int_dtype(bounds.get(column), domains.get(column))
+                elif dtype == "float":
+                    storage_dtypes[column] = np.dtype(np.float32)
+                elif dtype == "category" and column in vocabularies:
+                    storage_dtypes[column] = pd.CategoricalDtype(list(vocabularies[column]))
+
+            feature_order = list(numeric_features)
+            for column, levels in vocabularies.items():
+                for level in levels[1:]:
+                    name = f"{column}_{level}"
+                    feature_order.append(feature_names.get(name, name))
+
+            return cls(
+                columns=columns,
+                dtypes=MappingProxyType(dtypes),
+                column_index=MappingProxyType({column: i for i, column in enumerate(columns)}),
+                numerical_columns=_as_tuple(schema_config.get("numerical_columns")),
+                categorical_columns=categorical_columns,
+                drop_columns=drop_columns,
+                target_column=TARGET_COLUMN,
+                bounds=MappingProxyType(bounds),
+                domains=MappingProxyType(domains),
+                max_null_fraction=float(schema_config.get("max_null_fraction", 0.0)),
+                max_violation_fraction=float(schema_config.get("max_violation_fraction", 0.0)),
+                value_checks=value_checks,
+                numeric_features=numeric_features,
+                standard_columns=_as_tuple(schema_config.get("num_features")),
+                minmax_columns=_as_tuple(schema_config.get("mm_columns")),
+                feature_names=MappingProxyType(feature_names),
+                vocabularies=MappingProxyType(vocabularies),
+                feature_order=tuple(feature_order),
+                feature_index=MappingProxyType({feature: i for i, feature in enumerate(feature_order)}),
+                storage_dtypes=MappingProxyType(storage_dtypes),
+                digest=digest,
+            )
+        except Exception as e:
+            raise MyException(e, sys) from e
+
+
+@lru_cache(maxsize=None)
+def load_schema(file_path: str = SCHEMA_FILE_PATH) -> Schema:
+    """
+    Reads and compiles schema.yaml, once per process and file path.
+    """
+    try:
+        with open(file_path, "rb") as yaml_file:
+            content = yaml_file.read()
+        return Schema.from_config(yaml.safe_load(content), digest=hashlib.sha256(content).hexdigest())
+    except Exception as e:
+        raise MyException(e, sys) from e
@@ -0,0 +1,108 @@
+import sys
+
+import numpy as np
+from pandas import DataFrame
+from sklearn.base import BaseEstimator, TransformerMixin
+from sklearn.preprocessing import StandardScaler, MinMaxScaler
+
+from src.entity.feature_encoder import FeatureEncoder
+from src.entity.schema import Schema
+from src.exception import MyException
+
+
+class TransformationPlan(BaseEstimator, TransformerMixin):
+    """
+    The feature engineering of the project in one object, executed by training (DataTransformation),
+    evaluation (ModelEvaluation) and serving (VehicleDataClassifier) through the saved model.
+
+    The FeatureEncoder turns raw records into the fixed float32 layout (columns not in the layout,
+    such as `drop_columns` and the target, are ignored), then the `num_features` columns are
+    standardised and the `mm_columns` columns min-max scaled. Both scalers are fitted as usual and
+    compiled into one per-column scale and offset, so transforming is a single multiply-add over
+    the encoded matrix, for a batch (`transform`) or a single record (`transform_record`).
+    `partial_fit` fits the same plan chunk by chunk, for training data larger than memory.
+    """
+    def __init__(self, feature_encoder: FeatureEncoder, standard_columns: list, minmax_columns: list):
+        self.feature_encoder = feature_encoder
+        self.standard_columns = standard_columns
+        self.minmax_columns = minmax_columns
+
+    @classmethod
+    def from_schema(cls, schema: Schema) -> "TransformationPlan":
+        """
+        Builds the (unfitted) plan described by the compiled schema. The categorical vocabularies come
+        from the schema domains, so the encoded layout is `schema.feature_order` whatever the data holds.
+        """
+        try:
+            # plain lists and dicts: the plan is pickled with the model, the read-only schema views are not
+            feature_encoder = FeatureEncoder(numeric_columns=list(schema.numeric_features),
+                                             categorical_columns=list(schema.categorical_columns),
+                                             feature_names=dict(schema.feature_names),
+                                             vocabulary={column: list(levels) for column, levels in schema.vocabularies.items()})
+            return cls(feature_encoder=feature_encoder,
+                       standard_columns=list(schema.standard_columns),
+                       minmax_columns=list(schema.minmax_columns))
+        except Exception as e:
+            raise MyException(e, sys) from e
+
+    def fit(self, X: DataFrame, y=None) -> "TransformationPlan":
+        for attribute in ("standard_scaler_", "minmax_scaler_", "scale_", "offset_"):
+            self.__dict__.pop(attribute, None)
+        self.feature_encoder.fit(X.iloc[:0])
+        return self.partial_fit(X)
+
+    def partial_fit(self, X: DataFrame, y=None) -> "TransformationPlan":
+        """
+        Updates the vocabulary and the scaler statistics with one chunk of training data, so that the
+        plan can be fitted over data streamed from disk. The plan can transform after every call.
+        """
+        try:
+            self.feature_encoder.partial_fit(X)
+            if not hasattr(self, "standard_scaler_"):
+                self.standard_scaler_ = StandardScaler()
+                self.minmax_scaler_ = MinMaxScaler()
+            # scaled columns are numeric, their values are the same before and after encoding
+            self.standard_scaler_.partial_fit(X[self.standard_columns].to_numpy(dtype=np.float32, na_value=np.nan))
+            self.minmax_scaler_.partial_fit(X[self.minmax_columns].to_numpy(dtype=np.float32, na_value=np.nan))
+            self._compile()
+            return self
+        except Exception as e:
+            raise MyException(e, sys) from e
+
+    def _compile(self) -> None:
+        # (x - mean) / scale and x * scale + min as one x * scale + offset, identity elsewhere
+        names = self.feature_encoder.feature_names_out_
+        standard_index = [names.index(column) for column in self.standard_columns]
+        minmax_index = [names.index(column) for column in self.minmax_columns]
+        scale = np.ones(len(names), dtype=np.float64)
+        offset = np.zeros(len(names), dtype=np.float64)
+        scale[standard_index] = 1.0 / self.standard_scaler_.scale_
+        offset[standard_index] = -self.standard_scaler_.mean_ / self.standard_scaler_.scale_
+        scale[minmax_index] = self.minmax_scaler_.scale_
+        offset[minmax_index] = self.minmax_scaler_.min_
+        self.scale_ = scale.astype(np.float32)
+        self.offset_ = offset.astype(np.float32)
+
+    def transform(self, X: DataFrame) -> np.ndarray:
+        try:
+            encoded = self.feature_encoder.transform(X)
+            encoded *= self.scale_
+            encoded += self.offset_
+            return encoded
+        except Exception as e:
+            raise MyException(e, sys) from e
+
+    def transform_record(self, record: dict) -> np.ndarray:
+        """
+        Single-row fast path: encodes and scales a dict of column -> value into a (1, n_features) array.
+        """
+        try:
+            encoded = self.feature_encoder.transform_record(record)
+            encoded *= self.scale_
+            encoded += self.offset_
+            return encoded
+        except Exception as e:
+            raise MyException(e, sys) from e
+
+    def get_feature_names_out(self, input_features=None) -> np.ndarray:
+        return self.feature_encoder.get_feature_names_out()
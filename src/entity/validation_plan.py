@@ -0,0 +1,243 @@
+import sys
+from statistics import NormalDist
+from typing import Iterable, List, Optional, Tuple, Union
+
+import numpy as np
+import pandas as pd
+from pandas import DataFrame
+
+from src.exception import MyException
+from src.entity.schema import Schema
+
+# number of unexpected category levels kept per column in the report
+MAX_REPORTED_LEVELS = 20
+
+
+def wilson_interval(count: int, n: int, confidence: float) -> Tuple[float, float]:
+    """
+    Wilson score interval of a proportion estimated as count / n, which stays meaningful
+    for rates close to 0 (e.g. no violation found in the sample).
+    """
+    if n == 0:
+        return 0.0, 1.0
+    z = NormalDist().inv_cdf(0.5 + confidence / 2)
+    p = count / n
+    denominator = 1 + z ** 2 / n
+    center = (p + z ** 2 / (2 * n)) / denominator
+    margin = z * (p * (1 - p) / n + z ** 2 / (4 * n ** 2)) ** 0.5 / denominator
+    return max(0.0, center - margin), min(1.0, center + margin)
+
+
+class ValidationResult:
+    """
+    Counters accumulated by a ValidationPlan over the chunks of one dataset.
+    Numeric counters are arrays aligned with `ValidationPlan.numeric_columns`.
+    """
+    def __init__(self, n_numeric: int, category_columns: List[str]):
+        self.rows = 0
+        self.scanned_rows = 0
+        self.chunks = 0
+        self.missing_columns = set()
+        self.unexpected_columns = set()
+        self.numeric_nulls = np.zeros(n_numeric, dtype=np.int64)
+        self.numeric_violations = np.zeros(n_numeric, dtype=np.int64)
+        self.numeric_dtype_errors = np.zeros(n_numeric, dtype=np.int64)
+        self.numeric_min = np.full(n_numeric, np.inf)
+        self.numeric_max = np.full(n_numeric, -np.inf)
+        self.category_nulls = dict.fromkeys(category_columns, 0)
+        self.category_violations = dict.fromkeys(category_columns, 0)
+        self.unexpected_levels = {column: {} for column in category_columns}
+
+
+class ValidationPlan:
+    """
+    Checks of the compiled schema turned once into arrays, then applied chunk by chunk.
+
+    For each chunk the numeric columns are converted into a single float64 matrix and checked
+    for nulls, bounds, integrality and allowed values with whole-matrix numpy operations.
+    Category columns are checked on their distinct values (value_counts), not row by row.
+    Schema fields used besides `columns`: `bounds` ([min, max], None for open ends),
+    `domains` (allowed values), `max_null_fraction`, `max_violation_fraction` and `value_checks`
+    (whether columns exceeding them are errors or warnings).
+    """
+    def __init__(self, schema: Schema):
+        try:
+            self.dtypes = dict(schema.dtypes)
+            self.columns = list(schema.columns)
+            self.numeric_columns = [column for column, dtype in self.dtypes.items() if dtype in ("int", "float")]
+            self.category_columns = [column for column, dtype in self.dtypes.items() if dtype == "category"]
+
+            bounds, domains = schema.bounds, schema.domains
+            self.lower = np.array([self._bound(bounds.get(column), 0, -np.inf) for column in self.numeric_columns])
+            self.upper = np.array([self._bound(bounds.get(column), 1, np.inf) for column in self.numeric_columns])
+            self.integer_mask = np.array([self.dtypes[column] == "int" for column in self.numeric_columns], dtype=bool)
+            self.numeric_domains = {i: np.array(domains[column], dtype=np.float64)
+                                    for i, column in enumerate(self.numeric_columns) if column in domains}
+            self.category_domains = {column: set(domains[column]) for column in self.category_columns if column in domains}
+            self.max_null_fraction = schema.max_null_fraction
+            self.max_violation_fraction = schema.max_violation_fraction
+            self.value_checks = schema.value_checks
+        except Exception as e:
+            raise MyException(e, sys) from e
+
+    @staticmethod
+    def _bound(bound: list, position: int, default: float) -> float:
+        if bound is None or bound[position] is None:
+            return default
+        return float(bound[position])
+
+    def new_result(self) -> ValidationResult:
+        return ValidationResult(len(self.numeric_columns), self.category_columns)
+
+    def update(self, result: ValidationResult, chunk: DataFrame, sampled_from: Optional[int] = None) -> ValidationResult:
+        """
+        Adds the counters of one chunk to `result`.
+        `sampled_from` is the number of rows the chunk was sampled from, when it is a sample.
+        """
+        try:
+            result.rows += len(chunk)
+            result.scanned_rows += len(chunk) if sampled_from is None else sampled_from
+            result.chunks += 1
+            result.missing_columns.update(column for column in self.columns if column not in chunk.columns)
+            result.unexpected_columns.update(column for column in chunk.columns if column not in self.dtypes)
+            self._check_numeric(result, chunk)
+            self._check_categories(result, chunk)
+            return result
+        except Exception as e:
+            raise MyException(e, sys) from e
+
+    def _check_numeric(self, result: ValidationResult, chunk: DataFrame) -> None:
+        block = chunk.reindex(columns=self.numeric_columns)
+        converted = {}
+        for i, column in enumerate(self.numeric_columns):
+            values = block[column]
+            if column in chunk.columns and not pd.api.types.is_numeric_dtype(values):
+                # values that are present but not numbers are dtype errors, they become nulls below
+                numbers = pd.to_numeric(values.astype(object), errors="coerce")
+                result.numeric_dtype_errors[i] += int((numbers.isna() & values.notna()).sum())
+                converted[column] = numbers
+        if converted:
+            block = block.assign(**converted)
+
+        matrix = block.to_numpy(dtype=np.float64, na_value=np.nan)
+        is_null = np.isnan(matrix)
+        result.numeric_nulls += is_null.sum(axis=0)
+
+        # NaN compares False, so nulls are never counted as out of bounds
+        violations = (matrix < self.lower) | (matrix > self.upper)
+        for i, domain in self.numeric_domains.items():
+            violations[:, i] |= ~np.isin(matrix[:, i], domain) & ~is_null[:, i]
+        result.numeric_violations += violations.sum(axis=0)
+
+        integer_block = matrix[:, self.integer_mask]
+        result.numeric_dtype_errors[self.integer_mask] += (integer_block != np.round(integer_block)).sum(axis=0) \
+            - np.isnan(integer_block).sum(axis=0)
+
+        if len(matrix):
+            result.numeric_min = np.fmin(result.numeric_min, np.where(is_null, np.inf, matrix).min(axis=0))
+            result.numeric_max = np.fmax(result.numeric_max, np.where(is_null, -np.inf, matrix).max(axis=0))
+
+    def _check_categories(self, result: ValidationResult, chunk: DataFrame) -> None:
+        for column in self.category_columns:
+            if column not in chunk.columns:
+                continue
+            counts = chunk[column].value_counts(dropna=False)
+            counts = counts[counts > 0]
+            is_null = counts.index.isna()
+            result.category_nulls[column] += int(counts[is_null].sum())
+
+            domain = self.category_domains.get(column)
+            if domain is None:
+                continue
+            for level, count in counts[~is_null].items():
+                if level not in domain:
+                    result.category_violations[column] += int(count)
+                    levels = result.unexpected_levels[column]
+                    if level in levels or len(levels) < MAX_REPORTED_LEVELS:
+                        levels[level] = levels.get(level, 0) + int(count)
+
+    def report(self, result: ValidationResult, confidence: float = 0.95) -> dict:
+        """
+        Turns the counters into a json friendly report with a status and the list of errors. Failed value
+        checks (nulls, bounds, domains, dtypes) are errors with `value_checks: fail`, warnings otherwise.
+
+        When the rows were sampled, the status is decided on the estimated rates and every rate gets
+        the upper end of its Wilson interval at `confidence`; columns whose upper bound exceeds the
+        threshold while the estimate does not are summarised in the warnings.
+        """
+        try:
+            rows = result.rows
+            sampled = result.scanned_rows > rows
+            errors, warnings = [], []
+            value_issues = errors if self.value_checks == "fail" else warnings
+            uncertain = {"null": [], "violation": []}
+            if rows == 0:
+                errors.append("Dataset has no rows")
+            if result.missing_columns:
+                errors.append(f"Missing columns: {sorted(result.missing_columns)}")
+            if result.unexpected_columns:
+                errors.append(f"Columns not in schema: {sorted(result.unexpected_columns)}")
+
+            columns = {}
+            for i, column in enumerate(self.numeric_columns):
+                columns[column] = {
+                    "dtype": self.dtypes[column],
+                    "nulls": int(result.numeric_nulls[i]),
+                    "violations": int(result.numeric_violations[i]),
+                    "dtype_errors": int(result.numeric_dtype_errors[i]),
+                    "min": float(result.numeric_min[i]) if np.isfinite(result.numeric_min[i]) else None,
+                    "max": float(result.numeric_max[i]) if np.isfinite(result.numeric_max[i]) else None,
+                }
+            for column in self.category_columns:
+                columns[column] = {
+                    "dtype": self.dtypes[column],
+                    "nulls": result.category_nulls[column],
+                    "violations": result.category_violations[column],
+                    "dtype_errors": 0,
+                    "unexpected_values": {str(level): count for level, count in result.unexpected_levels[column].items()},
+                }
+
+            for column in self.columns:
+                stats = columns[column]
+                if column in result.missing_columns:
+                    stats["nulls"] = 0
+                    continue
+                stats["null_fraction"] = stats["nulls"] / rows if rows else 0.0
+                stats["violation_fraction"] = stats["violations"] / rows if rows else 0.0
+                if stats["dtype_errors"]:
+                    value_issues.append(f"{column}: {stats['dtype_errors']} values are not of type {stats['dtype']}")
+                if stats["null_fraction"] > self.max_null_fraction:
+                    value_issues.append(f"{column}: null fraction {stats['null_fraction']:.4f} "
+                                        f"exceeds {self.max_null_fraction}")
+                if stats["violation_fraction"] > self.max_violation_fraction:
+                    value_issues.append(f"{column}: {stats['violations']} values outside the schema bounds or domain")
+                if sampled:
+                    stats["null_fraction_upper"] = wilson_interval(stats["nulls"], rows, confidence)[1]
+                    stats["violation_fraction_upper"] = wilson_interval(stats["violations"], rows, confidence)[1]
+                    if stats["null_fraction"] <= self.max_null_fraction < stats["null_fraction_upper"]:
+                        uncertain["null"].append(column)
+                    if stats["violation_fraction"] <= self.max_violation_fraction < stats["violation_fraction_upper"]:
+                        uncertain["violation"].append(column)
+
+            for kind, uncertain_columns in uncertain.items():
+                if uncertain_columns:
+                    warnings.append(f"A sample of {rows} rows cannot rule out a {kind} fraction above the threshold "
+                                    f"at {confidence:.0%} confidence for {uncertain_columns}")
+
+            report = {"status": not errors, "rows": rows, "scanned_rows": result.scanned_rows, "chunks": result.chunks,
+                      "sampled": sampled, "errors": errors, "warnings": warnings, "columns": columns}
+            if sampled:
+                report["confidence"] = confidence
+            return report
+        except Exception as e:
+            raise MyException(e, sys) from e
+
+    def validate(self, data: Union[DataFrame, Iterable[DataFrame]]) -> dict:
+        """
+        Validates a DataFrame, or a stream of DataFrame chunks, in a single pass and returns the report.
+        """
+        chunks = [data] if isinstance(data, DataFrame) else data
+        result = self.new_result()
+        for chunk in chunks:
+            self.update(result, chunk)
+        return self.report(result)
@@ -1,6 +1,7 @@
 import sys
 import os
 from src.entity.config_entity import VehiclePredictConfig
+from src.entity.schema import load_schema
 from src.utils.main_utils import load_object
 from src.exception import MyException
 from src.logger import logging
@@ -16,12 +17,15 @@ class VehicleData:
                  Annual_Premium,
                  Policy_Sales_Channel,
                  Vintage,
-                 Vehicle_Age_lt_1_Year,
-                 Vehicle_Age_gt_2_Years,
-                 Vehicle_Damage_Yes):
+                 Vehicle_Age_lt_1_Year=None,
+                 Vehicle_Age_gt_2_Years=None,
+                 Vehicle_Damage_Yes=None,
+                 Vehicle_Age=None,
+                 Vehicle_Damage=None):
         """
         Vehicle Data constructor
-        Input: all feature of the trained model prediction
+        Input: all feature of the trained model prediction, Vehicle_Age / Vehicle_Damage either
+               as raw values ("< 1 Year", "Yes", ...) or as their dummy columns
         """
         try:
             self.Gender = Gender
@@ -35,6 +39,8 @@ class VehicleData:
             self.Vehicle_Age_lt_1_Year = Vehicle_Age_lt_1_Year
             self.Vehicle_Age_gt_2_Years = Vehicle_Age_gt_2_Years
             self.Vehicle_Damage_Yes = Vehicle_Damage_Yes
+            self.Vehicle_Age = Vehicle_Age
+            self.Vehicle_Damage = Vehicle_Damage
         
         except Exception as e:
             raise MyException(e, sys) from e
@@ -67,7 +73,9 @@ class VehicleData:
                 "Vintage": [self.Vintage],
                 "Vehicle_Age_lt_1_Year": [self.Vehicle_Age_lt_1_Year],
                 "Vehicle_Age_gt_2_Years": [self.Vehicle_Age_gt_2_Years],
-                "Vehicle_Damage_Yes": [self.Vehicle_Damage_Yes]
+                "Vehicle_Damage_Yes": [self.Vehicle_Damage_Yes],
+                "Vehicle_Age": [self.Vehicle_Age],
+                "Vehicle_Damage": [self.Vehicle_Damage]
             }
 
             logging.info("Created vehicle data dict")
@@ -76,6 +84,17 @@ class VehicleData:
         except Exception as e:
             raise MyException(e, sys) from e
     
+    def get_vehicle_data_as_record(self) -> dict:
+        """
+        This function returns a single record (column -> value) for the single-row prediction path,
+        inputs left to None are omitted
+        """
+        try:
+            return {column: values[0] for column, values in self.get_vehicle_data_as_dict().items()
+                    if values[0] is not None}
+        except Exception as e:
+            raise MyException(e, sys) from e
+    
 class VehicleDataClassifier:
     def __init__(self, prediction_pipeline_config: VehiclePredictConfig = VehiclePredictConfig(),) -> None:
         """
@@ -83,6 +102,7 @@ class VehicleDataClassifier:
         """
         try:
             self.prediction_pipeline_config = prediction_pipeline_config
+            self.schema = load_schema()
         except Exception as e:
             raise MyException(e, sys)
     
@@ -112,5 +132,21 @@ class VehicleDataClassifier:
             result = model.predict(dataframe)
 
             return result
+        except Exception as e:
+            raise MyException(e, sys)
+
+    def predict_record(self, record: dict) -> str:
+        """
+        This is method of VehicleDataClassifier, single-row fast path of predict
+        Returns: Prediction in string format
+        """
+        try:
+            logging.info("Entered predict_record method of VehicleDataClassifier")
+            latest_model_path = self.get_latest_model_path()
+            model = load_object(latest_model_path)
+            # only the raw columns and encoded features the schema knows reach the model
+            record = {column: value for column, value in record.items()
+                      if column in self.schema.column_index or column in self.schema.feature_index}
+            return model.predict_record(record)
         except Exception as e:
             raise MyException(e, sys)
\ No newline at end of file
@@ -1,4 +1,9 @@
 import sys
+from typing import Optional
+
+import numpy as np
+
+from src.constants import TARGET_COLUMN
 from src.exception import MyException
 from src.logger import logging
 
@@ -22,6 +27,10 @@ from src.entity.artifact_entity import (DataIngestionArtifact,
                                         ModelTrainerArtifact,
                                         ModelEvaluationArtifact,
                                         ModelPusherArtifact)
+from src.entity.estimator import MyModel
+from src.entity.model_engines import EXTENDABLE_ENGINES
+from src.entity.s3_estimator import Proj1Estimator
+from src.utils.main_utils import read_yaml_file, read_dataframe
 
 class TrainPipeline:
     def __init__(self):
@@ -32,14 +41,50 @@ class TrainPipeline:
         self.model_evaluation_config = ModelEvaluationConfig()
         self.model_pusher_config = ModelPusherConfig()
     
-    def start_data_ingestion(self) -> DataIngestionArtifact:
+    def get_refresh_base(self) -> Optional[MyModel]:
+        """
+        This method of TrainPipeline class returns the production model to refresh with the rows ingested since
+        it was trained, None when a full build is due: not in incremental refresh mode, no incremental ingestion
+        with the hash split, an engine that cannot be extended (see EXTENDABLE_ENGINES), no production model of the configured engine with a training state, or
+        `full_rebuild_every` refreshes since its last full build.
+        """
+        config = self.model_trainer_config
+        ingestion_config = self.data_ingestion_config
+        if config.refresh_mode != "incremental":
+            return None
+        if not (ingestion_config.incremental and ingestion_config.split_mode == "hash"):
+            logging.info("Incremental refresh needs incremental ingestion with the hash split, full build")
+            return None
+        engine = (read_yaml_file(config.model_config_file_path) or {}).get("engine", config.engine)
+        if engine not in EXTENDABLE_ENGINES:
+            logging.info(f"A {engine} model cannot be refreshed incrementally, full build")
+            return None
+        try:
+            estimator = Proj1Estimator(bucket_name=config.bucket_name, model_path=config.s3_model_key_path)
+            if not estimator.is_model_present(model_path=config.s3_model_key_path):
+                return None
+            current_model = estimator.load_model()
+        except Exception as e:
+            logging.warning(f"Production model could not be loaded, full build: {e}")
+            return None
+        state = getattr(current_model, "training_state", None)
+        if state is None or state.get("engine") != engine or not state.get("partitions"):
+            logging.info(f"No production {engine} model with a training state, full build")
+            return None
+        if state["refreshes"] >= config.full_rebuild_every:
+            logging.info(f"{state['refreshes']} refreshes since the last full build, full build")
+            return None
+        return current_model
+
+    def start_data_ingestion(self, trained_partitions: Optional[list] = None) -> DataIngestionArtifact:
         """
         This method of TrainPipeline class is responsible for starting data ingestion component.
         """
         try:
             logging.info("Entered the start_data_ingestion method TrainPipeline class.")
             logging.info("Getting the data from MongDB")
-            data_ingestion = DataIngestion(data_ingestion_config=self.data_ingestion_config)
+            data_ingestion = DataIngestion(data_ingestion_config=self.data_ingestion_config,
+                                           trained_partitions=trained_partitions)
             data_ingestion_artifact = data_ingestion.initiate_data_ingestion()
             logging.info("Got the train_set and test_set from mongodb")
             logging.info("Exited the start_data_ingestion method of TrainPipeline class")
@@ -66,31 +111,49 @@ class TrainPipeline:
         except Exception as e:
             raise MyException(e, sys) from e
 
-    def start_data_transformation(self, data_ingestion_artifact: DataIngestionArtifact, data_validation_artifact: DataValidationArtifact) -> DataTransformationArtifact:
+    def start_data_transformation(self, data_ingestion_artifact: DataIngestionArtifact, data_validation_artifact: DataValidationArtifact,
+                                  preprocessor: Optional[object] = None) -> DataTransformationArtifact:
         """
         This method of TrainPipeline class is responsible for starting data transformation component.
         """
         try:
             data_transformation = DataTransformation(data_ingestion_artifact=data_ingestion_artifact,
                                                      data_validation_artifact=data_validation_artifact,
-                                                     data_transformation_config=self.data_transformation_config)
+                                                     data_transformation_config=self.data_transformation_config,
+                                                     preprocessor=preprocessor)
             data_transformation_artifact = data_transformation.initiate_data_transformation()
             return data_transformation_artifact
         except Exception as e:
             raise MyException(e, sys)
     
-    def start_model_trainer(self, data_transformation_artifact: DataTransformationArtifact) -> ModelTrainerArtifact:
+    def start_model_trainer(self, data_transformation_artifact: DataTransformationArtifact,
+                            data_ingestion_artifact: DataIngestionArtifact,
+                            current_model: Optional[MyModel] = None) -> ModelTrainerArtifact:
         """
         This method of TrainPipeline class is reponsible to starting model training
         """
         try:
             model_trainer = ModelTrainer(data_transformation_artifact=data_transformation_artifact,
-                                         model_trainer_config=self.model_trainer_config)
+                                         model_trainer_config=self.model_trainer_config,
+                                         data_ingestion_artifact=data_ingestion_artifact,
+                                         current_model=current_model)
             model_trainer_artifact = model_trainer.initiate_model_trainer()
             return model_trainer_artifact
         except Exception as e:
             raise MyException(e, sys)
 
+    @staticmethod
+    def is_refreshable(data_ingestion_artifact: DataIngestionArtifact) -> bool:
+        """
+        This method of TrainPipeline class tells whether the rows of a delta ingestion can refresh the production
+        model: new training rows of every class, and new test rows to check the refreshed model on.
+        """
+        if not data_ingestion_artifact.delta_rows:
+            return False
+        y_train = read_dataframe(data_ingestion_artifact.trained_file_path, columns=[TARGET_COLUMN])[TARGET_COLUMN]
+        y_test = read_dataframe(data_ingestion_artifact.test_file_path, columns=[TARGET_COLUMN])[TARGET_COLUMN]
+        return len(np.unique(y_train)) > 1 and len(y_test) > 0
+
     def start_model_evaluation(self, data_ingestion_artifact: DataIngestionArtifact,
                                model_trainer_artifact: ModelTrainerArtifact) -> ModelEvaluationArtifact:
         """
@@ -106,13 +169,15 @@ class TrainPipeline:
         except Exception as e:
             raise MyException(e, sys)
     
-    def start_model_pusher(self, model_evaluation_artifact: ModelEvaluation) -> ModelPusherArtifact:
+    def start_model_pusher(self, model_evaluation_artifact: ModelEvaluation,
+                           data_validation_artifact: DataValidationArtifact = None) -> ModelPusherArtifact:
         """
         This method of TrainPipeline is responsible for starting model pushing,
         """
         try:
             model_pusher = ModelPusher(model_evaluation_artifact=model_evaluation_artifact,
-                                       model_pusher_config=self.model_pusher_config)
+                                       model_pusher_config=self.model_pusher_config,
+                                       data_validation_artifact=data_validation_artifact)
             model_pusher_artifact = model_pusher.initiate_model_pusher()
             return model_pusher_artifact
         except Exception as e:
@@ -124,17 +189,37 @@ class TrainPipeline:
         """
 
         try:
-            data_ingestion_artifact = self.start_data_ingestion()
+            # in incremental refresh mode only the rows ingested since the production model was trained go
+            # through ingestion, validation and transformation, and the model is grown with them
+            current_model = self.get_refresh_base()
+            data_ingestion_artifact = self.start_data_ingestion(
+                trained_partitions=None if current_model is None else current_model.training_state["partitions"])
+            if not data_ingestion_artifact.is_delta:
+                current_model = None
+            elif not self.is_refreshable(data_ingestion_artifact):
+                logging.info("Not enough new rows to refresh the production model, production model kept.")
+                return None
             data_validation_artifact = self.start_data_validation(data_ingestion_artifact=data_ingestion_artifact)
+            if (self.data_validation_config.skip_training_without_drift and data_validation_artifact.validation_status
+                    and data_validation_artifact.drift_detected is False):
+                logging.info("No drift against the production model's training data, retraining skipped.")
+                return None
             data_transformation_artifact = self.start_data_transformation(data_ingestion_artifact=data_ingestion_artifact,
-                                                                          data_validation_artifact=data_validation_artifact)
-            model_trainer_artifact = self.start_model_trainer(data_transformation_artifact=data_transformation_artifact)
+                                                                          data_validation_artifact=data_validation_artifact,
+                                                                          preprocessor=None if current_model is None
+                                                                          else current_model.preprocessing_object)
+            model_trainer_artifact = self.start_model_trainer(data_transformation_artifact=data_transformation_artifact,
+                                                              data_ingestion_artifact=data_ingestion_artifact,
+                                                              current_model=current_model)
             model_evaluation_artifact = self.start_model_evaluation(data_ingestion_artifact=data_ingestion_artifact,
                                                                     model_trainer_artifact=model_trainer_artifact)
             if not model_evaluation_artifact.is_model_accepted:
                 logging.info(f"Model not accepted.")
                 return None
-            model_pusher_artifact = self.start_model_pusher(model_evaluation_artifact=model_evaluation_artifact)
+            # the sketch of the new rows alone would replace the reference of the whole training data
+            model_pusher_artifact = self.start_model_pusher(model_evaluation_artifact=model_evaluation_artifact,
+                                                            data_validation_artifact=None if current_model is not None
+                                                            else data_validation_artifact)
             
         except Exception as e:
             raise MyException(e, sys)
\ No newline at end of file
@@ -1,14 +1,24 @@
+import hashlib
 import os
+import shutil
 import sys
 
 import numpy as np
 import dill
 import yaml
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
 from pandas import DataFrame
+from typing import Iterator, List, Mapping, Optional
 
+from src.constants import ARTIFACT_PARQUET_COMPRESSION, HASH_SPLIT_BUCKETS
 from src.exception import MyException
 from src.logger import logging
 
+# file extension of every supported dataframe artifact format
+ARTIFACT_FILE_FORMATS = {".csv": "csv", ".parquet": "parquet", ".arrow": "arrow"}
+
 def read_yaml_file(file_path: str) -> dict:
     try:
         with open(file_path, "rb") as yaml_file:
@@ -43,27 +53,31 @@ def load_object(file_path: str) -> object:
 
 def save_numpy_array_data(file_path: str, array: np.array) -> None:
     """
-    Save numpy array data to file
+    Save numpy array data to file, as a plain C-contiguous .npy (object arrays are refused, not pickled)
     file_path: str location of file to save
     array: np.array data to save
     """
     try:
         dir_path = os.path.dirname(file_path)
         os.makedirs(dir_path, exist_ok=True)
-        with open(file_path, "wb") as file_obj:
-            np.save(file_obj, array)
+        # written aside and swapped in: a file hard-linked from a cached run is replaced, never overwritten
+        with open(f"{file_path}.tmp", "wb") as file_obj:
+            np.save(file_obj, np.ascontiguousarray(array), allow_pickle=False)
+        os.replace(f"{file_path}.tmp", file_path)
     except Exception as e:
         raise MyException(e, sys) from e
 
-def load_numpy_array_data(file_path: str) -> np.array:
+def load_numpy_array_data(file_path: str, mmap_mode: Optional[str] = None) -> np.array:
     """
     load numpy array data from file
     file_path: str location of file to load
+    mmap_mode: "r" maps the file read-only instead of reading it, pages are loaded on access and shared with
+               the page cache; "c" maps it copy-on-write, the array is writable but written pages become
+               private copies of this process and the file itself is never modified
     return: np.array data loaded
     """        
     try:
-        with open(file_path, "rb") as file_obj:
-            return np.load(file_obj, allow_pickle=True)
+        return np.load(file_path, mmap_mode=mmap_mode, allow_pickle=False)
     except Exception as e:
         raise MyException(e, sys) from e
 
@@ -78,4 +92,305 @@ def save_object(file_path: str, obj: object) -> None:
         logging.info("Exited the save_object method of utils")
     
     except Exception as e:
-        raise MyException(e, sys) from e
\ No newline at end of file
+        raise MyException(e, sys) from e
+
+def cast_storage_dtypes(dataframe: DataFrame, storage_dtypes: Mapping[str, object]) -> DataFrame:
+    """
+    Applies the dtypes ingested data is stored with, fixed by the schema so that every chunk gets the same
+    arrow type. Columns already of their storage dtype are left as they are, so on artifacts read back this
+    only converts csv files and the int columns holding nulls (read back as float64). Values the storage dtype cannot hold (non numbers, fractions or values beyond the width of an
+    int column, levels outside the vocabulary of a category) become nulls, which is logged; data validation
+    then reports them. Int columns holding nulls are kept as floats, stored back as ints with nulls.
+    dataframe: DataFrame to convert, columns missing from storage_dtypes are left untouched
+    storage_dtypes: column to storage dtype mapping, see Schema.storage_dtypes (src/entity/schema.py)
+    return: DataFrame with the storage dtypes
+    """
+    try:
+        columns = {}
+        for column, dtype in storage_dtypes.items():
+            if column not in dataframe.columns:
+                continue
+            values = dataframe[column]
+            if values.dtype == dtype:
+                continue
+            if isinstance(dtype, pd.CategoricalDtype):
+                converted = values.astype(dtype)
+            else:
+                converted = pd.to_numeric(values, errors="coerce")
+                if np.issubdtype(dtype, np.integer):
+                    info = np.iinfo(dtype)
+                    converted = converted.where((converted >= info.min) & (converted <= info.max)
+                                                & (converted == np.floor(converted)))
+                    if not converted.isna().any():
+                        converted = converted.astype(dtype)
+                    else:
+                        # floats exact for every value of the width
+                        converted = converted.astype(np.float32 if dtype.itemsize <= 2 else np.float64)
+                else:
+                    converted = converted.astype(dtype)
+            lost = int(converted.isna().sum() - values.isna().sum())
+            if lost:
+                logging.warning(f"{lost} values of {column} cannot be stored as {dtype}, stored as nulls")
+            columns[column] = converted
+        return dataframe.assign(**columns)
+    except Exception as e:
+        raise MyException(e, sys) from e
+
+def arrow_storage_type(dtype: object) -> pa.DataType:
+    """Arrow type of a storage dtype (see cast_storage_dtypes), categories as int8/int16 indexed dictionaries."""
+    if isinstance(dtype, pd.CategoricalDtype):
+        index_type = pa.int8() if len(dtype.categories) < 128 else pa.int16()
+        return pa.dictionary(index_type, pa.from_numpy_dtype(dtype.categories.dtype)
+                             if dtype.categories.dtype != object else pa.string())
+    return pa.from_numpy_dtype(dtype)
+
+def memory_usage_report(before: DataFrame, after: DataFrame) -> dict:
+    """
+    Per column dtype and memory usage of a DataFrame before and after a dtype conversion.
+    before: original DataFrame
+    after: converted DataFrame with the same columns
+    return: dict with one entry per column and the totals, sizes in bytes
+    """
+    try:
+        before_usage = before.memory_usage(index=False, deep=True)
+        after_usage = after.memory_usage(index=False, deep=True)
+        columns = {
+            column: {
+                "dtype_before": str(before[column].dtype),
+                "dtype_after": str(after[column].dtype),
+                "bytes_before": int(before_usage[column]),
+                "bytes_after": int(after_usage[column]),
+            }
+            for column in before.columns
+        }
+        total_before, total_after = int(before_usage.sum()), int(after_usage.sum())
+        return {
+            "columns": columns,
+            "total_bytes_before": total_before,
+            "total_bytes_after": total_after,
+            "reduction_factor": round(total_before / total_after, 2) if total_after else None,
+        }
+    except Exception as e:
+        raise MyException(e, sys) from e
+
+def get_file_format(file_path: str) -> str:
+    """
+    Returns the artifact format ('csv', 'parquet' or 'arrow') of a file from its extension.
+    """
+    extension = os.path.splitext(file_path)[1].lower()
+    if extension not in ARTIFACT_FILE_FORMATS:
+        raise ValueError(f"Unsupported artifact file extension '{extension}' for {file_path}")
+    return ARTIFACT_FILE_FORMATS[extension]
+
+class DataFrameChunkWriter:
+    """
+    Writes DataFrame chunks one after another into a single csv, parquet or arrow (IPC) file.
+    The format is picked from the file extension. Parquet and arrow keep the dtypes of the first chunk,
+    later chunks are cast to them; the columns of `storage_dtypes` (see cast_storage_dtypes) get their
+    arrow type instead, whatever the first chunk holds (e.g. nulls in an int column).
+    """
+    def __init__(self, file_path: str, storage_dtypes: Optional[Mapping[str, object]] = None):
+        self.file_path = file_path
+        self.file_format = get_file_format(file_path)
+        self.storage_dtypes = storage_dtypes or {}
+        self.rows = 0
+        self._started = False
+        self._writer = None
+        self._schema = None
+        os.makedirs(os.path.dirname(file_path) or ".", exist_ok=True)
+
+    def write(self, chunk: DataFrame) -> None:
+        try:
+            if self.file_format == "csv":
+                # header is written only with the first chunk, later chunks are appended
+                chunk.to_csv(self.file_path, mode="a" if self._started else "w", index=False, header=not self._started)
+            else:
+                if self._writer is None:
+                    table = pa.Table.from_pandas(chunk, preserve_index=False)
+                    self._schema = pa.schema([
+                        field.with_type(arrow_storage_type(self.storage_dtypes[field.name]))
+                        if field.name in self.storage_dtypes else field for field in table.schema
+                    ], metadata=table.schema.metadata)
+                    if not self._schema.equals(table.schema):
+                        table = pa.Table.from_pandas(chunk, schema=self._schema, preserve_index=False)
+                    if self.file_format == "parquet":
+                        self._writer = pq.ParquetWriter(self.file_path, self._schema, compression=ARTIFACT_PARQUET_COMPRESSION)
+                    else:
+                        # uncompressed IPC so that readers can memory-map the file
+                        self._writer = pa.ipc.new_file(self.file_path, self._schema)
+                else:
+                    table = pa.Table.from_pandas(chunk, preserve_index=False)
+                    if not table.schema.equals(self._schema):
+                        table = pa.Table.from_pandas(chunk, schema=self._schema, preserve_index=False)
+                self._writer.write_table(table)
+            self._started = True
+            self.rows += len(chunk)
+        except Exception as e:
+            raise MyException(e, sys) from e
+
+    def close(self) -> None:
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+def write_dataframe(dataframe: DataFrame, file_path: str) -> None:
+    """
+    Save a DataFrame as csv, parquet or arrow depending on the file extension
+    file_path: str location of file to save
+    dataframe: DataFrame to save
+    """
+    try:
+        with DataFrameChunkWriter(file_path) as writer:
+            writer.write(dataframe)
+    except Exception as e:
+        raise MyException(e, sys) from e
+
+def read_dataframe(file_path: str, columns: Optional[List[str]] = None) -> DataFrame:
+    """
+    Load a csv, parquet or arrow DataFrame artifact, arrow files are memory-mapped
+    file_path: str location of file to load
+    columns: optional subset of columns to load
+    return: DataFrame with the dtypes it was saved with (csv dtypes are inferred)
+    """
+    try:
+        file_format = get_file_format(file_path)
+        if file_format == "csv":
+            return pd.read_csv(file_path, usecols=columns)
+        if file_format == "parquet":
+            return pd.read_parquet(file_path, columns=columns)
+        with pa.memory_map(file_path, "r") as source:
+            table = pa.ipc.open_file(source).read_all()
+            if columns is not None:
+                table = table.select(columns)
+            return table.to_pandas()
+    except Exception as e:
+        raise MyException(e, sys) from e
+
+def iter_dataframe_chunks(file_path: str, chunk_size: int, columns: Optional[List[str]] = None) -> Iterator[DataFrame]:
+    """
+    Stream a csv, parquet or arrow DataFrame artifact in chunks of at most chunk_size rows
+    file_path: str location of file to load
+    chunk_size: number of rows per chunk, peak memory is bounded by one chunk
+    columns: optional subset of columns to load
+    return: iterator of DataFrames with the dtypes the file was saved with (csv dtypes are inferred per chunk)
+    """
+    try:
+        file_format = get_file_format(file_path)
+        if file_format == "csv":
+            yield from pd.read_csv(file_path, usecols=columns, chunksize=chunk_size)
+        elif file_format == "parquet":
+            parquet_file = pq.ParquetFile(file_path)
+            for batch in parquet_file.iter_batches(batch_size=chunk_size, columns=columns):
+                yield batch.to_pandas()
+        else:
+            with pa.memory_map(file_path, "r") as source:
+                reader = pa.ipc.open_file(source)
+                for i in range(reader.num_record_batches):
+                    batch = reader.get_batch(i)
+                    if columns is not None:
+                        batch = batch.select(columns)
+                    for offset in range(0, batch.num_rows, chunk_size):
+                        yield batch.slice(offset, chunk_size).to_pandas()
+    except Exception as e:
+        raise MyException(e, sys) from e
+
+def count_dataframe_rows(file_path: str) -> int:
+    """
+    Number of rows of a csv, parquet or arrow DataFrame artifact, without loading it
+    (parquet and arrow from their metadata, csv by counting line breaks)
+    file_path: str location of the file
+    return: int number of data rows
+    """
+    try:
+        file_format = get_file_format(file_path)
+        if file_format == "parquet":
+            return pq.ParquetFile(file_path).metadata.num_rows
+        if file_format == "arrow":
+            with pa.memory_map(file_path, "r") as source:
+                reader = pa.ipc.open_file(source)
+                return sum(reader.get_batch(i).num_rows for i in range(reader.num_record_batches))
+        # csv artifacts are written by to_csv from values without line breaks, one line per row
+        lines, last_byte = 0, b"\n"
+        with open(file_path, "rb") as file_obj:
+            for block in iter(lambda: file_obj.read(1 << 24), b""):
+                lines += block.count(b"\n")
+                last_byte = block[-1:]
+        lines += last_byte != b"\n"
+        return max(lines - 1, 0)
+    except Exception as e:
+        raise MyException(e, sys) from e
+
+def hash_split_mask(dataframe: DataFrame, split_key: str, test_ratio: float) -> np.ndarray:
+    """
+    Returns True for the rows that belong to the test set.
+    A row's side depends only on the hash of its split key, so the assignment is the same in
+    every run, for every chunking, and for rows that arrive in later incremental ingests.
+    """
+    if split_key not in dataframe.columns:
+        raise Exception(f"Split key '{split_key}' is not in the ingested columns")
+    keys = dataframe[split_key]
+    if isinstance(keys.dtype, pd.CategoricalDtype):
+        keys = keys.astype(keys.cat.categories.dtype)
+    if keys.isna().any():
+        raise Exception(f"Split key '{split_key}' is missing in {int(keys.isna().sum())} rows")
+    # the hash depends on the dtype, so keys are hashed as int64 whatever they were read as (an int column read
+    # as float because of a null or by CSV type inference) and as strings when they are not integers
+    values = keys.to_numpy()
+    if pd.api.types.is_numeric_dtype(keys) and np.array_equal(values, np.trunc(values)):
+        values = values.astype(np.int64)
+    else:
+        values = keys.astype(str).to_numpy(dtype=object)
+    # pandas' hash_array uses a fixed key, so hashes are stable across processes and platforms
+    hashes = pd.util.hash_array(values, categorize=False)
+    return (hashes % HASH_SPLIT_BUCKETS) < round(test_ratio * HASH_SPLIT_BUCKETS)
+
+def get_file_ids(file_paths: List[str]) -> List[str]:
+    """
+    Identifiers of files (name, size and modification time), which change whenever a file is rewritten
+    file_paths: locations of the files
+    return: list of "<name>:<size>:<mtime_ns>" strings, in the order of file_paths
+    """
+    ids = []
+    for file_path in file_paths:
+        stat = os.stat(file_path)
+        ids.append(f"{os.path.basename(file_path)}:{stat.st_size}:{stat.st_mtime_ns}")
+    return ids
+
+def link_or_copy_file(src: str, dst: str) -> None:
+    """
+    Hard-links src to dst, falling back to a copy when linking is not possible (e.g. across devices)
+    src: str existing file
+    dst: str destination, replaced if it exists
+    """
+    try:
+        os.makedirs(os.path.dirname(dst), exist_ok=True)
+        if os.path.exists(dst):
+            os.remove(dst)
+        try:
+            os.link(src, dst)
+        except OSError:
+            shutil.copy2(src, dst)
+    except Exception as e:
+        raise MyException(e, sys) from e
+
+def hash_files(file_paths: List[str]) -> str:
+    """
+    sha256 of the contents of files, in the given order
+    file_paths: list of file locations
+    return: str hex digest
+    """
+    try:
+        digest = hashlib.sha256()
+        for file_path in file_paths:
+            with open(file_path, "rb") as file_obj:
+                for block in iter(lambda: file_obj.read(1 << 24), b""):
+                    digest.update(block)
+        return digest.hexdigest()
+    except Exception as e:
+        raise MyException(e, sys) from e